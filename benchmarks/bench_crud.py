@@ -0,0 +1,228 @@
+"""
+Benchmark the CRUD and availability hot paths at several data sizes.
+
+Each size runs in its own process against synthetic data in a temp
+directory, with the data files redirected the same way as the tests do.
+Results are printed (or written with --output) as JSON:
+
+    python benchmarks/bench_crud.py --sizes 1000 10000 --output run.json
+    python benchmarks/bench_crud.py --compare base.json run.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+from helpers import start_data_dir_patches
+from models import Hotel, Reservation, data_handler
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+FIRST_NIGHT = date(2026, 1, 1)
+
+
+def generate(size, seed=0):
+    """
+    Write size reservations plus size // 10 hotels and customers, with
+    deterministic random data, to the currently patched data files.
+    """
+    rng = random.Random(seed)
+    hotels = {}
+    for i in range(max(size // 10, 1)):
+        hotel_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        hotels[hotel_id] = {
+            "hotel_id": hotel_id,
+            "name": f"Hotel {i}",
+            "address": f"{i} Benchmark Ave",
+            "total_rooms": rng.randint(20, 400),
+            "phone": "555-0000",
+        }
+    customers = {}
+    for i in range(max(size // 10, 1)):
+        customer_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        customers[customer_id] = {
+            "customer_id": customer_id,
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"customer{i}@example.com",
+            "phone": "555-0001",
+        }
+    hotel_ids, customer_ids = list(hotels), list(customers)
+    reservations = {}
+    for _ in range(size):
+        reservation_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        check_in = FIRST_NIGHT + timedelta(days=rng.randrange(365))
+        reservations[reservation_id] = {
+            "reservation_id": reservation_id,
+            "customer_id": rng.choice(customer_ids),
+            "hotel_id": rng.choice(hotel_ids),
+            "check_in": check_in.isoformat(),
+            "check_out": (check_in + timedelta(days=rng.randint(1, 7))).isoformat(),
+            "status": "active" if rng.random() < 0.9 else "cancelled",
+        }
+    data_handler.save_json(data_handler.HOTELS_FILE, hotels)
+    data_handler.save_json(data_handler.CUSTOMERS_FILE, customers)
+    data_handler.save_json(data_handler.RESERVATIONS_FILE, reservations)
+    return hotel_ids, customer_ids
+
+
+def _percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(func, samples):
+    """Call func(i) samples times and summarise the latencies."""
+    latencies = []
+    for i in range(samples):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "samples": samples,
+        "ops_per_sec": samples / total if total else None,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def run_size(size, samples, seed=0):
+    """Generate one dataset and time every benchmarked operation on it."""
+    tmp = tempfile.mkdtemp(prefix=f"bench-{size}-")
+    patchers = start_data_dir_patches(tmp)
+    try:
+        hotel_ids, customer_ids = generate(size, seed)
+        rng = random.Random(seed + 1)
+        scan_samples = max(1, min(samples, 5))
+
+        def cold(func):
+            def call(i):
+                data_handler.invalidate_cache()
+                func(i)
+            return call
+
+        def stay(i):
+            check_in = FIRST_NIGHT + timedelta(days=(i * 7) % 365)
+            return check_in, check_in + timedelta(days=3)
+
+        hotels = [Hotel.get(hotel_id) for hotel_id in hotel_ids[:samples]]
+        results = {
+            "hotel_get": measure(lambda i: Hotel.get(rng.choice(hotel_ids)), samples),
+            "hotel_get_all_cold": measure(cold(lambda i: Hotel.get_all()), scan_samples),
+            "reservation_get_all_cold": measure(
+                cold(lambda i: Reservation.get_all()), scan_samples
+            ),
+            "reservation_get_all_warm": measure(
+                lambda i: Reservation.get_all(), scan_samples
+            ),
+            "available_rooms_cold": measure(
+                cold(lambda i: hotels[i % len(hotels)].available_rooms(*stay(i))),
+                scan_samples,
+            ),
+            "available_rooms_warm": measure(
+                lambda i: hotels[i % len(hotels)].available_rooms(*stay(i)), samples
+            ),
+            "search_available_cold": measure(
+                cold(lambda i: Hotel.search_available(*stay(i), limit=20)), scan_samples
+            ),
+            "search_available_warm": measure(
+                lambda i: Hotel.search_available(*stay(i), limit=20), scan_samples
+            ),
+            "hotel_create": measure(
+                lambda i: Hotel.create(f"New {i}", "1 Bench St", 50), samples
+            ),
+            "reservation_create": measure(
+                lambda i: Reservation.create(
+                    rng.choice(customer_ids), rng.choice(hotel_ids), *stay(i)
+                ),
+                samples,
+            ),
+        }
+    finally:
+        # Nothing deferred may be written after the directory is gone.
+        data_handler.discard()
+        data_handler.invalidate_cache()
+        for p in patchers:
+            p.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "size": size,
+        "backend": type(data_handler.get_backend()).__name__,
+        "operations": results,
+        # ru_maxrss is in KiB on Linux and bytes on macOS.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        // (1024 if sys.platform == "darwin" else 1),
+    }
+
+
+def run(sizes, samples, seed=0):
+    """Run every size in a fresh process so peak RSS is per size."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for size in sizes:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(run_size, (size, samples, seed)))
+    return {
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(base, current):
+    """Return {size: {operation: current ops/sec divided by base ops/sec}}."""
+    base_by_size = {r["size"]: r["operations"] for r in base["results"]}
+    ratios = {}
+    for result in current["results"]:
+        before = base_by_size.get(result["size"])
+        if before is None:
+            continue
+        ratios[result["size"]] = {
+            name: round(stats["ops_per_sec"] / before[name]["ops_per_sec"], 3)
+            for name, stats in result["operations"].items()
+            if name in before and before[name]["ops_per_sec"] and stats["ops_per_sec"]
+        }
+    return ratios
+
+
+def main(argv=None):
+    """Parse arguments and run or compare benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASE", "CURRENT"),
+        help="print ops/sec ratios between two result files",
+    )
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as fh:
+            base = json.load(fh)
+        with open(args.compare[1], encoding="utf-8") as fh:
+            current = json.load(fh)
+        print(json.dumps(compare(base, current), indent=2))
+        return
+    report = run(args.sizes, args.samples, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
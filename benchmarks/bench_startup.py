@@ -0,0 +1,126 @@
+"""
+Benchmark the wall-clock time of short CLI invocations.
+
+Each command runs as a fresh interpreter, the way cron jobs and scripts
+call the CLI, against synthetic data in a temp directory selected with
+HOTEL_DATA_DIR. Results are printed (or written with --output) as JSON:
+
+    python benchmarks/bench_startup.py --size 10000 --runs 30
+    python benchmarks/bench_startup.py --compare base.json run.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+MAIN = os.path.join(SRC, "main.py")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+from bench_crud import _percentile, generate  # noqa: E402
+from helpers import patch_data_dir  # noqa: E402
+
+
+def commands(hotel_id, customer_id):
+    """Return {name: argv} for the benchmarked invocations."""
+    return {
+        "python": [sys.executable, "-c", "pass"],
+        "import_models": [sys.executable, "-c", "import models"],
+        "help": [sys.executable, MAIN, "--help"],
+        "hotel_show": [sys.executable, MAIN, "hotel", "show", hotel_id],
+        "customer_show": [sys.executable, MAIN, "customer", "show", customer_id],
+        "reservations_of_hotel": [
+            sys.executable, MAIN, "list", "reservations", "--hotel", hotel_id,
+        ],
+        "reserve": [
+            sys.executable, MAIN, "reserve", hotel_id, customer_id,
+            "2027-06-01", "2027-06-02",
+        ],
+    }
+
+
+def measure(argv, runs, env):
+    """Run argv runs times and summarise the wall-clock latencies."""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, check=True, stdout=subprocess.DEVNULL, cwd=SRC)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "runs": runs,
+        "min_ms": latencies[0] * 1000,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+    }
+
+
+def run(size, runs, seed=0):
+    """Generate one dataset and time every command on it."""
+    with tempfile.TemporaryDirectory(prefix=f"bench-startup-{size}-") as tmp:
+        with patch.multiple("models.data_handler", **{
+            target.rsplit(".", 1)[1]: value for target, value in patch_data_dir(tmp).items()
+        }):
+            from models import data_handler
+
+            hotel_ids, customer_ids = generate(size, seed)
+            data_handler.flush()
+            data_handler.invalidate_cache()
+        env = dict(os.environ, HOTEL_DATA_DIR=tmp, PYTHONPATH=SRC)
+        results = {}
+        for name, argv in commands(hotel_ids[0], customer_ids[0]).items():
+            # One untimed run writes bytecode caches and warms the page cache.
+            subprocess.run(argv, env=env, check=True, stdout=subprocess.DEVNULL, cwd=SRC)
+            results[name] = measure(argv, runs, env)
+    return {
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "size": size,
+        "commands": results,
+    }
+
+
+def compare(base, current):
+    """Return {command: current p50 divided by base p50}."""
+    return {
+        name: round(stats["p50_ms"] / base["commands"][name]["p50_ms"], 3)
+        for name, stats in current["commands"].items()
+        if name in base["commands"] and base["commands"][name]["p50_ms"]
+    }
+
+
+def main(argv=None):
+    """Parse arguments and run or compare benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="reservations to generate")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASE", "CURRENT"),
+        help="print p50 ratios between two result files",
+    )
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as fh:
+            base = json.load(fh)
+        with open(args.compare[1], encoding="utf-8") as fh:
+            current = json.load(fh)
+        print(json.dumps(compare(base, current), indent=2))
+        return
+    report = run(args.size, args.runs, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Load-test concurrent bookings and check that no hotel is overbooked.
+
+Thread and process workers run a mixed workload (reserve_room,
+cancel_reservation, Customer.create, Hotel.get) against synthetic data
+in a temp directory, redirected the same way as the tests do. Hotels
+are small and the stays bunched into a few weeks so writers contend for
+the last rooms. Afterwards every hotel's peak number of overlapping
+active stays is compared with its total_rooms, and every booking a
+worker was told succeeded is looked up on disk. The report is printed
+(or written with --output) as JSON; the exit status is 1 if the check
+fails.
+
+    python benchmarks/load_test.py --threads 8 --processes 4 --ops 300
+    python benchmarks/load_test.py --processes 8 --duration 30 --session
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+from bench_crud import FIRST_NIGHT, _percentile  # noqa: E402
+from helpers import start_data_dir_patches  # noqa: E402
+from models import Customer, Hotel, Session, data_handler  # noqa: E402
+
+OPERATIONS = ("reserve", "cancel", "customer", "get")
+DEFAULT_MIX = "reserve=50,cancel=15,customer=10,get=25"
+
+
+def parse_mix(text):
+    """Parse "reserve=50,cancel=15,..." into {operation: weight}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}: use {', '.join(OPERATIONS)}.")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("The mix needs at least one operation with a positive weight.")
+    return mix
+
+
+def setup(hotels, customers, max_rooms, seed=0):
+    """
+    Write hotels with 1..max_rooms rooms and customers, with deterministic
+    random data, to the currently patched data files. Returns their IDs.
+    """
+    rng = random.Random(seed)
+    hotel_records, customer_records = {}, {}
+    for i in range(hotels):
+        hotel_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        hotel_records[hotel_id] = {
+            "hotel_id": hotel_id,
+            "name": f"Load Hotel {i}",
+            "address": f"{i} Load Ave",
+            "total_rooms": rng.randint(1, max_rooms),
+            "phone": "555-0000",
+        }
+    for i in range(customers):
+        customer_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        customer_records[customer_id] = {
+            "customer_id": customer_id,
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"load{i}@example.com",
+            "phone": "555-0001",
+        }
+    data_handler.save_json(data_handler.HOTELS_FILE, hotel_records)
+    data_handler.save_json(data_handler.CUSTOMERS_FILE, customer_records)
+    data_handler.save_json(data_handler.RESERVATIONS_FILE, {})
+    data_handler.flush()
+    return list(hotel_records), list(customer_records)
+
+
+def _init_process(tmp):
+    """Point a worker process at the load-test data directory."""
+    start_data_dir_patches(tmp)
+
+
+class _NoSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def worker(spec):
+    """
+    Run one worker's share of the workload and return its raw results:
+    latencies per operation, error and rejection counts, and the
+    bookings it made and cancelled.
+    """
+    rng = random.Random(spec["seed"])
+    names = list(spec["mix"])
+    weights = [spec["mix"][name] for name in names]
+    hotel_ids, customer_ids = spec["hotel_ids"], spec["customer_ids"]
+    scope = Session if spec["session"] else _NoSession
+    latencies = defaultdict(list)
+    errors, rejected = Counter(), Counter()
+    booked, cancelled = [], []
+    started = time.time()
+    deadline = started + spec["duration"] if spec["duration"] else None
+    done = 0
+    while done < spec["ops"] and (deadline is None or time.time() < deadline):
+        name = rng.choices(names, weights)[0]
+        if name == "cancel" and not booked:
+            name = "reserve"
+        start = time.perf_counter()
+        try:
+            with scope():
+                if name == "reserve":
+                    check_in = FIRST_NIGHT + timedelta(days=rng.randrange(spec["nights"]))
+                    check_out = check_in + timedelta(days=rng.randint(1, 4))
+                    hotel = Hotel.get(rng.choice(hotel_ids))
+                    try:
+                        reservation = hotel.reserve_room(
+                            rng.choice(customer_ids), check_in.isoformat(), check_out.isoformat()
+                        )
+                    except ValueError:
+                        rejected[name] += 1
+                    else:
+                        booked.append((hotel.hotel_id, reservation.reservation_id))
+                elif name == "cancel":
+                    hotel_id, reservation_id = booked.pop(rng.randrange(len(booked)))
+                    Hotel.get(hotel_id).cancel_reservation(reservation_id)
+                    cancelled.append(reservation_id)
+                elif name == "customer":
+                    Customer.create(
+                        "Load", f"Worker{spec['worker']}",
+                        f"w{spec['worker']}-{done}@load.example.com",
+                    )
+                else:
+                    Hotel.get(rng.choice(hotel_ids))
+        except Exception as exc:  # pylint: disable=broad-except
+            errors[f"{name}: {type(exc).__name__}: {exc}"] += 1
+        latencies[name].append(time.perf_counter() - start)
+        done += 1
+    # Pool processes end with os._exit, which skips the atexit flush, so
+    # write what write-behind still holds before reporting.
+    data_handler.flush()
+    return {
+        "started": started,
+        "finished": time.time(),
+        "latencies": dict(latencies),
+        "errors": dict(errors),
+        "rejected": dict(rejected),
+        "booked": [reservation_id for _, reservation_id in booked],
+        "cancelled": cancelled,
+    }
+
+
+def peak_occupancy(reservations):
+    """
+    Return {hotel_id: (peak, first night at the peak)} over the active
+    reservations, by sweeping check-ins and check-outs in date order.
+    """
+    events = defaultdict(list)
+    for record in reservations.values():
+        if record.get("status", "active") != "active":
+            continue
+        # At the same date a check-out (-1) frees the room before a check-in.
+        events[record["hotel_id"]].append((record["check_in"], 1))
+        events[record["hotel_id"]].append((record["check_out"], -1))
+    peaks = {}
+    for hotel_id, changes in events.items():
+        changes.sort(key=lambda change: (change[0], change[1]))
+        current, peak = 0, (0, None)
+        for night, delta in changes:
+            current += delta
+            if current > peak[0]:
+                peak = (current, night)
+        peaks[hotel_id] = peak
+    return peaks
+
+
+def verify(results):
+    """
+    Re-read the data files and check that no hotel is overbooked on any
+    night and that every reported booking and cancellation was stored.
+    """
+    data_handler.invalidate_cache()
+    hotels = data_handler.load_json(data_handler.HOTELS_FILE)
+    reservations = data_handler.load_json(data_handler.RESERVATIONS_FILE)
+    overbooked = []
+    for hotel_id, (peak, night) in sorted(peak_occupancy(reservations).items()):
+        total_rooms = int(hotels[hotel_id]["total_rooms"]) if hotel_id in hotels else 0
+        if peak > total_rooms:
+            overbooked.append({
+                "hotel_id": hotel_id, "total_rooms": total_rooms,
+                "peak": peak, "night": night,
+            })
+    missing = [
+        rid for result in results for rid in result["booked"] if rid not in reservations
+    ]
+    not_cancelled = [
+        rid for result in results for rid in result["cancelled"]
+        if reservations.get(rid, {}).get("status") != "cancelled"
+    ]
+    return {
+        "hotels": len(hotels),
+        "reservations": len(reservations),
+        "active": sum(1 for r in reservations.values() if r.get("status") == "active"),
+        "overbooked": overbooked,
+        "missing_bookings": missing,
+        "lost_cancellations": not_cancelled,
+        "ok": not (overbooked or missing or not_cancelled),
+    }
+
+
+def summarize(results, wall):
+    """Merge the workers' results into per-operation throughput and latency."""
+    latencies, errors, rejected = defaultdict(list), Counter(), Counter()
+    for result in results:
+        for name, values in result["latencies"].items():
+            latencies[name].extend(values)
+        errors.update(result["errors"])
+        rejected.update(result["rejected"])
+    operations = {}
+    for name in OPERATIONS:
+        values = sorted(latencies.get(name, ()))
+        if not values:
+            continue
+        failed = sum(count for key, count in errors.items() if key.startswith(name + ":"))
+        operations[name] = {
+            "count": len(values),
+            "errors": failed,
+            "rejected": rejected.get(name, 0),
+            "ops_per_sec": len(values) / wall if wall else None,
+            "p50_ms": _percentile(values, 0.50) * 1000,
+            "p95_ms": _percentile(values, 0.95) * 1000,
+            "p99_ms": _percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    total = sum(len(values) for values in latencies.values())
+    booked = operations.get("reserve", {})
+    return {
+        "wall_s": wall,
+        "operations_total": total,
+        "ops_per_sec": total / wall if wall else None,
+        "bookings_per_sec": (
+            (booked["count"] - booked["errors"] - booked["rejected"]) / wall
+            if booked and wall else 0.0
+        ),
+        "operations": operations,
+        "errors": dict(errors.most_common(20)),
+    }
+
+
+def run(threads=4, processes=2, ops=200, duration=None, hotels=20, customers=200,
+        max_rooms=3, nights=28, mix=DEFAULT_MIX, session=False, seed=0):
+    """Set up a temp data directory, run the workers and verify the result."""
+    if threads < 0 or processes < 0 or threads + processes == 0:
+        raise ValueError("Run at least one thread or process worker.")
+    tmp = tempfile.mkdtemp(prefix="load-test-")
+    patchers = start_data_dir_patches(tmp)
+    try:
+        hotel_ids, customer_ids = setup(hotels, customers, max_rooms, seed)
+        base = {
+            "mix": parse_mix(mix), "ops": ops if ops else float("inf"),
+            "duration": duration, "nights": nights, "session": session,
+            "hotel_ids": hotel_ids, "customer_ids": customer_ids,
+        }
+        specs = [
+            dict(base, worker=i, seed=seed + 1 + i) for i in range(threads + processes)
+        ]
+        futures = []
+        with ThreadPoolExecutor(max(threads, 1)) as thread_pool, ProcessPoolExecutor(
+            max(processes, 1), mp_context=get_context("spawn"),
+            initializer=_init_process, initargs=(tmp,),
+        ) as process_pool:
+            futures += [process_pool.submit(worker, spec) for spec in specs[threads:]]
+            futures += [thread_pool.submit(worker, spec) for spec in specs[:threads]]
+            results = [future.result() for future in futures]
+        # From the first worker starting to the last finishing, leaving out
+        # the start-up of the worker processes.
+        wall = max(r["finished"] for r in results) - min(r["started"] for r in results)
+        data_handler.flush()
+        report = {
+            "python": sys.version.split()[0],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": type(data_handler.get_backend()).__name__,
+            "config": {
+                "threads": threads, "processes": processes, "ops_per_worker": ops,
+                "duration_s": duration, "hotels": hotels, "customers": customers,
+                "max_rooms": max_rooms, "nights": nights, "mix": base["mix"],
+                "session": session, "seed": seed,
+            },
+            **summarize(results, wall),
+            "verification": verify(results),
+        }
+    finally:
+        # Nothing deferred may be written after the directory is gone.
+        data_handler.discard()
+        data_handler.invalidate_cache()
+        for p in patchers:
+            p.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    """Parse arguments, run the load test and report; returns the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4, help="thread workers")
+    parser.add_argument("--processes", type=int, default=2, help="process workers")
+    parser.add_argument("--ops", type=int, default=200,
+                        help="operations per worker (0: until --duration ends)")
+    parser.add_argument("--duration", type=float, help="stop each worker after this many seconds")
+    parser.add_argument("--hotels", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--max-rooms", type=int, default=3,
+                        help="hotels get 1 to this many rooms")
+    parser.add_argument("--nights", type=int, default=28,
+                        help="check-ins fall within this many nights")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--session", action="store_true",
+                        help="run each operation in a models Session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if not args.ops and not args.duration:
+        parser.error("--ops 0 needs --duration")
+    try:
+        report = run(
+            args.threads, args.processes, args.ops, args.duration, args.hotels,
+            args.customers, args.max_rooms, args.nights, args.mix, args.session, args.seed,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0 if report["verification"]["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
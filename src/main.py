@@ -2,23 +2,360 @@
 Hotel Reservation System - Core Models
 Implements Hotel, Customer, and Reservation abstractions
 with file-based persistence.
+
+    python src/main.py [--json] COMMAND
+
+    list [hotels|customers|reservations]    show every record (hotels by
+        [--hotel ID] [--customer ID]        default, also with no COMMAND)
+    hotel show ID                           show one hotel; likewise
+    customer show ID                        "customer show" and
+    reservation show ID                     "reservation show"
+    search CHECK_IN CHECK_OUT [--rooms N]   hotels with N rooms free for the
+        [--sort KEY] [--offset N] [--limit N]  whole stay
+    reserve HOTEL_ID CUSTOMER_ID CHECK_IN CHECK_OUT
+                                            book a room, print its ID
+    cancel RESERVATION_ID                   cancel a reservation
+    archive [--before DATE] [--keep-cancelled] [--codec CODEC]
+                                            move finished and cancelled
+                                            stays to compressed monthly files
+    history [--since YYYY-MM] [--until YYYY-MM] [--hotel ID] [--customer ID]
+                                            show archived reservations
+    changes [--offset N] [--follow]         print change events as JSON lines,
+                                            each with the offset after it
+    export OUT_DIR [--codec CODEC]          write all data files to OUT_DIR
+                                            as indented JSON
+    check [--repair] [--quarantine] [--workers N]
+                                            check records, references,
+                                            occupancy and file names; exit
+                                            status 1 if problems remain
+    shards COLLECTION COUNT                 split a collection into COUNT
+                                            files (1 merges them back)
+
+--json prints records as JSON, one object per line. Each command imports
+only the model it needs and reads only the records it needs, so scripts
+and cron jobs can call the CLI cheaply. Errors go to stderr with exit
+status 1.
 """
-import uuid
-import time
-from datetime import date
-import models.data_handler as data_handler
-from models.hotel import Hotel
+import argparse
+import importlib
+import json
+import os
+import sys
+
+# Collection name -> (module, class), imported on first use.
+MODELS = {
+    "hotel": ("models.hotel", "Hotel"),
+    "customer": ("models.customer", "Customer"),
+    "reservation": ("models.reservation", "Reservation"),
+}
+
+
+def _model(kind):
+    module, name = MODELS[kind]
+    return getattr(importlib.import_module(module), name)
+
+
+def _emit(record, as_json):
+    if as_json:
+        print(json.dumps(record.to_dict()))
+    else:
+        record.display()
+        print()
+
+
+def _fail(message):
+    print(f"error: {message}", file=sys.stderr)
+    return 1
+
+
+def export(out_dir, codec="json-pretty"):
+    """Write every collection to out_dir with codec; returns {file: records}."""
+    from models import data_handler
+
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    for filepath in (
+        data_handler.HOTELS_FILE,
+        data_handler.CUSTOMERS_FILE,
+        data_handler.RESERVATIONS_FILE,
+    ):
+        name = os.path.basename(filepath)
+        counts[name] = data_handler.export_file(
+            filepath, os.path.join(out_dir, name), codec
+        )
+    return counts
+
+
+def cmd_list(args):
+    """Stream a collection so memory stays flat however large the file is."""
+    kind = args.collection.rstrip("s")
+    if kind == "reservation" and (args.hotel or args.customer):
+        Reservation = _model("reservation")
+        if args.hotel:
+            records = Reservation.for_hotel(args.hotel)
+            if args.customer:
+                records = [r for r in records if r.customer_id == args.customer]
+        else:
+            records = Reservation.for_customer(args.customer)
+    else:
+        records = _model(kind).iter_all()
+    for record in records:
+        _emit(record, args.json)
+    return 0
+
+
+def cmd_show(args):
+    record = _model(args.kind).get(args.id)
+    if record is None:
+        return _fail(f"{args.kind} {args.id} not found")
+    _emit(record, args.json)
+    return 0
+
+
+def cmd_search(args):
+    try:
+        results = _model("hotel").search_available(
+            args.check_in, args.check_out, args.rooms, args.sort, args.offset, args.limit
+        )
+    except ValueError as exc:
+        return _fail(exc)
+    for hotel, free in results:
+        if args.json:
+            print(json.dumps({**hotel.to_dict(), "available_rooms": free}))
+        else:
+            print(f"{hotel.hotel_id}  {free:>5} free  {hotel.name}")
+    return 0
+
+
+def cmd_reserve(args):
+    # One session: the checks and the booking share the locks, and the
+    # reservations file is written once.
+    with importlib.import_module("models.session").Session():
+        hotel = _model("hotel").get(args.hotel_id)
+        if hotel is None:
+            return _fail(f"hotel {args.hotel_id} not found")
+        if _model("customer").get(args.customer_id) is None:
+            return _fail(f"customer {args.customer_id} not found")
+        try:
+            reservation = hotel.reserve_room(args.customer_id, args.check_in, args.check_out)
+        except ValueError as exc:
+            return _fail(exc)
+    if args.json:
+        print(json.dumps(reservation.to_dict()))
+    else:
+        print(reservation.reservation_id)
+    return 0
+
+
+def cmd_cancel(args):
+    reservation = _model("reservation").get(args.reservation_id)
+    if reservation is None:
+        return _fail(f"reservation {args.reservation_id} not found")
+    if not reservation.cancel():
+        print(f"Reservation {args.reservation_id} was already cancelled", file=sys.stderr)
+    if args.json:
+        print(json.dumps(reservation.to_dict()))
+    return 0
+
+
+def cmd_archive(args):
+    try:
+        moved = _model("reservation").archive(
+            args.before, not args.keep_cancelled, args.codec
+        )
+    except ValueError as exc:
+        return _fail(exc)
+    if args.json:
+        print(json.dumps(moved))
+        return 0
+    for month, count in moved.items():
+        print(f"Archived {count} reservations checking in {month}")
+    return 0
+
+
+def cmd_check(args):
+    integrity = importlib.import_module("models.integrity")
+    try:
+        report = integrity.check(args.repair, args.quarantine, args.workers)
+    except ValueError as exc:
+        return _fail(exc)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for problem in report["problems"]:
+            action = f" [{problem['action']}]" if problem["action"] else ""
+            print(
+                f"{problem['kind']}: {problem['collection']} {problem['id']}: "
+                f"{problem['message']}{action}"
+            )
+        checked = ", ".join(f"{count} {name}" for name, count in report["checked"].items())
+        print(
+            f"Checked {checked}: {len(report['problems'])} problems, "
+            f"{report['unresolved']} unresolved"
+        )
+    return 1 if report["unresolved"] else 0
+
+
+def cmd_history(args):
+    try:
+        records = _model("reservation").history(
+            args.since, args.until, args.hotel, args.customer
+        )
+    except ValueError as exc:
+        return _fail(exc)
+    for record in records:
+        _emit(record, args.json)
+    return 0
+
+
+def cmd_changes(args):
+    from models import changefeed
+
+    for offset, event in changefeed.tail(args.offset, follow=args.follow):
+        print(json.dumps({"offset": offset, **event}), flush=args.follow)
+    return 0
+
+
+def cmd_export(args):
+    try:
+        counts = export(args.out_dir, args.codec)
+    except (ImportError, ValueError) as exc:
+        return _fail(exc)
+    for name, count in counts.items():
+        print(f"Exported {count} records to {os.path.join(args.out_dir, name)}")
+    return 0
+
+
+def cmd_shards(args):
+    from models import data_handler
+
+    filepath = getattr(data_handler, f"{args.collection.upper()}_FILE")
+    try:
+        data_handler.set_shards(filepath, args.count)
+    except ValueError as exc:
+        return _fail(exc)
+    count = len(data_handler.shard_paths(filepath))
+    print(f"Stored {args.collection} in {count} file{'s' if count > 1 else ''}")
+    return 0
+
+
+def build_parser():
+    """Return the argument parser of the CLI."""
+    parser = argparse.ArgumentParser(description="Hotel reservation system")
+    parser.add_argument("--json", action="store_true", help="print records as JSON lines")
+    parser.set_defaults(func=cmd_list, collection="hotels", hotel=None, customer=None)
+    commands = parser.add_subparsers(dest="command")
+
+    list_parser = commands.add_parser("list", help="show every record of a collection")
+    list_parser.add_argument(
+        "collection", nargs="?", default="hotels",
+        choices=("hotels", "customers", "reservations"),
+    )
+    list_parser.add_argument("--hotel", help="only reservations of this hotel")
+    list_parser.add_argument("--customer", help="only reservations of this customer")
+    list_parser.set_defaults(func=cmd_list)
+
+    for kind in MODELS:
+        kind_parser = commands.add_parser(kind, help=f"look up one {kind}")
+        actions = kind_parser.add_subparsers(dest="action", required=True)
+        show_parser = actions.add_parser("show", help=f"show one {kind}")
+        show_parser.add_argument("id")
+        show_parser.set_defaults(func=cmd_show, kind=kind)
+
+    search_parser = commands.add_parser("search", help="find hotels with free rooms")
+    search_parser.add_argument("check_in", help="YYYY-MM-DD")
+    search_parser.add_argument("check_out", help="YYYY-MM-DD")
+    search_parser.add_argument("--rooms", type=int, default=1, help="minimum free rooms")
+    search_parser.add_argument(
+        "--sort", default="available", choices=("available", "name", "hotel_id")
+    )
+    search_parser.add_argument("--offset", type=int, default=0)
+    search_parser.add_argument("--limit", type=int)
+    search_parser.set_defaults(func=cmd_search)
+
+    reserve_parser = commands.add_parser("reserve", help="book a room")
+    reserve_parser.add_argument("hotel_id")
+    reserve_parser.add_argument("customer_id")
+    reserve_parser.add_argument("check_in", help="YYYY-MM-DD")
+    reserve_parser.add_argument("check_out", help="YYYY-MM-DD")
+    reserve_parser.set_defaults(func=cmd_reserve)
+
+    cancel_parser = commands.add_parser("cancel", help="cancel a reservation")
+    cancel_parser.add_argument("reservation_id")
+    cancel_parser.set_defaults(func=cmd_cancel)
+
+    archive_parser = commands.add_parser(
+        "archive", help="move finished and cancelled reservations to the archive"
+    )
+    archive_parser.add_argument("--before", help="archive stays checked out by YYYY-MM-DD")
+    archive_parser.add_argument(
+        "--keep-cancelled", action="store_true", help="leave cancelled future stays"
+    )
+    archive_parser.add_argument("--codec", choices=("json-gzip", "json-lzma"))
+    archive_parser.set_defaults(func=cmd_archive)
+
+    history_parser = commands.add_parser("history", help="show archived reservations")
+    history_parser.add_argument("--since", help="first check-in month, YYYY-MM")
+    history_parser.add_argument("--until", help="last check-in month, YYYY-MM")
+    history_parser.add_argument("--hotel")
+    history_parser.add_argument("--customer")
+    history_parser.set_defaults(func=cmd_history)
+
+    changes_parser = commands.add_parser("changes", help="print the change feed")
+    changes_parser.add_argument(
+        "--offset", type=int, default=0, help="resume after this offset"
+    )
+    changes_parser.add_argument(
+        "--follow", action="store_true", help="keep waiting for new changes"
+    )
+    changes_parser.set_defaults(func=cmd_changes)
+
+    export_parser = commands.add_parser(
+        "export", help="write the data files in a human-readable format"
+    )
+    export_parser.add_argument("out_dir")
+    export_parser.add_argument(
+        "--codec", default="json-pretty",
+        choices=sorted(importlib.import_module("models.serialization").CODECS),
+    )
+    export_parser.set_defaults(func=cmd_export)
+
+    check_parser = commands.add_parser("check", help="check the integrity of the data")
+    check_parser.add_argument(
+        "--repair", action="store_true",
+        help="cancel orphaned reservations and move misnamed files' records",
+    )
+    check_parser.add_argument(
+        "--quarantine", action="store_true",
+        help="move invalid and orphaned records to the quarantine directory",
+    )
+    check_parser.add_argument(
+        "--workers", type=int, help="processes to check with (default: by data size)"
+    )
+    check_parser.set_defaults(func=cmd_check)
+
+    shards_parser = commands.add_parser(
+        "shards", help="change how many files a collection is split into"
+    )
+    shards_parser.add_argument("collection", choices=("hotels", "customers", "reservations"))
+    shards_parser.add_argument("count", type=int)
+    shards_parser.set_defaults(func=cmd_shards)
+    return parser
+
 
+def main(argv=None):
+    """Main function, starting point of the CLI; returns the exit status."""
+    args = build_parser().parse_args(argv)
+    from models import instrumentation
 
-def main():
-    """Main function, starting point of the CLI"""
-    start_time = time.time()
-    hotels_json = data_handler.load_json(data_handler.HOTELS_FILE)
-    hotels = []
-    for hotel_id, record in hotels_json.items():
-        hotels.append(Hotel.from_dict(record))
-    print(hotels)
+    instrumentation.configure_logging()
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # The reader (e.g. "| head") went away; exit quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
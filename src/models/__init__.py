@@ -1,4 +1,32 @@
-from .hotel import Hotel
-from .customer import Customer
-from .reservation import Reservation
-from . import data_handler
\ No newline at end of file
+"""
+Hotel, Customer and Reservation models with file-based persistence.
+
+Submodules are imported on first use (PEP 562), so "from models import
+Hotel" loads only what Hotel needs and short-lived scripts stay fast.
+"""
+import importlib
+
+_LAZY = {
+    "Hotel": ("models.hotel", "Hotel"),
+    "Customer": ("models.customer", "Customer"),
+    "Reservation": ("models.reservation", "Reservation"),
+    "Session": ("models.session", "Session"),
+}
+
+__all__ = ["Hotel", "Customer", "Reservation", "Session", "data_handler"]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module, attr = _LAZY[name]
+        value = getattr(importlib.import_module(module), attr)
+    elif name in ("changefeed", "data_handler", "instrumentation", "serialization"):
+        value = importlib.import_module(f"models.{name}")
+    else:
+        raise AttributeError(f"module 'models' has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
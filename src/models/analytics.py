@@ -0,0 +1,165 @@
+"""
+Occupancy, length-of-stay and cancellation analytics over reservations.
+
+Computation is vectorised with NumPy on top of the columnar
+ReservationTable, so no Reservation objects are built. NumPy is an
+optional dependency and is only required when these functions run.
+"""
+from . import data_handler
+from .availability import to_ordinal
+from .reservation import Reservation
+from .reservation_table import DELETED, NO_DATE
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("models.analytics requires numpy: pip install numpy")
+
+
+def _columns(table):
+    """Return the table columns as NumPy arrays without copying them."""
+    rows = len(table.reservation_ids)
+    hotel = np.frombuffer(table.hotel, dtype=np.int32, count=rows)
+    check_in = np.frombuffer(table.check_in, dtype=np.int32, count=rows)
+    check_out = np.frombuffer(table.check_out, dtype=np.int32, count=rows)
+    active = np.unpackbits(
+        np.frombuffer(bytes(table.active_bits), dtype=np.uint8), bitorder="little"
+    )[:rows].astype(bool)
+    return hotel, check_in, check_out, active
+
+
+def _total_rooms():
+    """Return {hotel_id: total_rooms} for every stored hotel."""
+    rooms = {}
+    for hotel_id, record in data_handler.iter_records(data_handler.HOTELS_FILE):
+        total = record.get("total_rooms")
+        if isinstance(total, int) and total > 0:
+            rooms[hotel_id] = total
+    return rooms
+
+
+def nightly_booked(start, end, table=None):
+    """
+    Return (hotel_ids, booked) where booked[i, n] is the rooms of
+    hotel_ids[i] taken on the n-th night from start up to end.
+
+    Each active stay is clipped to the range and added to a difference
+    array (+1 on its first night, -1 after its last); a cumulative sum
+    along the nights axis turns that into per-night counts.
+    """
+    _require_numpy()
+    table = table if table is not None else Reservation.table()
+    first, last = to_ordinal(start), to_ordinal(end)
+    nights = max(last - first, 0)
+    hotel, check_in, check_out, active = _columns(table)
+    hotel_ids = list(table.hotel_ids)
+    keep = active & (hotel != DELETED) & (check_in != NO_DATE) & (check_out != NO_DATE)
+    lo = np.clip(check_in[keep].astype(np.int64) - first, 0, nights)
+    hi = np.clip(check_out[keep].astype(np.int64) - first, 0, nights)
+    codes = hotel[keep].astype(np.int64)
+    overlaps = lo < hi
+    lo, hi, codes = lo[overlaps], hi[overlaps], codes[overlaps]
+    width = nights + 1
+    diff = np.zeros(len(hotel_ids) * width, dtype=np.int64)
+    np.add.at(diff, codes * width + lo, 1)
+    np.add.at(diff, codes * width + hi, -1)
+    booked = np.cumsum(diff.reshape(len(hotel_ids), width), axis=1)[:, :nights]
+    return hotel_ids, booked
+
+
+def occupancy_rates(start, end, table=None):
+    """
+    Return {hotel_id: array of nightly occupancy rates} from start to end.
+    Every stored hotel is included, with zeros when it has no bookings.
+    """
+    _require_numpy()
+    hotel_ids, booked = nightly_booked(start, end, table)
+    rows = {hotel_id: row for row, hotel_id in enumerate(hotel_ids)}
+    nights = booked.shape[1]
+    rates = {}
+    for hotel_id, total in _total_rooms().items():
+        row = rows.get(hotel_id)
+        if row is None:
+            rates[hotel_id] = np.zeros(nights)
+        else:
+            rates[hotel_id] = booked[row] / total
+    return rates
+
+
+def _per_hotel(table, values, mask):
+    """Return per-hotel-code sums of values over mask, and row counts."""
+    hotel = _columns(table)[0]
+    codes = hotel[mask].astype(np.int64)
+    size = len(table.hotel_ids)
+    sums = np.bincount(codes, weights=values[mask], minlength=size)
+    counts = np.bincount(codes, minlength=size)
+    return sums, counts
+
+
+def _stays_in(table, start, end):
+    """Return a mask of stored stays whose check-in falls in [start, end)."""
+    hotel, check_in, check_out, _ = _columns(table)
+    mask = (hotel != DELETED) & (check_in != NO_DATE) & (check_out != NO_DATE)
+    if start is not None:
+        mask &= check_in >= to_ordinal(start)
+    if end is not None:
+        mask &= check_in < to_ordinal(end)
+    return mask
+
+
+def average_length_of_stay(start=None, end=None, table=None):
+    """
+    Return {hotel_id: mean nights} of active stays checking in from start
+    up to end (either bound may be None).
+    """
+    _require_numpy()
+    table = table if table is not None else Reservation.table()
+    _, check_in, check_out, active = _columns(table)
+    mask = _stays_in(table, start, end) & active & (check_out > check_in)
+    nights = (check_out.astype(np.int64) - check_in).astype(float)
+    sums, counts = _per_hotel(table, nights, mask)
+    return {
+        table.hotel_ids[code]: sums[code] / counts[code]
+        for code in np.nonzero(counts)[0]
+    }
+
+
+def cancellation_rates(start=None, end=None, table=None):
+    """
+    Return {hotel_id: cancelled / all reservations} for stays checking in
+    from start up to end (either bound may be None).
+    """
+    _require_numpy()
+    table = table if table is not None else Reservation.table()
+    active = _columns(table)[3]
+    mask = _stays_in(table, start, end)
+    cancelled, counts = _per_hotel(table, (~active).astype(float), mask)
+    return {
+        table.hotel_ids[code]: cancelled[code] / counts[code]
+        for code in np.nonzero(counts)[0]
+    }
+
+
+def report(start, end, table=None):
+    """
+    Return a plain-dict summary per hotel for start to end: mean
+    occupancy, peak nightly occupancy, average stay and cancellation rate.
+    """
+    table = table if table is not None else Reservation.table()
+    rates = occupancy_rates(start, end, table)
+    stays = average_length_of_stay(start, end, table)
+    cancels = cancellation_rates(start, end, table)
+    return {
+        hotel_id: {
+            "occupancy_mean": float(rate.mean()) if rate.size else 0.0,
+            "occupancy_peak": float(rate.max()) if rate.size else 0.0,
+            "average_length_of_stay": float(stays.get(hotel_id, 0.0)),
+            "cancellation_rate": float(cancels.get(hotel_id, 0.0)),
+        }
+        for hotel_id, rate in rates.items()
+    }
@@ -0,0 +1,150 @@
+"""
+Cold storage for reservations that no longer affect availability.
+
+archive_reservations() moves cancelled reservations and stays that have
+checked out from the hot reservations file into one compressed file
+per check-in month:
+
+    <data dir>/archive/reservations-2026-03.json.gz
+
+so loading, indexing and writing the hot file only ever covers current
+and future stays. Archived reservations are read back only through the
+historical API here (archived_months, iter_archived, get_archived) and
+Reservation.history / Reservation.get_archived; a query for a range of
+months opens only the files of those months.
+
+HOTEL_ARCHIVE_CODEC picks json-gzip (the default) or json-lzma, which is
+smaller and slower. Partitions written with either are read back alike.
+"""
+import logging
+import os
+from collections import defaultdict
+from datetime import date
+
+from . import changefeed, data_handler, serialization
+from .availability import STATUS_ACTIVE, to_ordinal
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = "archive"
+PREFIX = "reservations-"
+# File suffix of each codec archives can be written with.
+SUFFIXES = {"json-gzip": ".json.gz", "json-lzma": ".json.xz"}
+
+
+def archive_dir(filepath=None):
+    """Return the directory holding the archive of the reservations at filepath."""
+    filepath = filepath or data_handler.RESERVATIONS_FILE
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), DIRECTORY)
+
+
+def _month(value):
+    """Return "YYYY-MM" for a date, ISO date string or "YYYY-MM" string."""
+    if isinstance(value, date):
+        return value.isoformat()[:7]
+    value = str(value)
+    to_ordinal(value if len(value) > 7 else value + "-01")
+    return value[:7]
+
+
+def archived_months(filepath=None):
+    """Return {"YYYY-MM": [partition paths]} for every archived month, in order."""
+    directory = archive_dir(filepath)
+    if not os.path.isdir(directory):
+        return {}
+    months = defaultdict(list)
+    for name in sorted(os.listdir(directory)):
+        for suffix in SUFFIXES.values():
+            if name.startswith(PREFIX) and name.endswith(suffix):
+                months[name[len(PREFIX):-len(suffix)]].append(os.path.join(directory, name))
+    return dict(sorted(months.items()))
+
+
+def _read_month(paths):
+    records = {}
+    for path in paths:
+        records.update(data_handler.JsonFileBackend().read(path))
+    return records
+
+
+def _archivable(record, cutoff, cancelled):
+    """Return the check-in month of record if it belongs in the archive."""
+    try:
+        month = _month(record["check_in"])
+        checked_out = to_ordinal(record["check_out"]) <= cutoff
+    except (KeyError, ValueError):
+        # Left in place for whoever repairs the record.
+        return None
+    if checked_out or (cancelled and (record.get("status") or STATUS_ACTIVE) != STATUS_ACTIVE):
+        return month
+    return None
+
+
+def archive_reservations(before=None, cancelled=True, codec=None, filepath=None):
+    """
+    Move every reservation that checked out on or before the date before
+    (today by default), and every cancelled one unless cancelled is
+    False, into the archive partition of its check-in month.
+
+    Partitions are rewritten before the records leave the hot file, so
+    an interrupted run leaves copies in both places rather than losing
+    any; running it again finishes the move. Returns {month: moved}.
+    """
+    filepath = filepath or data_handler.RESERVATIONS_FILE
+    cutoff = to_ordinal(before or date.today())
+    codec = serialization.get_codec(
+        codec or os.environ.get("HOTEL_ARCHIVE_CODEC") or "json-gzip"
+    )
+    if codec.name not in SUFFIXES:
+        raise ValueError(f"Archives must be compressed: use one of {', '.join(SUFFIXES)}.")
+    backend = data_handler.JsonFileBackend(codec=codec.name)
+    directory = archive_dir(filepath)
+    with data_handler.locked(filepath):
+        by_month = defaultdict(dict)
+        for key, record in data_handler.iter_records(filepath):
+            month = _archivable(record, cutoff, cancelled)
+            if month is not None:
+                by_month[month][key] = record
+        if not by_month:
+            return {}
+        os.makedirs(directory, exist_ok=True)
+        existing = archived_months(filepath)
+        for month, records in sorted(by_month.items()):
+            target = os.path.join(directory, f"{PREFIX}{month}{SUFFIXES[codec.name]}")
+            old_paths = existing.get(month, [])
+            backend.write(target, {**_read_month(old_paths), **records})
+            for path in old_paths:
+                if path != target:
+                    os.remove(path)
+        with data_handler.batch():
+            for records in by_month.values():
+                for key in records:
+                    data_handler.delete_record(filepath, key)
+        changefeed.publish(filepath, [
+            ("archive", key, None) for records in by_month.values() for key in records
+        ])
+    moved = {month: len(records) for month, records in sorted(by_month.items())}
+    logger.info("Archived %d reservations", sum(moved.values()), extra={"months": moved})
+    return moved
+
+
+def iter_archived(since=None, until=None, filepath=None):
+    """
+    Yield (reservation_id, record) pairs of archived reservations whose
+    check-in month lies between since and until (dates or "YYYY-MM",
+    both inclusive), reading only the partitions of those months.
+    """
+    first = _month(since) if since is not None else None
+    last = _month(until) if until is not None else None
+    for month, paths in archived_months(filepath).items():
+        if (first is None or month >= first) and (last is None or month <= last):
+            yield from _read_month(paths).items()
+
+
+def get_archived(reservation_id, filepath=None):
+    """Return the archived record of reservation_id, or None."""
+    for paths in reversed(list(archived_months(filepath).values())):
+        record = _read_month(paths).get(str(reservation_id))
+        if record is not None:
+            return record
+    return None
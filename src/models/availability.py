@@ -0,0 +1,125 @@
+from collections import Counter, defaultdict
+from datetime import date
+
+# Mirror Reservation's constants; importing them would be circular.
+STATUS_ACTIVE = "active"
+STATUS_CANCELLED = "cancelled"
+REQUIRED_FIELDS = {"reservation_id", "customer_id", "hotel_id", "check_in", "check_out"}
+
+
+def to_ordinal(day):
+    """Return the ordinal of a date or ISO date string, raising ValueError."""
+    if isinstance(day, date):
+        return day.toordinal()
+    return date.fromisoformat(str(day)).toordinal()
+
+
+class OccupancyIndex:
+    """
+    Rooms booked per hotel and per night, built from reservation records.
+
+    Each active reservation adds one to every night from check_in up to,
+    but not including, check_out, so the rooms taken over a stay is the
+    peak of its nights and costs O(nights) instead of a scan of every
+    reservation in the system.
+    """
+
+    def __init__(self):
+        self._nights = defaultdict(Counter)
+        self._active = Counter()
+
+    @classmethod
+    def build(cls, items):
+        """Build the index from (reservation_id, record) pairs."""
+        index = cls()
+        for _, record in items:
+            index._add(record, 1)
+        return index
+
+    def apply(self, key, old, new):
+        """Replace the contribution of old with that of new (either may be None)."""
+        if old is not None:
+            self._add(old, -1)
+        if new is not None:
+            self._add(new, 1)
+
+    def _add(self, record, delta):
+        if (record.get("status") or STATUS_ACTIVE) != STATUS_ACTIVE:
+            return
+        if not REQUIRED_FIELDS <= record.keys():
+            return
+        hotel_id = str(record["hotel_id"])
+        self._active[hotel_id] += delta
+        try:
+            start = to_ordinal(record.get("check_in"))
+            end = to_ordinal(record.get("check_out"))
+        except ValueError:
+            return
+        nights = self._nights[hotel_id]
+        for night in range(start, end):
+            nights[night] += delta
+            if not nights[night]:
+                del nights[night]
+
+    def active_count(self, hotel_id):
+        """Return the number of active reservations held by a hotel."""
+        return self._active[str(hotel_id)]
+
+    def booked(self, hotel_id, check_in, check_out):
+        """Return the most rooms booked on any night from check_in to check_out."""
+        nights = self._nights.get(str(hotel_id))
+        if not nights:
+            return 0
+        start, end = to_ordinal(check_in), to_ordinal(check_out)
+        return max((nights.get(night, 0) for night in range(start, end)), default=0)
+
+    def booked_by_hotel(self, check_in, check_out):
+        """
+        Return {hotel_id: most rooms booked on any night from check_in to
+        check_out} for every hotel with a booking in that range.
+        """
+        start, end = to_ordinal(check_in), to_ordinal(check_out)
+        stay = range(start, end)
+        booked = {}
+        for hotel_id, nights in self._nights.items():
+            # Walk whichever is shorter: the stay or the hotel's booked nights.
+            if len(stay) <= len(nights):
+                get = nights.get
+                counts = [get(night, 0) for night in stay]
+            else:
+                counts = [count for night, count in nights.items() if start <= night < end]
+            peak = max(counts, default=0)
+            if peak:
+                booked[hotel_id] = peak
+        return booked
+
+
+class CapacityIndex:
+    """
+    Total rooms and name of every valid hotel record, so a search over all
+    hotels reads neither the hotel file nor its records on every call.
+    """
+
+    def __init__(self):
+        self._hotels = {}
+
+    @classmethod
+    def build(cls, items):
+        """Build the index from (hotel_id, record) pairs."""
+        index = cls()
+        for key, record in items:
+            index.apply(key, None, record)
+        return index
+
+    def apply(self, key, old, new):
+        """Replace the entry of key with the capacity of new (or drop it)."""
+        self._hotels.pop(key, None)
+        if new is None:
+            return
+        total = new.get("total_rooms")
+        if isinstance(total, int) and total > 0 and "name" in new and "address" in new:
+            self._hotels[key] = (total, str(new["name"]))
+
+    def items(self):
+        """Return (hotel_id, (total_rooms, name)) pairs."""
+        return self._hotels.items()
@@ -0,0 +1,146 @@
+import csv
+import json
+
+from . import changefeed, data_handler
+
+
+def bulk_create(filepath, records, build, check=None):
+    """
+    Validate records with build(record) -> model and store them together.
+
+    The file is loaded and saved once for the whole batch. Returns
+    (created, errors) where errors lists (position, message) for every
+    record that failed validation, has an ID that is already stored or
+    repeats one earlier in the batch, or that check(model) rejected with
+    ValueError; valid records are still stored. check runs under the
+    file lock, for rules that depend on the stored records, and sees the
+    records accepted before it.
+    """
+    built, errors = [], []
+    for position, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Expected a dict record.")
+            built.append((position, build(record)))
+        except ValueError as exc:
+            errors.append((position, str(exc)))
+    created = []
+    if built:
+        with data_handler.locked(filepath):
+            data = data_handler.load_json(filepath)
+            changes, added = [], set()
+            for position, obj in built:
+                record_id = getattr(obj, obj.ID_FIELD)
+                try:
+                    if record_id in added:
+                        raise ValueError(f"ID {record_id} is repeated in the batch.")
+                    if record_id in data:
+                        raise ValueError(f"ID {record_id} already exists.")
+                    if check is not None:
+                        check(obj)
+                except ValueError as exc:
+                    errors.append((position, str(exc)))
+                    continue
+                record = obj.to_dict()
+                data[record_id] = record
+                added.add(record_id)
+                created.append(obj)
+                changes.append(("create", record_id, record))
+            if changes:
+                data_handler.save_json(filepath, data)
+                changefeed.publish(filepath, changes)
+        errors.sort()
+    return created, errors
+
+
+def bulk_modify(filepath, updates, allowed, from_dict, check=None):
+    """
+    Apply {record_id: {field: value}} updates in one load/save cycle.
+
+    Only fields in allowed are changed. Returns (modified, errors) where
+    errors lists (record_id, message) for missing or invalid records and
+    for those check(model) rejected with ValueError. check runs under
+    the file lock, as in bulk_create.
+    """
+    with data_handler.locked(filepath):
+        return _bulk_modify(filepath, updates, allowed, from_dict, check)
+
+
+def _bulk_modify(filepath, updates, allowed, from_dict, check):
+    data = data_handler.load_json(filepath)
+    modified, changed, errors = [], [], []
+    for record_id, changes in updates.items():
+        record_id = str(record_id)
+        if record_id not in data:
+            errors.append((record_id, "not found"))
+            continue
+        record = dict(data[record_id])
+        for key, value in changes.items():
+            if key in allowed:
+                record[key] = value
+        try:
+            obj = from_dict(record)
+            if check is not None:
+                check(obj)
+        except ValueError as exc:
+            errors.append((record_id, str(exc)))
+            continue
+        data[record_id] = obj.to_dict()
+        modified.append(obj)
+        changed.append(record_id)
+    if modified:
+        data_handler.save_json(filepath, data)
+        changefeed.publish(filepath, [
+            ("modify", record_id, data[record_id]) for record_id in changed
+        ])
+    return modified, errors
+
+
+def bulk_delete(filepath, record_ids):
+    """
+    Remove many records in one load/save cycle.
+
+    Returns (deleted_ids, errors) where errors lists (record_id, message)
+    for IDs that were not found.
+    """
+    with data_handler.locked(filepath):
+        return _bulk_delete(filepath, record_ids)
+
+
+def _bulk_delete(filepath, record_ids):
+    data = data_handler.load_json(filepath)
+    deleted, errors = [], []
+    for record_id in record_ids:
+        record_id = str(record_id)
+        if data.pop(record_id, None) is None:
+            errors.append((record_id, "not found"))
+        else:
+            deleted.append(record_id)
+    if deleted:
+        data_handler.save_json(filepath, data)
+        changefeed.publish(filepath, [("delete", record_id, None) for record_id in deleted])
+    return deleted, errors
+
+
+def export(filepath, out, fields, fmt="jsonl"):
+    """
+    Stream every record of filepath to the text file object out.
+
+    fmt is "jsonl" (one JSON object per line) or "csv" (with a header of
+    fields). Records are written as stored, without building model
+    objects. Returns the number of records written.
+    """
+    if fmt == "jsonl":
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+    elif fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    count = 0
+    for _, record in data_handler.iter_records(filepath):
+        write(record)
+        count += 1
+    return count
@@ -0,0 +1,197 @@
+"""
+Append-only feed of changes to hotels, customers and reservations.
+
+Every create, modify, cancel and delete made through the models (and
+their bulk variants and the archive job) appends one event per record,
+as a JSON line, to CHANGES_FILE in the data directory:
+
+    {"seq": 42, "ts": 1767225600.0, "collection": "reservations",
+     "op": "cancel", "id": "...", "record": {...}}
+
+seq increases by one per event across all collections and processes.
+record is the record after the change, or null for "delete" and
+"archive" (moved to the archive, see models.archive). Events are
+appended while the data file is locked, so the feed lists the changes
+to a record in the order they were made. A change held back by
+data_handler.batch() or write-behind gets its event only once the
+flush that writes it succeeds; discarded changes get none.
+
+Consumers remember the byte offset after the last event they handled
+and resume from it with tail(offset), so an incremental sync reads only
+the new events. HOTEL_CHANGEFEED=off stops recording.
+"""
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from . import data_handler, serialization
+
+CHANGES_FILE = "changes.log"
+OPS = ("create", "modify", "cancel", "delete", "archive")
+
+_ENABLED = {"on": os.environ.get("HOTEL_CHANGEFEED", "on").lower() not in ("0", "off", "false")}
+# Feed path -> (size, last seq) as of this process's last append.
+_TAIL = {}
+# Events held back by deferred() in this context: [(filepath, changes)].
+_HELD = contextvars.ContextVar("changefeed_held", default=None)
+
+
+def enabled():
+    """Return True while changes are being recorded."""
+    return _ENABLED["on"]
+
+
+def set_enabled(flag):
+    """Turn recording of changes on or off for this process."""
+    _ENABLED["on"] = bool(flag)
+
+
+def feed_path():
+    """Return the path of the feed in the current data directory."""
+    return os.path.join(data_handler.DATA_DIR, CHANGES_FILE)
+
+
+def _collection(filepath):
+    name = os.path.basename(filepath)
+    return name.split(".", 1)[0]
+
+
+def _last_line(fh, size):
+    """Return the last complete line of a file ending in a newline."""
+    position, tail = size, b""
+    while position > 0:
+        step = min(4096, position)
+        position -= step
+        fh.seek(position)
+        tail = fh.read(step) + tail
+        start = tail.rfind(b"\n", 0, len(tail) - 1)
+        if start >= 0:
+            return tail[start + 1:]
+    return tail
+
+
+def _last_seq(path):
+    """
+    Return the seq of the last event in the feed at path, cutting off a
+    partial line left by a writer that died mid-append.
+    """
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+    cached = _TAIL.get(path)
+    if cached is not None and cached[0] == size:
+        return cached[1]
+    with open(path, "r+b") as fh:
+        fh.seek(max(size - 1, 0))
+        if size and fh.read(1) != b"\n":
+            # Keep only complete lines: everything up to the last newline.
+            fh.seek(0)
+            cut = fh.read().rfind(b"\n") + 1
+            fh.truncate(cut)
+            size = cut
+        if not size:
+            return 0
+        return json.loads(_last_line(fh, size))["seq"]
+
+
+def publish(filepath, changes):
+    """
+    Append one event per (op, key, record) in changes, made to the
+    collection stored at filepath. Returns the seq of the last event, or
+    None while the events wait for the changes to be written.
+    """
+    if not _ENABLED["on"] or not changes:
+        return None
+    changes = list(changes)
+    for op, _, _ in changes:
+        if op not in OPS:
+            raise ValueError(f"Unknown change operation: {op}")
+    held = _HELD.get()
+    if held is not None:
+        held.append((filepath, changes))
+        return None
+    return data_handler.when_written(filepath, lambda: _append(filepath, changes))
+
+
+def _append(filepath, changes):
+    collection = _collection(filepath)
+    path = feed_path()
+    encode = serialization.CODECS["json"].dumps
+    with data_handler.locked(path):
+        seq = _last_seq(path)
+        now = time.time()
+        lines = []
+        for op, key, record in changes:
+            seq += 1
+            lines.append(encode({
+                "seq": seq,
+                "ts": now,
+                "collection": collection,
+                "op": op,
+                "id": str(key),
+                "record": record,
+            }) + b"\n")
+        payload = b"".join(lines)
+        with open(path, "ab") as fh:
+            fh.write(payload)
+            size = fh.tell()
+        _TAIL[path] = (size, seq)
+    return seq
+
+
+@contextmanager
+def deferred():
+    """
+    Hold back the events published in the block, then publish them when
+    it exits cleanly or drop them if it raises.
+    """
+    held = []
+    token = _HELD.set(held)
+    try:
+        yield
+    finally:
+        _HELD.reset(token)
+    for filepath, changes in held:
+        publish(filepath, changes)
+
+
+def emit(filepath, op, key, record=None):
+    """Append one event for a change to record key of the collection at filepath."""
+    return publish(filepath, [(op, key, record)])
+
+
+def end_offset():
+    """Return the offset just past the last event, to tail only new ones."""
+    try:
+        return os.path.getsize(feed_path())
+    except FileNotFoundError:
+        return 0
+
+
+def tail(offset=0, follow=False, poll_interval=0.5):
+    """
+    Yield (next_offset, event) for every event from byte offset on, in
+    order. Store next_offset to resume after that event later. With
+    follow, keep waiting for new events instead of stopping at the end.
+    """
+    path = feed_path()
+    while True:
+        try:
+            fh = open(path, "rb")
+        except FileNotFoundError:
+            fh = None
+        if fh is not None:
+            with fh:
+                fh.seek(offset)
+                for line in fh:
+                    if not line.endswith(b"\n"):
+                        # Still being written; read it on the next pass.
+                        break
+                    offset += len(line)
+                    yield offset, json.loads(line)
+        if not follow:
+            return
+        time.sleep(poll_interval)
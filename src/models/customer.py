@@ -1,6 +1,26 @@
+import logging
+
+from . import bulk, changefeed, data_handler, instrumentation, session
+from .indexes import FieldIndex, PrefixIndex, casefold
+
+
+logger = logging.getLogger(__name__)
+
+
 class Customer:
     """Represents a hotel customer."""
 
+    ID_FIELD = "customer_id"
+    # data_handler attribute naming the file; used by session.Session.
+    COLLECTION = "CUSTOMERS_FILE"
+    FIELDS = ("customer_id", "first_name", "last_name", "email", "phone")
+    MODIFIABLE = {"first_name", "last_name", "email", "phone"}
+    # Index names and factories for data_handler.get_index.
+    EMAIL_INDEX = ("email", FieldIndex.factory("email", casefold))
+    NAME_INDEX = ("name", PrefixIndex.factory(("last_name", "first_name")))
+
+    __slots__ = FIELDS
+
     def __init__(self, customer_id, first_name, last_name, email, phone=""):
         self.customer_id = str(customer_id)
         self.first_name = str(first_name)
@@ -48,80 +68,241 @@ class Customer:
 
     @staticmethod
     def _load_all():
-        return _load_json(CUSTOMERS_FILE)
+        return data_handler.load_json(data_handler.CUSTOMERS_FILE)
 
     @staticmethod
     def _save_all(data):
-        _save_json(CUSTOMERS_FILE, data)
+        data_handler.save_json(data_handler.CUSTOMERS_FILE, data)
+
+    @staticmethod
+    def _index(spec):
+        return data_handler.get_index(data_handler.CUSTOMERS_FILE, *spec)
+
+    @classmethod
+    def _email_owners(cls, email):
+        """Return the IDs of customers registered with email, ignoring case."""
+        if not casefold(email):
+            return set()
+        backend = data_handler.get_backend(data_handler.CUSTOMERS_FILE)
+        if hasattr(backend, "find"):
+            return {
+                record["customer_id"]
+                for record in backend.find(data_handler.CUSTOMERS_FILE, "email", email)
+            }
+        return cls._index(cls.EMAIL_INDEX).lookup(email)
 
     @classmethod
+    def _check_unique(cls, customer):
+        """Raise ValueError if another customer has customer's email."""
+        if cls._email_owners(customer.email) - {customer.customer_id}:
+            raise ValueError(f"Email {customer.email} is already registered.")
+
+    @classmethod
+    def _batch_check_unique(cls):
+        """
+        Return check(customer) for a bulk operation, which raises
+        ValueError if another customer has customer's email, either
+        stored or given earlier in the batch. Call it under the lock.
+        """
+        claimed, moved = {}, {}
+
+        def check(customer):
+            email = casefold(customer.email)
+            if email:
+                # Stored owners that the batch already moved to another
+                # email no longer hold this one.
+                owners = {
+                    owner for owner in cls._email_owners(email)
+                    if moved.get(owner, email) == email
+                }
+                owners.discard(customer.customer_id)
+                if owners or claimed.get(email, customer.customer_id) != customer.customer_id:
+                    raise ValueError(f"Email {customer.email} is already registered.")
+                claimed[email] = customer.customer_id
+            moved[customer.customer_id] = email
+
+        return check
+
+    @classmethod
+    @instrumentation.timed
     def create(cls, first_name, last_name, email, phone=""):
-        """Persist a new customer and return the instance."""
+        """
+        Persist a new customer and return the instance. Raises ValueError
+        if another customer already has the email (ignoring case).
+        """
         customer = cls(
-            customer_id=str(uuid.uuid4()),
+            customer_id=data_handler.new_id(),
             first_name=first_name,
             last_name=last_name,
             email=email,
             phone=phone,
         )
-        data = cls._load_all()
-        data[customer.customer_id] = customer.to_dict()
-        cls._save_all(data)
-        return customer
+        with data_handler.locked(data_handler.CUSTOMERS_FILE):
+            cls._check_unique(customer)
+            record = customer.to_dict()
+            data_handler.put_record(data_handler.CUSTOMERS_FILE, customer.customer_id, record)
+            changefeed.emit(data_handler.CUSTOMERS_FILE, "create", customer.customer_id, record)
+            data_handler.write_through(data_handler.CUSTOMERS_FILE)
+        return session.track(customer)
 
     @classmethod
+    @instrumentation.timed
+    @session.identity_mapped
     def get(cls, customer_id):
         """Return a Customer by ID or None if not found."""
-        data = cls._load_all()
-        record = data.get(str(customer_id))
+        record = data_handler.get_record(data_handler.CUSTOMERS_FILE, str(customer_id))
         if record is None:
             return None
         try:
             return cls.from_dict(record)
         except ValueError as exc:
-            print(f"ERROR reading customer {customer_id}: {exc}")
+            logger.error(
+                "Error reading customer %s: %s", customer_id, exc,
+                extra={"record_id": customer_id},
+            )
             return None
 
     @classmethod
+    @instrumentation.timed
+    def iter_all(cls):
+        """Yield every valid Customer while streaming the stored records."""
+        count = 0
+        try:
+            for cid, record in data_handler.iter_records(data_handler.CUSTOMERS_FILE):
+                try:
+                    customer = cls.from_dict(record)
+                except ValueError as exc:
+                    logger.error(
+                        "Error reading customer %s: %s. Skipping record.", cid, exc,
+                        extra={"record_id": cid},
+                    )
+                    continue
+                count += 1
+                yield customer
+        finally:
+            instrumentation.add_records("Customer.iter_all", count)
+
+    @classmethod
+    @instrumentation.timed
     def get_all(cls):
         """Return list of all valid Customer instances."""
-        data = cls._load_all()
-        customers = []
-        for cid, record in data.items():
-            try:
-                customers.append(cls.from_dict(record))
-            except ValueError as exc:
-                print(f"ERROR reading customer {cid}: {exc}. Skipping record.")
-        return customers
+        return list(cls.iter_all())
 
     @classmethod
+    @instrumentation.timed
     def delete(cls, customer_id):
         """Remove a customer by ID. Returns True if deleted, False if not found."""
-        data = cls._load_all()
-        customer_id = str(customer_id)
-        if customer_id not in data:
-            return False
-        del data[customer_id]
-        cls._save_all(data)
-        return True
+        with data_handler.locked(data_handler.CUSTOMERS_FILE):
+            deleted = data_handler.delete_record(data_handler.CUSTOMERS_FILE, str(customer_id))
+            if deleted:
+                changefeed.emit(data_handler.CUSTOMERS_FILE, "delete", customer_id)
+                session.forget(cls, customer_id)
+        return deleted
 
     @classmethod
+    @instrumentation.timed
     def modify(cls, customer_id, **kwargs):
         """Update allowed fields for a customer. Returns updated Customer or None."""
-        allowed = {"first_name", "last_name", "email", "phone"}
-        data = cls._load_all()
         customer_id = str(customer_id)
-        if customer_id not in data:
-            return None
-        record = data[customer_id]
-        for key, value in kwargs.items():
-            if key in allowed:
-                record[key] = value
-        try:
-            customer = cls.from_dict(record)
-        except ValueError as exc:
-            print(f"ERROR modifying customer {customer_id}: {exc}")
-            return None
-        data[customer_id] = customer.to_dict()
-        cls._save_all(data)
-        return customer
+        with data_handler.locked(data_handler.CUSTOMERS_FILE):
+            record = data_handler.get_record(data_handler.CUSTOMERS_FILE, customer_id)
+            if record is None:
+                return None
+            for key, value in kwargs.items():
+                if key in cls.MODIFIABLE:
+                    record[key] = value
+            try:
+                customer = cls.from_dict(record)
+                cls._check_unique(customer)
+            except ValueError as exc:
+                logger.error(
+                    "Error modifying customer %s: %s", customer_id, exc,
+                    extra={"record_id": customer_id},
+                )
+                return None
+            record = customer.to_dict()
+            data_handler.put_record(data_handler.CUSTOMERS_FILE, customer_id, record)
+            changefeed.emit(data_handler.CUSTOMERS_FILE, "modify", customer_id, record)
+            data_handler.write_through(data_handler.CUSTOMERS_FILE)
+        return session.track(customer)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    @classmethod
+    @instrumentation.timed
+    def find_by_email(cls, email):
+        """Return the Customer registered with email (ignoring case) or None."""
+        for customer_id in sorted(cls._email_owners(email)):
+            customer = cls.get(customer_id)
+            if customer is not None:
+                return customer
+        return None
+
+    @classmethod
+    @instrumentation.timed
+    def search_by_name(cls, last_name, first_name=None, limit=None):
+        """
+        Return customers ordered by (last_name, first_name), ignoring
+        case: those whose last name starts with last_name or, with
+        first_name, those named last_name whose first name starts with
+        first_name. At most limit customers are returned.
+        """
+        prefixes = (last_name,) if first_name is None else (last_name, first_name)
+        customers = []
+        for customer_id in cls._index(cls.NAME_INDEX).search(*prefixes, limit=limit):
+            customer = cls.get(customer_id)
+            if customer is not None:
+                customers.append(customer)
+        return customers
+
+    # ------------------------------------------------------------------
+    # Bulk operations
+    # ------------------------------------------------------------------
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_create(cls, records):
+        """
+        Persist many customers in a single load/save cycle.
+        Records missing customer_id get a new UUID. Returns (customers, errors)
+        with errors as a list of (position, message); an email that is
+        already registered, or repeated in the batch, is an error.
+        """
+        return bulk.bulk_create(
+            data_handler.CUSTOMERS_FILE,
+            records,
+            lambda record: cls.from_dict(
+                {**record, "customer_id": record.get("customer_id") or data_handler.new_id()}
+            ),
+            cls._batch_check_unique(),
+        )
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_modify(cls, updates):
+        """
+        Apply {customer_id: {field: value}} updates in a single load/save cycle.
+        Returns (updated customers, errors) with errors as (id, message); an
+        email registered to another customer, or given to two, is an error.
+        """
+        return bulk.bulk_modify(
+            data_handler.CUSTOMERS_FILE, updates, cls.MODIFIABLE, cls.from_dict,
+            cls._batch_check_unique(),
+        )
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_delete(cls, customer_ids):
+        """
+        Remove many customers in a single load/save cycle.
+        Returns (deleted ids, errors) with errors as (id, message).
+        """
+        return bulk.bulk_delete(data_handler.CUSTOMERS_FILE, customer_ids)
+
+    @classmethod
+    @instrumentation.timed
+    def export(cls, out, fmt="jsonl"):
+        """Stream all customers to a text file as "jsonl" or "csv"; returns the count."""
+        return bulk.export(data_handler.CUSTOMERS_FILE, out, cls.FIELDS, fmt)
@@ -1,35 +1,1179 @@
+import atexit
+import itertools
 import json
+import logging
 import os
+import threading
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
 
+from . import instrumentation, serialization
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.environ.get("HOTEL_DATA_DIR") or os.path.join(
+    os.path.dirname(__file__), "..", "..", "data"
+)
 HOTELS_FILE = os.path.join(DATA_DIR, "hotels.json")
 CUSTOMERS_FILE = os.path.join(DATA_DIR, "customers.json")
 RESERVATIONS_FILE = os.path.join(DATA_DIR, "reservations.json")
 
+# Process-wide cache of parsed files, keyed by absolute path.
+_CACHE = {}
+
+# Per-file locks, keyed by absolute path, and their wait-time counters.
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+_LOCK_STATS = {"acquisitions": 0, "contended": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+# Waits longer than this count as contended in lock_stats().
+CONTENTION_THRESHOLD = 0.001
+
+# Nesting depth of batch() blocks; while above zero, or while write-behind
+# is enabled, single-record writes only update the cache and are persisted
+# by flush(). "dirty" counts the changes queued since the last flush.
+_DEFER = {"depth": 0, "dirty": 0}
+_DEFER_LOCK = threading.RLock()
+
+# when_written() callbacks still waiting for deferred changes, in the
+# order they were registered, as (absolute paths of the files, callback).
+_AFTER_FLUSH = []
+
+# Background flusher state, see enable_write_behind().
+_WRITE_BEHIND = {
+    "enabled": False,
+    "interval": 1.0,
+    "max_dirty": 1000,
+    "thread": None,
+    "wake": None,
+    "stop": None,
+    "flushes": 0,
+}
+
+# Characters stream_json skips between tokens.
+_WHITESPACE = " \t\n\r"
+# Characters that can continue a JSON number.
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+class _CacheEntry:
+    """Parsed contents of one file plus the indexes derived from them."""
+
+    __slots__ = ("signature", "data", "indexes", "pending")
+
+    def __init__(self, signature, data):
+        # Backend signature seen when data was read or last written.
+        self.signature = signature
+        # None while only indexes streamed from the file are held.
+        self.data = data
+        self.indexes = {}
+        # (key, record) changes not yet written, or None when clean.
+        self.pending = None
+
+    def is_current(self, signature):
+        """True if the file is unchanged since the entry read or wrote it."""
+        return self.signature == signature
+
+
+def new_id():
+    """Return a new random record ID as a UUID4 string."""
+    import uuid  # Deferred: slow to import and only needed to create records.
+
+    return str(uuid.uuid4())
+
+
 def _ensure_data_dir():
     """Create data directory if it does not exist."""
     os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def load_json(filepath):
-    """Load JSON data from file, returning empty dict on error."""
-    _ensure_data_dir()
-    if not os.path.exists(filepath):
-        return {}
+def _signature(filepath):
+    """Return the (mtime, size, inode) triple of a file, or None if missing."""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _parse(filepath):
+    """Parse a data file in any codec, returning empty dict on error."""
     try:
-        with open(filepath, "r", encoding="utf-8") as fh:
-            data = json.load(fh)
-            if not isinstance(data, dict):
-                raise ValueError("Expected a JSON object at root level.")
-            return data
-    except (json.JSONDecodeError, ValueError) as exc:
-        print(f"ERROR loading {filepath}: {exc}. Starting with empty dataset.")
+        with open(filepath, "rb") as fh:
+            raw = fh.read()
+        instrumentation.add_bytes("read", filepath, len(raw))
+        data = serialization.decode(raw)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object at root level.")
+        return data
+    except ValueError as exc:
+        logger.error(
+            "Error loading %s: %s. Starting with empty dataset.", filepath, exc,
+            extra={"path": filepath},
+        )
         return {}
 
 
+class _ChunkReader:
+    """Buffered character source for stream_json, dropping consumed text."""
+
+    def __init__(self, fh, chunk_size):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        chunk = self.fh.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                raise ValueError("Unexpected end of JSON data.")
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of chars."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, found {char!r}.")
+        self.pos += 1
+        return char
+
+    def decode(self, decoder):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+                continue
+            # A value ending the buffer may go on in the next chunk, and so
+            # may a number cut before its fraction or exponent ("0.", "1e").
+            cut = end == len(self.buf) or (
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                and self.buf[end] in _NUMBER_CHARS
+            )
+            if cut and not self.eof and self._more():
+                continue
+            self.pos = end
+            return value
+
+
+def stream_json(filepath, chunk_size=1 << 16):
+    """
+    Yield (key, value) pairs of the top-level JSON object in filepath.
+
+    The file is read chunk by chunk and each member is decoded on its own,
+    so memory stays flat however large the file is. Raises ValueError on
+    malformed data, after yielding the members before it.
+    """
+    decoder = json.JSONDecoder()
+    with open(filepath, "r", encoding="utf-8") as fh:
+        reader = _ChunkReader(fh, chunk_size)
+        try:
+            try:
+                reader.expect("{")
+            except ValueError as exc:
+                raise ValueError("Expected a JSON object at root level.") from exc
+            if reader.peek() == "}":
+                return
+            while True:
+                key = reader.decode(decoder)
+                if not isinstance(key, str):
+                    raise ValueError("Expected a string key.")
+                reader.expect(":")
+                yield key, reader.decode(decoder)
+                if reader.expect(",}") == "}":
+                    return
+        finally:
+            instrumentation.add_bytes("read", filepath, fh.buffer.tell())
+
+
+def _atomic_write(filepath, data, fsync=False, codec=None):
+    """
+    Encode data with codec (compact JSON by default) into a temp file
+    beside filepath, then rename it into place.
+    """
+    import tempfile  # Deferred: costly to import and read-only runs never need it.
+
+    payload = (codec or serialization.CODECS["json"]).dumps(data)
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(filepath) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(payload)
+            if fsync:
+                fh.flush()
+                os.fsync(fh.fileno())
+        instrumentation.add_bytes("written", filepath, len(payload))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ----------------------------------------------------------------------
+# Locking
+# ----------------------------------------------------------------------
+
+class _FileLock:
+    """
+    Re-entrant lock on one data file, shared by threads and processes.
+
+    Threads of this process serialise on an RLock; the outermost holder
+    also takes an fcntl advisory lock on "<file>.lock" so that other
+    processes using data_handler wait as well.
+    """
+
+    def __init__(self, filepath):
+        self.lock_path = filepath + ".lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def acquire(self):
+        start = time.perf_counter()
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fh = open(self.lock_path, "a", encoding="utf-8")
+                if fcntl is not None:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+                self._thread_lock.release()
+                raise
+            _record_wait(time.perf_counter() - start)
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self._thread_lock.release()
+
+
+def _record_wait(waited):
+    with _LOCKS_GUARD:
+        _LOCK_STATS["acquisitions"] += 1
+        _LOCK_STATS["wait_total"] += waited
+        _LOCK_STATS["wait_max"] = max(_LOCK_STATS["wait_max"], waited)
+        if waited > CONTENTION_THRESHOLD:
+            _LOCK_STATS["contended"] += 1
+
+
+@contextmanager
+def locked(filepath):
+    """
+    Hold the exclusive lock of filepath for a load/modify/save cycle.
+
+    The lock is re-entrant, so locked sections may call put_record and
+    the other helpers, which lock the file themselves. Locking a sharded
+    collection takes the locks of all its shards, in order.
+    """
+    _ensure_data_dir()
+    if _sharded(filepath):
+        with ExitStack() as stack:
+            for path in shard_paths(filepath):
+                stack.enter_context(locked(path))
+            yield
+        return
+    key = os.path.abspath(filepath)
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(key)
+        if lock is None:
+            lock = _LOCKS[key] = _FileLock(key)
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def lock_stats():
+    """
+    Return lock contention counters: acquisitions, contended (waits over
+    CONTENTION_THRESHOLD seconds), wait_total, wait_max and wait_avg.
+    """
+    with _LOCKS_GUARD:
+        stats = dict(_LOCK_STATS)
+    stats["wait_avg"] = (
+        stats["wait_total"] / stats["acquisitions"] if stats["acquisitions"] else 0.0
+    )
+    return stats
+
+
+def reset_lock_stats():
+    """Zero the lock contention counters."""
+    with _LOCKS_GUARD:
+        _LOCK_STATS.update(acquisitions=0, contended=0, wait_total=0.0, wait_max=0.0)
+
+
+# ----------------------------------------------------------------------
+# Storage backends
+# ----------------------------------------------------------------------
+
+class JsonFileBackend:
+    """
+    Default backend: each collection is one file holding a JSON object,
+    or a binary snapshot when codec (default: HOTEL_CODEC) is binary.
+    Files are read back in whatever codec wrote them.
+
+    Backends with caches = False keep their own indexes; data_handler
+    then skips its cache and calls read_record/remove_record directly.
+    """
+
+    caches = True
+    # Whether sharded scans may parse files of this backend in worker
+    # processes, which do not share its state or hold its locks.
+    parallel_reads = True
+
+    def __init__(self, fsync=False, codec=None):
+        self.fsync = fsync
+        self.codec = serialization.get_codec(codec)
+
+    def signature(self, filepath):
+        """Return a value that changes whenever the stored data changes."""
+        return _signature(filepath)
+
+    def read(self, filepath):
+        """Return the full collection stored at filepath."""
+        if not os.path.exists(filepath):
+            return {}
+        return _parse(filepath)
+
+    def iter(self, filepath):
+        """Yield (key, record) pairs without loading the whole collection."""
+        if not os.path.exists(filepath):
+            return
+        if serialization.sniff(filepath).binary:
+            # Binary snapshots cannot be streamed; they are compact anyway.
+            yield from self.read(filepath).items()
+            return
+        try:
+            yield from stream_json(filepath)
+        except ValueError as exc:
+            logger.error(
+                "Error streaming %s: %s. Stopping early.", filepath, exc,
+                extra={"path": filepath},
+            )
+
+    def write(self, filepath, data):
+        """Atomically replace the full collection stored at filepath."""
+        _atomic_write(filepath, data, self.fsync, self.codec)
+
+    def write_record(self, filepath, data, key, record):
+        """
+        Persist one changed record; record is None for a deletion.
+        data is the whole collection with the change already applied.
+        """
+        self.write(filepath, data)
+
+    def write_records(self, filepath, data, changes):
+        """Persist a list of (key, record) changes already applied to data."""
+        self.write(filepath, data)
+
+
+def _backend_from_env(variable="HOTEL_STORAGE"):
+    """Build the backend named by the HOTEL_STORAGE environment variable."""
+    name = os.environ.get(variable, "json").lower()
+    if name == "json":
+        return JsonFileBackend()
+    if name == "wal":
+        from .wal_backend import WalBackend
+        return WalBackend()
+    if name == "sqlite":
+        from .sqlite_backend import SqliteBackend
+        return SqliteBackend()
+    if name == "mmap":
+        from .mmap_backend import MmapBackend
+        return MmapBackend()
+    raise ValueError(f"Unknown {variable} backend: {name}")
+
+
+_BACKEND = _backend_from_env()
+
+# Backends overriding _BACKEND for one collection, keyed by file name.
+_BACKENDS = {}
+
+
+def _collection_name(filepath):
+    """Return the file name of the collection filepath holds, or is a shard of."""
+    name = os.path.basename(filepath)
+    root, ext = os.path.splitext(name)
+    base, sep, index = root.rpartition(".shard-")
+    return base + ext if sep and index.isdigit() else name
+
+
+def _backend_for(filepath):
+    return _BACKENDS.get(_collection_name(filepath), _BACKEND)
+
+
+def get_backend(filepath=None):
+    """Return the storage backend in use, for filepath's collection if given."""
+    if filepath is None:
+        return _BACKEND
+    return _backend_for(filepath)
+
+
+def set_backend(backend, filepath=None):
+    """
+    Switch the storage backend and drop everything cached by the old one.
+    With filepath, switch only that collection; backend None then returns
+    it to the default backend. Stored data is not migrated.
+    """
+    global _BACKEND
+    if filepath is None:
+        _BACKEND = backend
+        invalidate_cache()
+        return
+    invalidate_cache(filepath)
+    if backend is None:
+        _BACKENDS.pop(_collection_name(filepath), None)
+    else:
+        _BACKENDS[_collection_name(filepath)] = backend
+
+
+# ----------------------------------------------------------------------
+# Sharding
+# ----------------------------------------------------------------------
+
+# Records of a sharded collection are placed by a hash of this field,
+# falling back to the record key (so hotels shard by their own ID).
+SHARD_FIELD = "hotel_id"
+
+# Cold scans over at least this many bytes of stale shards parse them in
+# worker processes; smaller ones are cheaper to read in-process.
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+# The shard count of a collection is kept in a manifest beside it
+# (reservations.json -> reservations.shards.json), so every process sees
+# the same layout. Cached per manifest path as (signature, count).
+_SHARDS = {}
+_SHARD_POOL = {"executor": None, "workers": 0}
+
+
+def manifest_path(filepath):
+    """Return the path of the shard manifest of the collection at filepath."""
+    root, _ = os.path.splitext(filepath)
+    return root + ".shards.json"
+
+
+def _shard_count(filepath):
+    """Return the shard count in filepath's manifest, or 0 if it is not sharded."""
+    path = manifest_path(filepath)
+    signature = _signature(path)
+    cached = _SHARDS.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    count = 0
+    if signature is not None:
+        try:
+            with open(path, encoding="utf-8") as fh:
+                count = int(json.load(fh)["count"])
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.error(
+                "Error reading shard manifest %s: %s", path, exc, extra={"path": path}
+            )
+    _SHARDS[path] = (signature, count)
+    return count
+
+
+def _write_manifest(filepath, count):
+    path = manifest_path(filepath)
+    if count > 1:
+        _atomic_write(path, {"count": count}, fsync=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _sharded(filepath):
+    return _shard_count(filepath) > 1
+
+
+def _shard_path(filepath, index):
+    root, ext = os.path.splitext(filepath)
+    return f"{root}.shard-{index:02d}{ext}"
+
+
+def shard_paths(filepath):
+    """Return the files holding the records of filepath: its shards, or itself."""
+    count = _shard_count(filepath)
+    if count < 2:
+        return [filepath]
+    return [_shard_path(filepath, index) for index in range(count)]
+
+
+def shard_for(filepath, value):
+    """
+    Return the file holding the records of filepath whose SHARD_FIELD is
+    value; that is filepath itself when the collection is not sharded.
+    """
+    count = _shard_count(filepath)
+    if count < 2:
+        return filepath
+    return _shard_path(filepath, _shard_index(value, count))
+
+
+def _shard_index(value, count):
+    return zlib.crc32(str(value).encode("utf-8")) % count
+
+
+def _shard_of(filepath, key, record):
+    return shard_for(filepath, record.get(SHARD_FIELD, key))
+
+
+def set_shards(filepath, count):
+    """
+    Split the collection stored at filepath into count shard files by a
+    hash of each record's SHARD_FIELD, or merge it back into one file
+    when count is 1 or less. Stored records are moved to the new layout
+    and the count is recorded in the collection's manifest, which other
+    processes read on their next access. Stop other writers while it runs.
+
+    Records stay in the shard of the SHARD_FIELD value they were stored
+    with, so that field must not change once a record exists. Only
+    backends that cache can be sharded.
+    """
+    backend = _backend_for(filepath)
+    if not backend.caches:
+        raise ValueError(f"{type(backend).__name__} does not support sharding.")
+    with locked(filepath):
+        data = load_json(filepath)
+        old_paths = shard_paths(filepath)
+        invalidate_cache(filepath)
+        if count > 1:
+            new_paths = [_shard_path(filepath, index) for index in range(count)]
+        else:
+            new_paths = [filepath]
+        parts = {path: {} for path in new_paths}
+        for key, record in data.items():
+            index = _shard_index(record.get(SHARD_FIELD, key), len(new_paths))
+            parts[new_paths[index]][key] = record
+        with ExitStack() as stack:
+            for path in new_paths:
+                stack.enter_context(locked(path))
+            # Write the new layout before the manifest switches to it and
+            # empty the old one after, so a crash never loses records.
+            for path, part in parts.items():
+                backend.write(path, part)
+            _write_manifest(filepath, count)
+            for path in set(old_paths) - set(new_paths):
+                if os.path.exists(path):
+                    backend.write(path, {})
+        for path in set(old_paths) | set(new_paths):
+            _CACHE.pop(os.path.abspath(path), None)
+
+
+def _shards_from_env(spec):
+    """
+    Apply HOTEL_SHARDS: a count for reservations ("8") or counts per
+    collection ("reservations=8,hotels=4"). A collection gets a manifest
+    only while it holds no records; changing the count of one that does
+    needs set_shards(), so that is refused with an error.
+    """
+    files = {
+        os.path.splitext(os.path.basename(path))[0]: path
+        for path in (HOTELS_FILE, CUSTOMERS_FILE, RESERVATIONS_FILE)
+    }
+    for item in spec.split(","):
+        name, _, count = item.rpartition("=")
+        filepath = files.get(name.strip() or "reservations")
+        if filepath is None or not count.strip().isdigit():
+            logger.error("Ignoring HOTEL_SHARDS entry %r.", item)
+            continue
+        count = int(count)
+        current = _shard_count(filepath)
+        if max(current, 1) == max(count, 1):
+            continue
+        if current or _backend_for(filepath).read(filepath):
+            logger.error(
+                "HOTEL_SHARDS asks for %s shards of %s, which is stored in %s; "
+                "use set_shards() to move its records.",
+                count, filepath, current or 1, extra={"path": filepath},
+            )
+            continue
+        _ensure_data_dir()
+        _write_manifest(filepath, count)
+
+
+def _shard_pool(workers):
+    """Return the process pool used for cross-shard scans."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = _SHARD_POOL["executor"]
+    if pool is None or _SHARD_POOL["workers"] < workers:
+        if pool is not None:
+            pool.shutdown(wait=False)
+        # Spawned workers only parse files, so they never inherit locks
+        # held by this process's threads.
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        _SHARD_POOL.update(executor=pool, workers=workers)
+    return pool
+
+
+def _parse_shard(filepath):
+    """Worker-process half of _preload_shards."""
+    return _parse(filepath) if os.path.exists(filepath) else {}
+
+
+def _preload_shards(filepath):
+    """
+    Parse the stale shards of filepath in worker processes and cache
+    them, when there are several and together they are big enough to
+    repay the inter-process copy. Otherwise leave them to be read lazily.
+    """
+    backend = _backend_for(filepath)
+    if not backend.caches or not getattr(backend, "parallel_reads", False):
+        return
+    stale = []
+    for path in shard_paths(filepath):
+        signature = backend.signature(path)
+        entry = _current(path, backend, signature)
+        if entry is None or entry.data is None:
+            stale.append((path, signature))
+    if len(stale) < 2:
+        return
+    size = sum(os.path.getsize(path) for path, _ in stale if os.path.exists(path))
+    if size < PARALLEL_MIN_BYTES:
+        return
+    pool = _shard_pool(min(len(stale), os.cpu_count() or 1))
+    results = pool.map(_parse_shard, [path for path, _ in stale])
+    for (path, signature), data in zip(stale, results):
+        key = os.path.abspath(path)
+        entry = _CACHE.get(key)
+        if entry is not None and entry.is_current(signature):
+            entry.data = data
+        elif entry is None or not entry.pending:
+            _CACHE[key] = _CacheEntry(signature, data)
+
+
+# ----------------------------------------------------------------------
+# Cached access
+# ----------------------------------------------------------------------
+
+# Uncached scans of files this big stream them instead of caching them;
+# parsing a whole file at once is several times faster but holds it all.
+STREAM_MIN_BYTES = 64 * 1024 * 1024
+
+def _current(filepath, backend, signature):
+    """
+    Return the cache entry for filepath if it matches signature, or None.
+
+    An entry holding changes not yet flushed is never dropped: if another
+    process wrote the file since, it is re-read under the file lock with
+    those changes replayed on top.
+    """
+    entry = _CACHE.get(os.path.abspath(filepath))
+    if entry is None or entry.is_current(signature):
+        return entry
+    if not entry.pending:
+        return None
+    with locked(filepath):
+        signature = backend.signature(filepath)
+        if not entry.is_current(signature):
+            _reload(filepath, entry, signature)
+    return entry
+
+
+def _entry(filepath):
+    """Return the cache entry for filepath, re-reading it only if it changed."""
+    backend = _backend_for(filepath)
+    signature = backend.signature(filepath)
+    entry = _current(filepath, backend, signature)
+    if entry is not None:
+        if entry.data is None:
+            entry.data = backend.read(filepath)
+        return entry
+    data = backend.read(filepath)
+    entry = _CACHE[os.path.abspath(filepath)] = _CacheEntry(signature, data)
+    return entry
+
+
+def _cached(filepath):
+    """Return the cached dict for filepath."""
+    return _entry(filepath).data
+
+
+def invalidate_cache(filepath=None):
+    """
+    Drop the cached copy of filepath, or of every file when None.
+    Changes deferred by batch() are written out first.
+    """
+    if filepath is not None and _sharded(filepath):
+        for path in shard_paths(filepath):
+            invalidate_cache(path)
+        return
+    flush(filepath)
+    if filepath is None:
+        _CACHE.clear()
+    else:
+        _CACHE.pop(os.path.abspath(filepath), None)
+
+
+@instrumentation.timed
+def load_json(filepath):
+    """
+    Load JSON data from file, returning empty dict on error.
+
+    The top-level dict is a fresh copy the caller may add to or delete from,
+    but the record dicts are shared with the cache and must not be mutated.
+    """
+    _ensure_data_dir()
+    if _sharded(filepath):
+        _preload_shards(filepath)
+        data = {}
+        for path in shard_paths(filepath):
+            data.update(load_json(path))
+        return data
+    backend = _backend_for(filepath)
+    if not backend.caches:
+        return backend.read(filepath)
+    return dict(_cached(filepath))
+
+
+@instrumentation.timed
+def get_record(filepath, key):
+    """Return a copy of a single record, or None, without copying the file."""
+    _ensure_data_dir()
+    if _sharded(filepath):
+        _preload_shards(filepath)
+        for path in shard_paths(filepath):
+            record = get_record(path, key)
+            if record is not None:
+                return record
+        return None
+    backend = _backend_for(filepath)
+    if not backend.caches:
+        return backend.read_record(filepath, key)
+    record = _cached(filepath).get(key)
+    return dict(record) if record is not None else None
+
+
+def iter_records(filepath):
+    """
+    Yield (key, record) pairs of a file; records must not be mutated.
+
+    Uses the cached copy when it is current. Otherwise a file of at
+    least STREAM_MIN_BYTES is streamed through the backend without
+    caching it, to keep memory flat, and a smaller one is loaded into
+    the cache, which is faster and serves the next call. A sharded
+    collection is scanned shard by shard, after parsing large cold
+    shards in parallel.
+    """
+    _ensure_data_dir()
+    if _sharded(filepath):
+        _preload_shards(filepath)
+        return itertools.chain.from_iterable(
+            iter_records(path) for path in shard_paths(filepath)
+        )
+    backend = _backend_for(filepath)
+    if backend.caches:
+        entry = _current(filepath, backend, backend.signature(filepath))
+        if entry is not None and entry.data is not None:
+            return iter(list(entry.data.items()))
+        if not os.path.exists(filepath) or os.path.getsize(filepath) < STREAM_MIN_BYTES:
+            return iter(list(_cached(filepath).items()))
+    return backend.iter(filepath)
+
+
+@instrumentation.timed
 def save_json(filepath, data):
-    """Persist data dict to JSON file."""
+    """Persist data dict to JSON file, discarding indexes built on the old data."""
+    if _sharded(filepath):
+        parts = {path: {} for path in shard_paths(filepath)}
+        for key, record in data.items():
+            parts[_shard_of(filepath, key, record)][key] = record
+        with locked(filepath):
+            for path, part in parts.items():
+                save_json(path, part)
+        return
+    backend = _backend_for(filepath)
+    with locked(filepath):
+        backend.write(filepath, data)
+        if not backend.caches:
+            return
+        # Any deferred changes are superseded by data.
+        _CACHE[os.path.abspath(filepath)] = _CacheEntry(
+            backend.signature(filepath), dict(data)
+        )
+
+
+@instrumentation.timed
+def put_record(filepath, key, record):
+    """Insert or replace a single record and update indexes incrementally."""
+    if _sharded(filepath):
+        put_record(_shard_of(filepath, key, record), key, record)
+        return
+    record = dict(record)
+    backend = _backend_for(filepath)
+    with locked(filepath):
+        if not backend.caches:
+            backend.write_record(filepath, None, key, record)
+            return
+        entry = _entry(filepath)
+        old = entry.data.get(key)
+        entry.data[key] = record
+        _persist(filepath, entry, key, record)
+        for index in entry.indexes.values():
+            index.apply(key, old, record)
+
+
+@instrumentation.timed
+def delete_record(filepath, key):
+    """Remove a single record. Returns True if deleted, False if not found."""
+    if _sharded(filepath):
+        return any(delete_record(path, key) for path in shard_paths(filepath))
+    backend = _backend_for(filepath)
+    with locked(filepath):
+        if not backend.caches:
+            return backend.remove_record(filepath, key)
+        entry = _entry(filepath)
+        old = entry.data.pop(key, None)
+        if old is None:
+            return False
+        _persist(filepath, entry, key, None)
+        for index in entry.indexes.values():
+            index.apply(key, old, None)
+        return True
+
+
+def _persist(filepath, entry, key, record):
+    """Write one change applied to entry now, or queue it inside batch()."""
+    with _DEFER_LOCK:
+        if _DEFER["depth"] or _WRITE_BEHIND["enabled"]:
+            if entry.pending is None:
+                entry.pending = []
+            entry.pending.append((key, record))
+            _DEFER["dirty"] += 1
+            if _WRITE_BEHIND["enabled"] and _DEFER["dirty"] >= _WRITE_BEHIND["max_dirty"]:
+                # Flush from the background thread: this one holds a file lock.
+                _WRITE_BEHIND["wake"].set()
+            return
+    backend = _backend_for(filepath)
+    backend.write_record(filepath, entry.data, key, record)
+    entry.signature = backend.signature(filepath)
+
+
+def _reload(filepath, entry, signature):
+    """
+    Re-read filepath into entry after another process changed it,
+    replaying the changes entry still has to write on top. The caller
+    holds the file lock.
+    """
+    data = _backend_for(filepath).read(filepath)
+    for key, record in entry.pending or ():
+        if record is None:
+            data.pop(key, None)
+        else:
+            data[key] = record
+    entry.data = data
+    entry.signature = signature
+    entry.indexes = {}
+
+
+def _pending(key):
+    entry = _CACHE.get(key)
+    return entry is not None and bool(entry.pending)
+
+
+def _collection_key(filepath):
+    """Return the absolute path of the collection filepath holds, or is a shard of."""
+    filepath = os.path.abspath(filepath)
+    return os.path.join(os.path.dirname(filepath), _collection_name(filepath))
+
+
+def _write_pending(key):
+    """Write the deferred changes of the file at absolute path key; the caller locks it."""
+    entry = _CACHE.get(key)
+    if entry is None or not entry.pending:
+        return
+    backend = _backend_for(key)
+    signature = backend.signature(key)
+    if signature != entry.signature:
+        _reload(key, entry, signature)
+    backend.write_records(key, entry.data, entry.pending)
+    entry.signature = backend.signature(key)
+    with _DEFER_LOCK:
+        _DEFER["dirty"] = max(0, _DEFER["dirty"] - len(entry.pending))
+    entry.pending = None
+
+
+def _run_written(held):
+    """
+    Run the waiting when_written() callbacks whose files are all written
+    and among the locked files in held. A callback sharing a file with
+    an earlier one that cannot run yet waits too, keeping their order.
+    """
+    with _DEFER_LOCK:
+        blocked, ready = set(), []
+        for item in _AFTER_FLUSH:
+            keys = item[0]
+            if keys & blocked or not keys <= held or any(map(_pending, keys)):
+                blocked |= keys
+            else:
+                ready.append(item)
+        for item in ready:
+            _AFTER_FLUSH.remove(item)
+    for position, (_, callback) in enumerate(ready):
+        try:
+            callback()
+        except BaseException:
+            # Keep this one and the rest for the next flush.
+            with _DEFER_LOCK:
+                _AFTER_FLUSH[:0] = ready[position:]
+            raise
+
+
+def flush(filepath=None):
+    """
+    Write changes deferred by batch() for filepath, or for every file.
+    Each file is written once, however many records changed. Changes
+    other processes wrote in the meantime are read back first, under
+    the file lock, so only the deferred records replace what is there.
+    Callbacks waiting in when_written() for these files run after the
+    write, while the files are still locked.
+    """
+    if filepath is None:
+        with _DEFER_LOCK:
+            keys = {key for item in _AFTER_FLUSH for key in item[0]}
+        keys.update(key for key, entry in list(_CACHE.items()) if entry.pending)
+        groups = {}
+        for key in keys:
+            groups.setdefault(_collection_key(key), set()).add(key)
+        groups = list(groups.values())
+    else:
+        groups = [{os.path.abspath(path) for path in shard_paths(filepath)}]
+    for keys in groups:
+        # Sorted, so shards are locked in the same order as locked() does.
+        with ExitStack() as stack:
+            for key in sorted(keys):
+                stack.enter_context(locked(key))
+            for key in sorted(keys):
+                _write_pending(key)
+            _run_written(keys)
+
+
+def when_written(filepath, callback):
+    """
+    Call callback once the changes made so far to filepath, or to any
+    shard of it, are written: at once unless batch() or write-behind
+    holds some back, otherwise from the flush() that writes them.
+    Returns what callback returned if it ran at once, else None.
+    discard() drops the callback together with the changes.
+    """
+    keys = frozenset(
+        key for key in map(os.path.abspath, shard_paths(filepath)) if _pending(key)
+    )
+    if not keys:
+        return callback()
+    with _DEFER_LOCK:
+        _AFTER_FLUSH.append((keys, callback))
+    return None
+
+
+def write_through(filepath):
+    """
+    Flush filepath now if write-behind is holding back changes to it.
+
+    Call it before releasing a lock that guards a check, such as free
+    rooms or a unique email, so that other processes checking next see
+    the write. Changes deferred by an open batch() are left to the batch;
+    its caller must hold the locks until the block exits, as Session does.
+    """
+    if _WRITE_BEHIND["enabled"] and not _DEFER["depth"]:
+        flush(filepath)
+
+
+def discard(filepath=None):
+    """
+    Drop the changes to filepath, or to every file, deferred by batch()
+    instead of writing them, and the cached copy holding them, so the
+    next read sees the file. when_written() callbacks waiting for them
+    are dropped too.
+    """
+    if filepath is None:
+        keys = [key for key, entry in list(_CACHE.items()) if entry.pending]
+    else:
+        keys = [os.path.abspath(path) for path in shard_paths(filepath)]
+    for key in keys:
+        with locked(key):
+            entry = _CACHE.get(key)
+            if entry is None or not entry.pending:
+                continue
+            del _CACHE[key]
+            with _DEFER_LOCK:
+                _DEFER["dirty"] = max(0, _DEFER["dirty"] - len(entry.pending))
+                _AFTER_FLUSH[:] = [item for item in _AFTER_FLUSH if key not in item[0]]
+
+
+def export_file(filepath, out_path, codec="json-pretty"):
+    """
+    Write the collection stored at filepath to out_path with codec,
+    whatever backend, codec or sharding holds it. The default writes
+    indented JSON for people to read. Returns the number of records.
+    """
+    data = load_json(filepath)
+    _atomic_write(out_path, data, codec=serialization.get_codec(codec))
+    return len(data)
+
+
+@contextmanager
+def batch():
+    """
+    Group the single-record writes made inside the block.
+
+    put_record and delete_record update the cache and indexes at once,
+    so reads in this process see the changes, but each touched file is
+    written only once when the outermost block exits. Other processes
+    see the changes only after that.
+    """
+    with _DEFER_LOCK:
+        _DEFER["depth"] += 1
+    try:
+        yield
+    finally:
+        with _DEFER_LOCK:
+            _DEFER["depth"] -= 1
+            outermost = not _DEFER["depth"]
+        if outermost:
+            flush()
+
+
+def _flush_loop(wake, stop):
+    while not stop.is_set():
+        wake.wait(_WRITE_BEHIND["interval"])
+        wake.clear()
+        try:
+            flush()
+            _WRITE_BEHIND["flushes"] += 1
+        except OSError as exc:
+            # Changes stay pending and are retried on the next round.
+            logger.error("Error flushing data files: %s", exc)
+
+
+def enable_write_behind(interval=1.0, max_dirty=1000):
+    """
+    Defer all single-record writes to a background flusher.
+
+    Changes are visible in this process at once and are written every
+    interval seconds, or sooner once max_dirty changes are queued, with
+    one write per touched file. flush() forces a write and pending
+    changes are also flushed at interpreter exit. Other processes only
+    see changes after they are flushed, so writes guarded by a check
+    made under a lock call write_through() before unlocking. Changes
+    other processes write meanwhile are merged, not overwritten.
+    """
+    disable_write_behind()
+    wake, stop = threading.Event(), threading.Event()
+    thread = threading.Thread(
+        target=_flush_loop, args=(wake, stop), name="data-flusher", daemon=True
+    )
+    _WRITE_BEHIND.update(
+        enabled=True,
+        interval=interval,
+        max_dirty=max_dirty,
+        thread=thread,
+        wake=wake,
+        stop=stop,
+    )
+    thread.start()
+
+
+def disable_write_behind():
+    """Stop the background flusher and write everything still pending."""
+    if _WRITE_BEHIND["enabled"]:
+        _WRITE_BEHIND["enabled"] = False
+        _WRITE_BEHIND["stop"].set()
+        _WRITE_BEHIND["wake"].set()
+        _WRITE_BEHIND["thread"].join()
+        _WRITE_BEHIND["thread"] = None
+    flush()
+
+
+def write_behind_stats():
+    """Return whether write-behind is on, queued changes and flushes run."""
+    return {
+        "enabled": _WRITE_BEHIND["enabled"],
+        "dirty": _DEFER["dirty"],
+        "flushes": _WRITE_BEHIND["flushes"],
+    }
+
+
+atexit.register(flush)
+
+
+def get_index(filepath, name, factory):
+    """
+    Return the index called name over filepath, building it if needed.
+
+    factory receives an iterable of (key, record) pairs and returns an
+    object with an apply(key, old_record, new_record) method, which
+    put_record and delete_record call to keep it current. The index is
+    rebuilt whenever the file is re-read or replaced with save_json.
+    If the file is not cached yet, the index is built from a stream of the
+    file and the records themselves are only loaded once something needs
+    them. Backends that do not cache rebuild it on every call, so hot
+    paths should prefer the backend's own queries when it offers them.
+    Sharded collections are rebuilt on every call too; hot paths should
+    ask for an index over a single shard from shard_for().
+    """
     _ensure_data_dir()
-    with open(filepath, "w", encoding="utf-8") as fh:
-        json.dump(data, fh, indent=2)
\ No newline at end of file
+    if _sharded(filepath):
+        return factory(iter_records(filepath))
+    backend = _backend_for(filepath)
+    if not backend.caches:
+        return factory(backend.iter(filepath))
+    signature = backend.signature(filepath)
+    entry = _current(filepath, backend, signature)
+    if entry is None:
+        entry = _CACHE[os.path.abspath(filepath)] = _CacheEntry(signature, None)
+    index = entry.indexes.get(name)
+    if index is None:
+        items = entry.data.items() if entry.data is not None else backend.iter(filepath)
+        index = entry.indexes[name] = factory(items)
+    return index
+
+
+if os.environ.get("HOTEL_RESERVATION_STORAGE"):
+    _BACKENDS[os.path.basename(RESERVATIONS_FILE)] = _backend_from_env(
+        "HOTEL_RESERVATION_STORAGE"
+    )
+
+if os.environ.get("HOTEL_SHARDS"):
+    _shards_from_env(os.environ["HOTEL_SHARDS"])
+
+if os.environ.get("HOTEL_WRITE_BEHIND"):
+    enable_write_behind(interval=float(os.environ["HOTEL_WRITE_BEHIND"]))
@@ -1,11 +1,30 @@
-import uuid
+import heapq
+import logging
 
+from . import bulk, changefeed, data_handler, instrumentation, session
+from .availability import CapacityIndex, to_ordinal
 from .reservation import Reservation
-from models.data_handler import (HOTELS_FILE, load_json, save_json)
+
+logger = logging.getLogger(__name__)
+
 
 class Hotel:
     """Represents a hotel with rooms and reservations."""
 
+    ID_FIELD = "hotel_id"
+    # data_handler attribute naming the file; used by session.Session.
+    COLLECTION = "HOTELS_FILE"
+    FIELDS = ("hotel_id", "name", "address", "total_rooms", "phone")
+    MODIFIABLE = {"name", "address", "total_rooms", "phone"}
+    # search_available orderings: most free rooms first, or by name or ID.
+    SEARCH_SORTS = {
+        "available": lambda free, name, hid: (-free, name, hid),
+        "name": lambda free, name, hid: (name, hid),
+        "hotel_id": lambda free, name, hid: hid,
+    }
+
+    __slots__ = FIELDS
+
     def __init__(self, hotel_id, name, address, total_rooms, phone=""):
         if not isinstance(total_rooms, int) or total_rooms <= 0:
             raise ValueError("total_rooms must be a positive integer.")
@@ -59,108 +78,241 @@ class Hotel:
     # ------------------------------------------------------------------
     @staticmethod
     def _load_all():
-        print(f"Loading hotels from {HOTELS_FILE}...")
-        return load_json(HOTELS_FILE)
+        logger.debug("Loading hotels from %s", data_handler.HOTELS_FILE)
+        return data_handler.load_json(data_handler.HOTELS_FILE)
 
     @staticmethod
     def _save_all(data):
-        save_json(HOTELS_FILE, data)
+        data_handler.save_json(data_handler.HOTELS_FILE, data)
 
     @classmethod
+    @instrumentation.timed
     def create(cls, name, address, total_rooms, phone=""):
         """Persist a new hotel and return the instance."""
         hotel = cls(
-            hotel_id=str(uuid.uuid4()),
+            hotel_id=data_handler.new_id(),
             name=name,
             address=address,
             total_rooms=total_rooms,
             phone=phone,
         )
-        data = cls._load_all()
-        data[hotel.hotel_id] = hotel.to_dict()
-        cls._save_all(data)
-        return hotel
+        record = hotel.to_dict()
+        data_handler.put_record(data_handler.HOTELS_FILE, hotel.hotel_id, record)
+        changefeed.emit(data_handler.HOTELS_FILE, "create", hotel.hotel_id, record)
+        return session.track(hotel)
 
     @classmethod
+    @instrumentation.timed
+    @session.identity_mapped
     def get(cls, hotel_id):
         """Return a Hotel by ID or None if not found."""
-        data = cls._load_all()
-        record = data.get(str(hotel_id))
+        record = data_handler.get_record(data_handler.HOTELS_FILE, str(hotel_id))
         if record is None:
             return None
         try:
             return cls.from_dict(record)
         except ValueError as exc:
-            print(f"ERROR reading hotel {hotel_id}: {exc}")
+            logger.error(
+                "Error reading hotel %s: %s", hotel_id, exc,
+                extra={"record_id": hotel_id},
+            )
             return None
 
     @classmethod
+    @instrumentation.timed
+    def iter_all(cls):
+        """Yield every valid Hotel while streaming the stored records."""
+        count = 0
+        try:
+            for hid, record in data_handler.iter_records(data_handler.HOTELS_FILE):
+                try:
+                    hotel = cls.from_dict(record)
+                except ValueError as exc:
+                    logger.error(
+                        "Error reading hotel %s: %s. Skipping record.", hid, exc,
+                        extra={"record_id": hid},
+                    )
+                    continue
+                count += 1
+                yield hotel
+        finally:
+            instrumentation.add_records("Hotel.iter_all", count)
+
+    @classmethod
+    @instrumentation.timed
     def get_all(cls):
         """Return list of all valid Hotel instances."""
-        data = cls._load_all()
-        hotels = []
-        for hid, record in data.items():
-            try:
-                hotels.append(cls.from_dict(record))
-            except ValueError as exc:
-                print(f"ERROR reading hotel {hid}: {exc}. Skipping record.")
-        return hotels
+        return list(cls.iter_all())
 
     @classmethod
+    @instrumentation.timed
     def delete(cls, hotel_id):
         """Remove a hotel by ID. Returns True if deleted, False if not found."""
-        data = cls._load_all()
-        hotel_id = str(hotel_id)
-        if hotel_id not in data:
-            return False
-        del data[hotel_id]
-        cls._save_all(data)
-        return True
+        with data_handler.locked(data_handler.HOTELS_FILE):
+            deleted = data_handler.delete_record(data_handler.HOTELS_FILE, str(hotel_id))
+            if deleted:
+                changefeed.emit(data_handler.HOTELS_FILE, "delete", hotel_id)
+                session.forget(cls, hotel_id)
+        return deleted
 
     @classmethod
+    @instrumentation.timed
     def modify(cls, hotel_id, **kwargs):
         """Update allowed fields for a hotel. Returns updated Hotel or None."""
-        allowed = {"name", "address", "total_rooms", "phone"}
-        data = cls._load_all()
         hotel_id = str(hotel_id)
-        if hotel_id not in data:
-            return None
-        record = data[hotel_id]
-        for key, value in kwargs.items():
-            if key in allowed:
-                record[key] = value
-        try:
-            hotel = cls.from_dict(record)
-        except ValueError as exc:
-            print(f"ERROR modifying hotel {hotel_id}: {exc}")
-            return None
-        data[hotel_id] = hotel.to_dict()
-        cls._save_all(data)
-        return hotel
+        with data_handler.locked(data_handler.HOTELS_FILE):
+            record = data_handler.get_record(data_handler.HOTELS_FILE, hotel_id)
+            if record is None:
+                return None
+            for key, value in kwargs.items():
+                if key in cls.MODIFIABLE:
+                    record[key] = value
+            try:
+                hotel = cls.from_dict(record)
+            except ValueError as exc:
+                logger.error(
+                    "Error modifying hotel %s: %s", hotel_id, exc,
+                    extra={"record_id": hotel_id},
+                )
+                return None
+            record = hotel.to_dict()
+            data_handler.put_record(data_handler.HOTELS_FILE, hotel_id, record)
+            changefeed.emit(data_handler.HOTELS_FILE, "modify", hotel_id, record)
+        return session.track(hotel)
+
+    # ------------------------------------------------------------------
+    # Bulk operations
+    # ------------------------------------------------------------------
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_create(cls, records):
+        """
+        Persist many hotels in a single load/save cycle.
+        Records missing hotel_id get a new UUID. Returns (hotels, errors)
+        with errors as a list of (position, message).
+        """
+        return bulk.bulk_create(
+            data_handler.HOTELS_FILE,
+            records,
+            lambda record: cls.from_dict(
+                {**record, "hotel_id": record.get("hotel_id") or data_handler.new_id()}
+            ),
+        )
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_modify(cls, updates):
+        """
+        Apply {hotel_id: {field: value}} updates in a single load/save cycle.
+        Returns (updated hotels, errors) with errors as (id, message).
+        """
+        return bulk.bulk_modify(
+            data_handler.HOTELS_FILE, updates, cls.MODIFIABLE, cls.from_dict
+        )
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_delete(cls, hotel_ids):
+        """
+        Remove many hotels in a single load/save cycle.
+        Returns (deleted ids, errors) with errors as (id, message).
+        """
+        return bulk.bulk_delete(data_handler.HOTELS_FILE, hotel_ids)
+
+    @classmethod
+    @instrumentation.timed
+    def export(cls, out, fmt="jsonl"):
+        """Stream all hotels to a text file as "jsonl" or "csv"; returns the count."""
+        return bulk.export(data_handler.HOTELS_FILE, out, cls.FIELDS, fmt)
 
     # ------------------------------------------------------------------
     # Room availability helpers
     # ------------------------------------------------------------------
 
-    def available_rooms(self):
-        """Return number of rooms not currently reserved."""
-        active = Reservation.count_active_for_hotel(self.hotel_id)
-        return self.total_rooms - active
+    @instrumentation.timed
+    def available_rooms(self, check_in=None, check_out=None):
+        """
+        Return number of rooms not currently reserved.
+        With dates, return the rooms free on every night of that stay.
+        """
+        booked = Reservation.count_active_for_hotel(self.hotel_id, check_in, check_out)
+        return self.total_rooms - booked
+
+    @classmethod
+    @instrumentation.timed
+    def search_available(
+        cls, check_in, check_out, min_rooms=1, sort="available", offset=0, limit=None
+    ):
+        """
+        Return [(hotel, free_rooms)] for every hotel with at least
+        min_rooms free on each night from check_in up to check_out.
+
+        Bookings come from one pass over the occupancy index and room
+        counts from a capacity index over the hotels, both kept current
+        by writes, and only the hotels on the requested page are read.
+        Results are ordered by sort (see SEARCH_SORTS) and sliced with
+        offset and limit.
+        """
+        if to_ordinal(check_out) <= to_ordinal(check_in):
+            raise ValueError("check_out must be later than check_in.")
+        if not isinstance(min_rooms, int) or min_rooms < 0:
+            raise ValueError("min_rooms must be a non-negative integer.")
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("offset must be a non-negative integer.")
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            raise ValueError("limit must be a non-negative integer.")
+        order = cls.SEARCH_SORTS.get(sort)
+        if order is None:
+            raise ValueError(f"sort must be one of {', '.join(cls.SEARCH_SORTS)}.")
+
+        booked = Reservation.booked_by_hotel(check_in, check_out)
+        capacity = data_handler.get_index(
+            data_handler.HOTELS_FILE, "capacity", CapacityIndex.build
+        )
+        matches = []
+        for hid, (total, name) in capacity.items():
+            free = total - booked.get(hid, 0)
+            if free >= min_rooms:
+                matches.append((order(free, name, hid), free, hid))
+        if limit is None:
+            matches.sort(key=lambda match: match[0])
+            page = matches[offset:]
+        else:
+            page = heapq.nsmallest(offset + limit, matches, key=lambda match: match[0])[offset:]
 
+        results = []
+        for _, free, hid in page:
+            hotel = cls.get(hid)
+            if hotel is not None:
+                results.append((hotel, free))
+        return results
+
+    @instrumentation.timed
     def reserve_room(self, customer_id, check_in, check_out):
         """
         Create a reservation for this hotel.
         Returns the Reservation or raises ValueError if no rooms available.
         """
-        if self.available_rooms() <= 0:
-            raise ValueError(f"No available rooms in hotel {self.hotel_id}.")
-        return Reservation.create(
-            customer_id=customer_id,
-            hotel_id=self.hotel_id,
-            check_in=check_in,
-            check_out=check_out,
-        )
+        if to_ordinal(check_out) <= to_ordinal(check_in):
+            raise ValueError("check_out must be later than check_in.")
+        # Check and book under one lock so concurrent bookings cannot
+        # overbook; with sharding, only this hotel's shard is locked.
+        shard = data_handler.shard_for(data_handler.RESERVATIONS_FILE, self.hotel_id)
+        with data_handler.locked(shard):
+            if self.available_rooms(check_in, check_out) <= 0:
+                raise ValueError(f"No available rooms in hotel {self.hotel_id}.")
+            reservation = Reservation.create(
+                customer_id=customer_id,
+                hotel_id=self.hotel_id,
+                check_in=check_in,
+                check_out=check_out,
+            )
+            # Under write-behind, land the booking before other processes check.
+            data_handler.write_through(shard)
+            return reservation
 
+    @instrumentation.timed
     def cancel_reservation(self, reservation_id):
         """Cancel a reservation associated with this hotel."""
         reservation = Reservation.get(reservation_id)
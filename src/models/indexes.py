@@ -0,0 +1,118 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+
+class FieldIndex:
+    """
+    Secondary index from one record field to the keys holding each value.
+
+    Built lazily through data_handler.get_index and kept current by
+    put_record/delete_record, so a lookup costs time proportional to the
+    number of matching keys rather than to the size of the file.
+    """
+
+    def __init__(self, field, normalize=str):
+        self.field = field
+        self.normalize = normalize
+        self._keys = defaultdict(set)
+
+    @classmethod
+    def factory(cls, field, normalize=str):
+        """
+        Return a data_handler.get_index factory indexing field, with
+        values passed through normalize (e.g. to ignore case).
+        """
+        def build(items):
+            index = cls(field, normalize)
+            for key, record in items:
+                index.apply(key, None, record)
+            return index
+        return build
+
+    def apply(self, key, old, new):
+        """Move key from the value of old to the value of new."""
+        if old is not None and self.field in old:
+            value = self.normalize(old[self.field])
+            keys = self._keys.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[value]
+        if new is not None and self.field in new:
+            self._keys[self.normalize(new[self.field])].add(key)
+
+    def lookup(self, value):
+        """Return the keys of records whose field equals value."""
+        return set(self._keys.get(self.normalize(value), ()))
+
+
+def casefold(value):
+    """Normalize a text value for case-insensitive indexes."""
+    return str(value).strip().casefold()
+
+
+class PrefixIndex:
+    """
+    Sorted index over a tuple of record fields, such as (last_name,
+    first_name), for type-ahead searches.
+
+    Entries are kept in one sorted list of (value, ..., key) tuples, so a
+    search is a binary search plus one step per match, and put_record and
+    delete_record update it with one bisect each instead of a rebuild.
+    Values are compared after normalize, case-insensitively by default.
+    """
+
+    def __init__(self, fields, normalize=casefold):
+        self.fields = tuple(fields)
+        self.normalize = normalize
+        self._entries = []
+
+    @classmethod
+    def factory(cls, fields, normalize=casefold):
+        """Return a data_handler.get_index factory indexing fields."""
+        def build(items):
+            index = cls(fields, normalize)
+            index._entries = sorted(
+                entry for entry in (index._entry(key, record) for key, record in items)
+                if entry is not None
+            )
+            return index
+        return build
+
+    def _entry(self, key, record):
+        if not all(field in record for field in self.fields):
+            return None
+        return tuple(self.normalize(record[field]) for field in self.fields) + (key,)
+
+    def apply(self, key, old, new):
+        """Replace the entry of old with the entry of new."""
+        entry = self._entry(key, old) if old is not None else None
+        if entry is not None:
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+        entry = self._entry(key, new) if new is not None else None
+        if entry is not None:
+            insort(self._entries, entry)
+
+    def search(self, *prefixes, limit=None):
+        """
+        Return the keys, in sorted order, of records whose leading fields
+        equal all but the last of prefixes and whose next field starts
+        with the last one. search("smi") matches every Smith; search(
+        "smith", "j") matches Smiths whose first name starts with J.
+        """
+        if not prefixes or len(prefixes) > len(self.fields):
+            raise ValueError(f"Expected 1 to {len(self.fields)} prefixes.")
+        *exact, prefix = (self.normalize(value) for value in prefixes)
+        exact = tuple(exact)
+        depth = len(exact)
+        keys = []
+        position = bisect_left(self._entries, exact + (prefix,))
+        while position < len(self._entries) and (limit is None or len(keys) < limit):
+            entry = self._entries[position]
+            if entry[:depth] != exact or not entry[depth].startswith(prefix):
+                break
+            keys.append(entry[-1])
+            position += 1
+        return keys
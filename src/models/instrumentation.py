@@ -0,0 +1,318 @@
+"""
+Counters, latency histograms and profiling hooks for the model layer.
+
+Every function wrapped with @timed counts its calls, errors and the
+time spent in it, bucketed into a histogram. data_handler also counts
+the bytes it reads and writes per file, and full scans count the
+records they yield. Read the numbers with stats()
+or render them for Prometheus with prometheus_text().
+
+Environment variables, read once at import:
+
+    HOTEL_METRICS=off      skip all measurement; @timed then returns
+                           functions unwrapped, so they cost nothing
+                           and set_enabled(True) cannot time them
+    HOTEL_PROFILE=cprofile run the process under cProfile; "tracemalloc"
+                           traces allocations, "cprofile,tracemalloc"
+                           does both. Results are written at exit to
+                           HOTEL_PROFILE_OUT (default hotel-profile-<pid>)
+                           with a .prof or .tracemalloc.txt suffix.
+    HOTEL_LOG_FORMAT=json  log one JSON object per line (see
+                           configure_logging)
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# inspect.CO_GENERATOR, without importing inspect at startup.
+_CO_GENERATOR = 0x20
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_ENABLED = {"on": os.environ.get("HOTEL_METRICS", "on").lower() not in ("0", "off", "false")}
+_GUARD = threading.Lock()
+_TIMINGS = {}
+_BYTES = {"read": {}, "written": {}}
+_RECORDS = {}
+_PROFILE = {"cprofile": None, "tracemalloc": False, "out": None}
+
+
+class _Timing:
+    """Call count, error count, total time and histogram of one operation."""
+
+    __slots__ = ("calls", "errors", "total", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        # One count per bucket plus one for slower calls (+Inf).
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def to_dict(self):
+        cumulative, counts = 0, {}
+        for bound, count in zip(BUCKETS + (float("inf"),), self.buckets):
+            cumulative += count
+            counts["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.calls if self.calls else 0.0,
+            "buckets": counts,
+        }
+
+
+def enabled():
+    """Return True while measurements are being recorded."""
+    return _ENABLED["on"]
+
+
+def set_enabled(flag):
+    """
+    Turn measurement on or off for this process. Functions decorated
+    while it was off are not timed either way.
+    """
+    _ENABLED["on"] = bool(flag)
+
+
+def observe(name, seconds, failed=False):
+    """Record one call of operation name that took seconds."""
+    with _GUARD:
+        timing = _TIMINGS.get(name)
+        if timing is None:
+            timing = _TIMINGS[name] = _Timing()
+        timing.calls += 1
+        timing.total += seconds
+        timing.buckets[bisect_left(BUCKETS, seconds)] += 1
+        if failed:
+            timing.errors += 1
+
+
+def add_bytes(direction, filepath, count):
+    """Add count bytes "read" from or "written" to filepath."""
+    if not _ENABLED["on"]:
+        return
+    name = os.path.basename(filepath)
+    with _GUARD:
+        totals = _BYTES[direction]
+        totals[name] = totals.get(name, 0) + count
+
+
+def add_records(name, count):
+    """Add count records yielded by a scan of operation name."""
+    if not _ENABLED["on"]:
+        return
+    with _GUARD:
+        _RECORDS[name] = _RECORDS.get(name, 0) + count
+
+
+def timed(func=None, name=None):
+    """
+    Decorator recording calls of func under name (its qualified name by
+    default). A generator function is timed from the call until the
+    generator is exhausted or closed, so a scan counts as one call.
+    While measurement is off func is returned as it is.
+    """
+    if func is None:
+        return lambda f: timed(f, name)
+    if not _ENABLED["on"]:
+        return func
+    name = name or func.__qualname__
+
+    if func.__code__.co_flags & _CO_GENERATOR:
+        @functools.wraps(func)
+        def generator(*args, **kwargs):
+            if not _ENABLED["on"]:
+                yield from func(*args, **kwargs)
+                return
+            start, failed = time.perf_counter(), True
+            try:
+                yield from func(*args, **kwargs)
+                failed = False
+            except GeneratorExit:
+                failed = False
+                raise
+            finally:
+                observe(name, time.perf_counter() - start, failed)
+        return generator
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _ENABLED["on"]:
+            return func(*args, **kwargs)
+        start, failed = time.perf_counter(), True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            observe(name, time.perf_counter() - start, failed)
+    return wrapper
+
+
+def stats():
+    """
+    Return {"operations": {name: {calls, errors, total_seconds,
+    mean_seconds, buckets}}, "bytes_read": {file: n}, "bytes_written":
+    {file: n}, "records": {name: n}}. Bucket counts are cumulative,
+    keyed by upper bound.
+    """
+    with _GUARD:
+        return {
+            "operations": {name: t.to_dict() for name, t in sorted(_TIMINGS.items())},
+            "bytes_read": dict(_BYTES["read"]),
+            "bytes_written": dict(_BYTES["written"]),
+            "records": dict(sorted(_RECORDS.items())),
+        }
+
+
+def reset():
+    """Zero every counter and histogram."""
+    with _GUARD:
+        _TIMINGS.clear()
+        _RECORDS.clear()
+        for totals in _BYTES.values():
+            totals.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(prefix="hotel"):
+    """Return stats() in the Prometheus text exposition format."""
+    snapshot = stats()
+    lines = [
+        f"# HELP {prefix}_operation_seconds Time spent in model and storage operations.",
+        f"# TYPE {prefix}_operation_seconds histogram",
+    ]
+    for name, timing in snapshot["operations"].items():
+        op = _label(name)
+        for bound, count in timing["buckets"].items():
+            lines.append(f'{prefix}_operation_seconds_bucket{{op="{op}",le="{bound}"}} {count}')
+        lines.append(f'{prefix}_operation_seconds_sum{{op="{op}"}} {timing["total_seconds"]!r}')
+        lines.append(f'{prefix}_operation_seconds_count{{op="{op}"}} {timing["calls"]}')
+    lines += [
+        f"# HELP {prefix}_operation_errors_total Operations that raised.",
+        f"# TYPE {prefix}_operation_errors_total counter",
+    ]
+    for name, timing in snapshot["operations"].items():
+        lines.append(f'{prefix}_operation_errors_total{{op="{_label(name)}"}} {timing["errors"]}')
+    for direction in ("read", "written"):
+        metric = f"{prefix}_bytes_{direction}_total"
+        lines += [
+            f"# HELP {metric} Bytes {direction} by the storage layer.",
+            f"# TYPE {metric} counter",
+        ]
+        for filename, count in sorted(snapshot[f"bytes_{direction}"].items()):
+            lines.append(f'{metric}{{file="{_label(filename)}"}} {count}')
+    lines += [
+        f"# HELP {prefix}_records_total Records yielded by full scans.",
+        f"# TYPE {prefix}_records_total counter",
+    ]
+    for name, count in snapshot["records"].items():
+        lines.append(f'{prefix}_records_total{{op="{_label(name)}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# Logging
+# ----------------------------------------------------------------------
+
+# LogRecord attributes that are not extra fields passed by the caller.
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object, including any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=logging.INFO, fmt=None):
+    """
+    Send the "models" loggers to stderr, as JSON lines when fmt (or
+    HOTEL_LOG_FORMAT) is "json" and as plain text otherwise.
+    """
+    fmt = fmt or os.environ.get("HOTEL_LOG_FORMAT", "text")
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger("models")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    return logger
+
+
+# ----------------------------------------------------------------------
+# Profiling
+# ----------------------------------------------------------------------
+
+def start_profiling(kinds=("cprofile",), out=None):
+    """
+    Start cProfile and/or tracemalloc for this process; stop_profiling()
+    (run automatically at exit) writes the results next to out.
+    """
+    _PROFILE["out"] = out or f"hotel-profile-{os.getpid()}"
+    if "tracemalloc" in kinds:
+        import tracemalloc
+        tracemalloc.start()
+        _PROFILE["tracemalloc"] = True
+    if "cprofile" in kinds:
+        import cProfile
+        _PROFILE["cprofile"] = cProfile.Profile()
+        _PROFILE["cprofile"].enable()
+
+
+def stop_profiling(top=25):
+    """Stop profiling and return the paths of the files written."""
+    written = []
+    profiler = _PROFILE["cprofile"]
+    if profiler is not None:
+        profiler.disable()
+        path = _PROFILE["out"] + ".prof"
+        profiler.dump_stats(path)
+        _PROFILE["cprofile"] = None
+        written.append(path)
+    if _PROFILE["tracemalloc"]:
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _PROFILE["tracemalloc"] = False
+        path = _PROFILE["out"] + ".tracemalloc.txt"
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(f"current={current} peak={peak}\n")
+            for stat in snapshot.statistics("lineno")[:top]:
+                fh.write(f"{stat}\n")
+        written.append(path)
+    return written
+
+
+if os.environ.get("HOTEL_PROFILE"):
+    start_profiling(
+        [kind.strip().lower() for kind in os.environ["HOTEL_PROFILE"].split(",")],
+        os.environ.get("HOTEL_PROFILE_OUT"),
+    )
+    atexit.register(stop_profiling)
@@ -0,0 +1,381 @@
+"""
+Integrity check of the stored hotels, customers and reservations.
+
+check() reads every collection and reports, as a list of problems:
+
+    invalid           a record from_dict rejects, or with an unknown status
+    key_mismatch      a record stored under a key other than its own ID
+    bad_dates         a reservation whose dates are not ISO dates, or
+                      whose check_out is not after its check_in
+    missing_hotel     a reservation whose hotel or customer no longer
+    missing_customer  exists (after Hotel.delete or Customer.delete)
+    overbooked        a hotel with more overlapping active stays on some
+                      night than it has rooms
+    duplicate_email   customers sharing an email, ignoring case
+    misnamed_file     a file in the data directory named like a
+                      collection but not read as one, e.g. reservation.json
+
+Foreign keys are resolved against hash sets of the hotel and customer
+IDs, and occupancy by one sweep over each hotel's check-ins and
+check-outs, so the check is linear in the number of records. Records are
+validated in chunks, across a process pool once there are
+PARALLEL_MIN_RECORDS of them.
+
+With repair, orphaned active reservations are cancelled and the records
+of a misnamed file are moved into the empty collection it was meant to
+be. With quarantine, records with problems of their own (see
+RECORD_KINDS) are moved out of their collection into
+<data dir>/quarantine/<collection>.json, with the reasons. Overbookings
+and duplicate emails are only reported: which booking or customer should
+give way is for a person to decide. Changes are made in one Session, so
+they land together and go to the change feed.
+"""
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timezone
+
+from . import changefeed, data_handler, session
+from .availability import to_ordinal
+from .customer import Customer
+from .hotel import Hotel
+from .indexes import casefold
+from .reservation import Reservation
+
+logger = logging.getLogger(__name__)
+
+MODELS = {"hotels": Hotel, "customers": Customer, "reservations": Reservation}
+STATUSES = (Reservation.STATUS_ACTIVE, Reservation.STATUS_CANCELLED)
+# Problems confined to one record, which quarantine moves aside.
+RECORD_KINDS = ("invalid", "key_mismatch", "bad_dates", "missing_hotel", "missing_customer")
+QUARANTINE_DIR = "quarantine"
+CHUNK_SIZE = 20000
+# Below this many records in total, a process pool costs more than it saves.
+PARALLEL_MIN_RECORDS = 200000
+
+# Hotel and customer IDs for the foreign-key joins in worker processes.
+_JOINS = {}
+
+
+def _filepath(name):
+    return getattr(data_handler, MODELS[name].COLLECTION)
+
+
+def _problem(collection, record_id, kind, message, **details):
+    return {
+        "collection": collection, "id": record_id, "kind": kind,
+        "message": message, "action": None, **details,
+    }
+
+
+# ----------------------------------------------------------------------
+# Per-record checks (run in worker processes for large datasets)
+# ----------------------------------------------------------------------
+
+def _init_worker(hotel_ids, customer_ids):
+    _JOINS.update(hotels=hotel_ids, customers=customer_ids)
+
+
+def _check_chunk(name, items, joins=None):
+    """
+    Check a chunk of (key, record) pairs of collection name. Returns
+    (problems, stays), where stays lists (hotel_id, first night, check-out
+    ordinal, reservation_id) of the sound active reservations.
+    """
+    joins = joins or _JOINS
+    cls = MODELS[name]
+    problems, stays = [], []
+    for key, record in items:
+        if not isinstance(record, dict):
+            problems.append(_problem(name, key, "invalid", "Record is not an object."))
+            continue
+        try:
+            obj = cls.from_dict(record)
+        except (TypeError, ValueError) as exc:
+            problems.append(_problem(name, key, "invalid", str(exc)))
+            continue
+        if getattr(obj, cls.ID_FIELD) != key:
+            problems.append(_problem(
+                name, key, "key_mismatch",
+                f"Stored under {key} but its {cls.ID_FIELD} is {getattr(obj, cls.ID_FIELD)}.",
+            ))
+        if name != "reservations":
+            continue
+        if obj.status not in STATUSES:
+            problems.append(_problem(name, key, "invalid", f"Unknown status {obj.status!r}."))
+        first = None
+        try:
+            first, last = to_ordinal(obj.check_in), to_ordinal(obj.check_out)
+        except ValueError:
+            problems.append(_problem(
+                name, key, "bad_dates",
+                f"Dates {obj.check_in!r} to {obj.check_out!r} are not ISO dates.",
+            ))
+        else:
+            if last <= first:
+                problems.append(_problem(
+                    name, key, "bad_dates",
+                    f"check_out {obj.check_out} is not after check_in {obj.check_in}.",
+                ))
+                first = None
+        hotel_known = obj.hotel_id in joins["hotels"]
+        if not hotel_known:
+            problems.append(_problem(
+                name, key, "missing_hotel", f"Hotel {obj.hotel_id} does not exist.",
+                status=obj.status,
+            ))
+        if obj.customer_id not in joins["customers"]:
+            problems.append(_problem(
+                name, key, "missing_customer", f"Customer {obj.customer_id} does not exist.",
+                status=obj.status,
+            ))
+        if first is not None and hotel_known and obj.status == Reservation.STATUS_ACTIVE:
+            stays.append((obj.hotel_id, first, last, key))
+    return problems, stays
+
+
+def _check_records(records, joins, workers, chunk_size):
+    """Run _check_chunk over every collection; returns (problems, stays, workers)."""
+    jobs = []
+    for name, data in records.items():
+        items = list(data.items())
+        jobs += [(name, items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+    if workers is None:
+        total = sum(len(data) for data in records.values())
+        workers = (os.cpu_count() or 1) if total >= PARALLEL_MIN_RECORDS else 1
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        results = [_check_chunk(name, items, joins) for name, items in jobs]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Spawned workers only see the records they are sent, never the
+        # files or the locks this process holds.
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(joins["hotels"], joins["customers"]),
+        ) as pool:
+            results = list(pool.map(_check_chunk, *zip(*jobs)))
+    problems, stays = [], []
+    for chunk_problems, chunk_stays in results:
+        problems += chunk_problems
+        stays += chunk_stays
+    return problems, stays, workers
+
+
+# ----------------------------------------------------------------------
+# Cross-record checks
+# ----------------------------------------------------------------------
+
+def _overbooked(stays, capacity):
+    """Return an overbooked problem per hotel whose peak exceeds its rooms."""
+    events = defaultdict(list)
+    for hotel_id, first, last, key in stays:
+        if hotel_id in capacity:
+            events[hotel_id] += [(first, 1, key), (last, -1, key)]
+    problems = []
+    for hotel_id, changes in sorted(events.items()):
+        # On the same day a check-out frees its room before a check-in.
+        changes.sort(key=lambda change: (change[0], change[1]))
+        staying, peak, night, involved = set(), 0, None, []
+        for day, delta, key in changes:
+            if delta < 0:
+                staying.discard(key)
+                continue
+            staying.add(key)
+            if len(staying) > peak:
+                peak, night, involved = len(staying), day, sorted(staying)
+        rooms = capacity[hotel_id]
+        if peak > rooms:
+            night = date.fromordinal(night).isoformat()
+            problems.append(_problem(
+                "hotels", hotel_id, "overbooked",
+                f"{peak} active stays overlap on {night} but the hotel has {rooms} rooms.",
+                night=night, peak=peak, total_rooms=rooms, reservations=involved,
+            ))
+    return problems
+
+
+def _duplicate_emails(customers, invalid):
+    owners = defaultdict(list)
+    for key, record in customers.items():
+        if key not in invalid:
+            owners[casefold(record["email"])].append(key)
+    return [
+        _problem(
+            "customers", min(keys), "duplicate_email",
+            f"{len(keys)} customers share the email {email}.", customers=sorted(keys),
+        )
+        for email, keys in sorted(owners.items())
+        if email and len(keys) > 1
+    ]
+
+
+def misnamed_files(directory=None):
+    """
+    Return [(path, collection)] for the files in the data directory whose
+    names differ from a collection's only by case or a plural "s".
+
+    Only plain collection files (a stem plus the collection's extension)
+    are compared, so the files backends keep beside them, such as SQLite's
+    hotel.db, logs, shards and manifests, are never flagged.
+    """
+    directory = os.path.normpath(directory or data_handler.DATA_DIR)
+    if not os.path.isdir(directory):
+        return []
+    stems = {
+        os.path.splitext(os.path.basename(_filepath(name))): name for name in MODELS
+    }
+    found = []
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        stem, ext = os.path.splitext(entry)
+        if (stem, ext) in stems or "." in stem or not os.path.isfile(path):
+            continue
+        for (expected, expected_ext), name in stems.items():
+            if ext == expected_ext and casefold(stem).rstrip("s") == expected.rstrip("s"):
+                found.append((path, name))
+    return found
+
+
+# ----------------------------------------------------------------------
+# Repairs
+# ----------------------------------------------------------------------
+
+def quarantine_path(name):
+    """Return the file holding the quarantined records of collection name."""
+    return os.path.join(data_handler.DATA_DIR, QUARANTINE_DIR, f"{name}.json")
+
+
+def _move_file(path, name):
+    """Move the records of a misnamed file into collection name, if it is empty."""
+    filepath = _filepath(name)
+    if data_handler.load_json(filepath):
+        logger.error(
+            "Not moving %s: %s already has records.", path, name, extra={"path": path}
+        )
+        return None
+    records = data_handler.JsonFileBackend().read(path)
+    if not records:
+        return None
+    for key, record in records.items():
+        data_handler.put_record(filepath, key, record)
+    changefeed.publish(filepath, [("create", key, record) for key, record in records.items()])
+    return "moved"
+
+
+def _quarantine(records, problems):
+    """Move the records with problems of their own to the quarantine files."""
+    reasons = defaultdict(lambda: defaultdict(list))
+    for problem in problems:
+        if problem["kind"] in RECORD_KINDS:
+            reasons[problem["collection"]][problem["id"]].append(problem["kind"])
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    backend = data_handler.JsonFileBackend()
+    for name, by_id in reasons.items():
+        path = quarantine_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        held = backend.read(path)
+        for key, kinds in by_id.items():
+            held[key] = {"record": records[name][key], "problems": kinds, "quarantined_at": now}
+        # Written before the records leave the collection, as archive does.
+        backend.write(path, held)
+        filepath = _filepath(name)
+        for key in by_id:
+            data_handler.delete_record(filepath, key)
+        changefeed.publish(filepath, [("delete", key, None) for key in by_id])
+    for problem in problems:
+        if problem["kind"] in RECORD_KINDS:
+            problem["action"] = "quarantined"
+
+
+def _cancel_orphans(records, problems):
+    """Cancel the active reservations whose hotel or customer is gone."""
+    filepath = _filepath("reservations")
+    cancelled = set()
+    for problem in problems:
+        if problem["kind"] not in ("missing_hotel", "missing_customer") or problem["action"]:
+            continue
+        key = problem["id"]
+        if key not in cancelled and problem["status"] == Reservation.STATUS_ACTIVE:
+            record = dict(records["reservations"][key], status=Reservation.STATUS_CANCELLED)
+            data_handler.put_record(filepath, key, record)
+            changefeed.emit(filepath, "cancel", key, record)
+            cancelled.add(key)
+        if key in cancelled:
+            problem["action"] = "cancelled"
+
+
+# ----------------------------------------------------------------------
+# Entry point
+# ----------------------------------------------------------------------
+
+def _check(repair, quarantine, workers, chunk_size):
+    started = time.perf_counter()
+    problems = []
+    for path, name in misnamed_files():
+        problem = _problem(
+            name, os.path.basename(path), "misnamed_file",
+            f"{path} is not read; the {name} are stored in "
+            f"{os.path.basename(_filepath(name))}.",
+            path=path,
+        )
+        if repair:
+            problem["action"] = _move_file(path, name)
+        problems.append(problem)
+    records = {name: data_handler.load_json(_filepath(name)) for name in MODELS}
+    joins = {"hotels": frozenset(records["hotels"]), "customers": frozenset(records["customers"])}
+    found, stays, workers = _check_records(records, joins, workers, chunk_size)
+    problems += found
+    invalid = defaultdict(set)
+    for problem in found:
+        if problem["kind"] in ("invalid", "key_mismatch"):
+            invalid[problem["collection"]].add(problem["id"])
+    capacity = {
+        key: record["total_rooms"]
+        for key, record in records["hotels"].items() if key not in invalid["hotels"]
+    }
+    problems += _overbooked(stays, capacity)
+    problems += _duplicate_emails(records["customers"], invalid["customers"])
+    if quarantine:
+        _quarantine(records, problems)
+    if repair:
+        _cancel_orphans(records, problems)
+    return {
+        "ok": not problems,
+        "checked": {name: len(data) for name, data in records.items()},
+        "summary": dict(sorted(Counter(p["kind"] for p in problems).items())),
+        "unresolved": sum(1 for p in problems if not p["action"]),
+        "problems": problems,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def check(repair=False, quarantine=False, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Check every stored record and return a JSON-serialisable report:
+    {"ok", "checked": {collection: records}, "summary": {kind: count},
+    "unresolved", "problems": [...], "workers", "seconds"}. Each problem
+    has collection, id, kind, message and the action taken, if any.
+    workers=None uses a process pool only for large datasets.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    if not (repair or quarantine):
+        report = _check(False, False, workers, chunk_size)
+    else:
+        # One session: the check and the fixes see and hold the same data.
+        with session.Session():
+            report = _check(repair, quarantine, workers, chunk_size)
+        for problem in report["problems"]:
+            if problem["action"] == "moved":
+                # Only now that the records are written elsewhere.
+                os.remove(problem["path"])
+    logger.info(
+        "Integrity check found %d problems, %d unresolved",
+        len(report["problems"]), report["unresolved"], extra={"summary": report["summary"]},
+    )
+    return report
@@ -0,0 +1,400 @@
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date
+
+from . import data_handler, instrumentation
+from .availability import STATUS_ACTIVE, STATUS_CANCELLED, to_ordinal
+
+# File header: magic, format version, record size, slots in use (deleted
+# ones included) and deleted slots.
+HEADER = struct.Struct("<8sIIQQ")
+MAGIC = b"HOTELRES"
+VERSION = 1
+
+# One reservation: reservation, customer and hotel UUIDs as 16 bytes,
+# check-in and check-out as date ordinals and a status byte, padded to 64.
+RECORD = struct.Struct("<16s16s16siiB7x")
+CUSTOMER_OFFSET, HOTEL_OFFSET, DATES_OFFSET, STATUS_OFFSET = 16, 32, 48, 56
+
+# Status byte values; DELETED marks a free slot.
+DELETED, ACTIVE, CANCELLED = 0, 1, 2
+_STATUS_CODES = {STATUS_ACTIVE: ACTIVE, STATUS_CANCELLED: CANCELLED}
+_STATUS_NAMES = {ACTIVE: STATUS_ACTIVE, CANCELLED: STATUS_CANCELLED}
+
+FIELDS = ("reservation_id", "customer_id", "hotel_id", "check_in", "check_out", "status")
+
+
+def _uuid_bytes(record, field):
+    value = record.get(field)
+    try:
+        parsed = uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"{field} must be a UUID, got {value!r}") from None
+    if str(parsed) != value:
+        raise ValueError(f"{field} must be a lowercase hyphenated UUID, got {value!r}")
+    return parsed.bytes
+
+
+def encode(record):
+    """Pack a reservation dict into RECORD bytes, raising ValueError on bad data."""
+    extra = record.keys() - set(FIELDS)
+    if extra:
+        raise ValueError(f"Fields not supported by the mmap store: {sorted(extra)}")
+    status = _STATUS_CODES.get(record.get("status") or STATUS_ACTIVE)
+    if status is None:
+        raise ValueError(f"Unsupported reservation status: {record.get('status')!r}")
+    return RECORD.pack(
+        _uuid_bytes(record, "reservation_id"),
+        _uuid_bytes(record, "customer_id"),
+        _uuid_bytes(record, "hotel_id"),
+        to_ordinal(record.get("check_in")),
+        to_ordinal(record.get("check_out")),
+        status,
+    )
+
+
+def decode(raw, offset=0):
+    """Unpack the RECORD at offset of raw into a reservation dict."""
+    rid, customer, hotel, check_in, check_out, status = RECORD.unpack_from(raw, offset)
+    return {
+        "reservation_id": str(uuid.UUID(bytes=rid)),
+        "customer_id": str(uuid.UUID(bytes=customer)),
+        "hotel_id": str(uuid.UUID(bytes=hotel)),
+        "check_in": date.fromordinal(check_in).isoformat(),
+        "check_out": date.fromordinal(check_out).isoformat(),
+        "status": _STATUS_NAMES[status],
+    }
+
+
+class _MappedFile:
+    """An open record file with the indexes this process built over it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, "r+b")
+        self.inode = os.fstat(self.fh.fileno()).st_ino
+        self.mm = mmap.mmap(self.fh.fileno(), 0)
+        self.scanned = 0
+        self.slots = {}
+        self.by_hotel = defaultdict(set)
+        self.by_customer = defaultdict(set)
+
+    def close(self):
+        self.mm.close()
+        self.fh.close()
+
+    def header(self):
+        magic, version, size, used, deleted = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or size != RECORD.size:
+            raise ValueError(f"{self.path} is not a version {VERSION} reservation store")
+        return used, deleted
+
+    def set_header(self, used, deleted):
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, RECORD.size, used, deleted)
+
+    @staticmethod
+    def offset(slot):
+        return HEADER.size + slot * RECORD.size
+
+    def capacity(self):
+        return (len(self.mm) - HEADER.size) // RECORD.size
+
+    def remap(self):
+        """Map the whole file again after it grew."""
+        self.mm.close()
+        self.mm = mmap.mmap(self.fh.fileno(), 0)
+
+    def index(self, slot):
+        """Add the record in slot to the in-memory indexes."""
+        offset = self.offset(slot)
+        if self.mm[offset + STATUS_OFFSET] == DELETED:
+            return
+        self.slots[self.mm[offset:offset + 16]] = slot
+        self.by_customer[self.mm[offset + CUSTOMER_OFFSET:offset + HOTEL_OFFSET]].add(slot)
+        self.by_hotel[self.mm[offset + HOTEL_OFFSET:offset + DATES_OFFSET]].add(slot)
+
+    def unindex(self, slot):
+        offset = self.offset(slot)
+        self.slots.pop(self.mm[offset:offset + 16], None)
+        self.by_customer[self.mm[offset + CUSTOMER_OFFSET:offset + HOTEL_OFFSET]].discard(slot)
+        self.by_hotel[self.mm[offset + HOTEL_OFFSET:offset + DATES_OFFSET]].discard(slot)
+
+    def refresh(self):
+        """Index the slots appended since the last call, by any process."""
+        used, _ = self.header()
+        if self.offset(used) > len(self.mm):
+            self.remap()
+        for slot in range(self.scanned, used):
+            self.index(slot)
+        self.scanned = used
+
+    def live(self, slot):
+        return self.mm[self.offset(slot) + STATUS_OFFSET] != DELETED
+
+
+class MmapBackend:
+    """
+    Reservations as fixed-width binary records in a memory-mapped file.
+
+    Each reservation takes one 64-byte RECORD slot of "<name>.dat" beside
+    the collection path, so reads and in-place updates touch one record
+    instead of the whole collection, and processes reading the file
+    share its pages. Every process keeps a hash index from reservation
+    ID (and hotel and customer IDs) to slot, built by one scan and then
+    extended with the slots appended since.
+
+    New records are always appended and deletions only clear the status
+    byte, so the indexes of other processes stay valid; once half the
+    slots are deleted the file is rewritten without them. Only
+    reservations whose IDs are canonical UUIDs and whose dates are ISO
+    dates can be stored, so the backend is meant to be set for the
+    reservations collection alone:
+
+        data_handler.set_backend(MmapBackend(), data_handler.RESERVATIONS_FILE)
+    """
+
+    SUFFIX = ".dat"
+    MIN_CAPACITY = 1024
+    # Rewrite the file once this many slots, and half of all, are deleted.
+    COMPACT_MIN = 1024
+    # Queries answered from the in-memory indexes by find().
+    INDEXED = ("hotel_id", "customer_id")
+    caches = False
+
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.RLock()
+
+    def data_path(self, filepath):
+        """Return the record file backing the collection at filepath."""
+        return os.path.splitext(os.path.abspath(filepath))[0] + self.SUFFIX
+
+    def _open(self, filepath, create=False):
+        """Return the current _MappedFile of filepath, or None if it has none."""
+        path = self.data_path(filepath)
+        try:
+            inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            if not create:
+                return None
+            self.write(filepath, {})
+            inode = os.stat(path).st_ino
+        mapped = self._files.get(path)
+        if mapped is None or mapped.inode != inode:
+            # First use, or the file was rewritten by write() or compaction.
+            if mapped is not None:
+                mapped.close()
+            mapped = self._files[path] = _MappedFile(path)
+        mapped.refresh()
+        return mapped
+
+    def close(self):
+        """Unmap and close every open record file."""
+        with self._lock:
+            for mapped in self._files.values():
+                mapped.close()
+            self._files.clear()
+
+    # ------------------------------------------------------------------
+    # Backend interface
+    # ------------------------------------------------------------------
+
+    def signature(self, filepath):
+        return None
+
+    def read(self, filepath):
+        return dict(self.iter(filepath))
+
+    def iter(self, filepath):
+        """Yield (key, record) pairs of the slots in use when called."""
+        with self._lock:
+            mapped = self._open(filepath)
+            if mapped is None:
+                return
+            records = [
+                decode(mapped.mm, mapped.offset(slot))
+                for slot in range(mapped.scanned)
+                if mapped.live(slot)
+            ]
+        for record in records:
+            yield record["reservation_id"], record
+
+    def read_record(self, filepath, key):
+        """Return one record through the ID index, or None."""
+        try:
+            rid = uuid.UUID(str(key)).bytes
+        except ValueError:
+            return None
+        with self._lock:
+            mapped = self._open(filepath)
+            slot = mapped.slots.get(rid) if mapped is not None else None
+            if slot is None or not mapped.live(slot):
+                return None
+            return decode(mapped.mm, mapped.offset(slot))
+
+    def write(self, filepath, data):
+        """Replace the whole file with the records of data, atomically."""
+        records = []
+        for key, record in data.items():
+            if record.get("reservation_id") != key:
+                raise ValueError(f"Record key {key!r} does not match its reservation_id")
+            records.append(encode(record))
+        path = self.data_path(filepath)
+        capacity = max(len(records), self.MIN_CAPACITY)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(records), 0))
+                fh.write(b"".join(records))
+                fh.truncate(HEADER.size + capacity * RECORD.size)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        instrumentation.add_bytes("written", path, HEADER.size + len(records) * RECORD.size)
+
+    def write_record(self, filepath, data, key, record):
+        """
+        Patch the record in place when only its dates or status changed;
+        otherwise delete its old slot and append it.
+        """
+        if record is None:
+            self.remove_record(filepath, key)
+            return
+        if record.get("reservation_id") != key:
+            raise ValueError(f"Record key {key!r} does not match its reservation_id")
+        packed = encode(record)
+        with self._lock:
+            mapped = self._open(filepath, create=True)
+            slot = mapped.slots.get(packed[:16])
+            if slot is not None and mapped.live(slot):
+                offset = mapped.offset(slot)
+                if mapped.mm[offset + CUSTOMER_OFFSET:offset + DATES_OFFSET] == (
+                    packed[CUSTOMER_OFFSET:DATES_OFFSET]
+                ):
+                    mapped.mm[offset:offset + RECORD.size] = packed
+                    instrumentation.add_bytes("written", mapped.path, RECORD.size)
+                    return
+                self._delete_slot(mapped, slot)
+            self._append(mapped, packed)
+
+    def write_records(self, filepath, data, changes):
+        for key, record in changes:
+            self.write_record(filepath, data, key, record)
+
+    def remove_record(self, filepath, key):
+        """Mark a record's slot deleted. Returns True if it existed."""
+        try:
+            rid = uuid.UUID(str(key)).bytes
+        except ValueError:
+            return False
+        with self._lock:
+            mapped = self._open(filepath)
+            slot = mapped.slots.get(rid) if mapped is not None else None
+            if slot is None or not mapped.live(slot):
+                return False
+            self._delete_slot(mapped, slot)
+            used, deleted = mapped.header()
+            if deleted >= self.COMPACT_MIN and deleted * 2 >= used:
+                self.compact(filepath)
+            return True
+
+    def _delete_slot(self, mapped, slot):
+        mapped.unindex(slot)
+        mapped.mm[mapped.offset(slot) + STATUS_OFFSET] = DELETED
+        used, deleted = mapped.header()
+        mapped.set_header(used, deleted + 1)
+        instrumentation.add_bytes("written", mapped.path, 1)
+
+    def _append(self, mapped, packed):
+        used, deleted = mapped.header()
+        if used >= mapped.capacity():
+            os.ftruncate(mapped.fh.fileno(), mapped.offset(max(used * 2, self.MIN_CAPACITY)))
+            mapped.remap()
+        offset = mapped.offset(used)
+        mapped.mm[offset:offset + RECORD.size] = packed
+        # Publish the slot only once it is complete.
+        mapped.set_header(used + 1, deleted)
+        mapped.index(used)
+        mapped.scanned = used + 1
+        instrumentation.add_bytes("written", mapped.path, RECORD.size)
+
+    def compact(self, filepath):
+        """Rewrite the file without its deleted slots."""
+        with self._lock:
+            self.write(filepath, self.read(filepath))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _slots(self, mapped, field, value):
+        try:
+            key = uuid.UUID(str(value)).bytes
+        except ValueError:
+            return ()
+        index = mapped.by_hotel if field == "hotel_id" else mapped.by_customer
+        return sorted(slot for slot in index.get(key, ()) if mapped.live(slot))
+
+    def find(self, filepath, field, value):
+        """Return the records of filepath whose hotel_id or customer_id equals value."""
+        if field not in self.INDEXED:
+            raise ValueError(f"reservations.{field} is not indexed")
+        with self._lock:
+            mapped = self._open(filepath)
+            if mapped is None:
+                return []
+            return [
+                decode(mapped.mm, mapped.offset(slot))
+                for slot in self._slots(mapped, field, value)
+            ]
+
+    def count_booked(self, filepath, hotel_id, check_in=None, check_out=None):
+        """
+        Return active reservations of a hotel, or with dates the most rooms
+        booked on any night from check_in up to check_out.
+        """
+        with self._lock:
+            mapped = self._open(filepath)
+            if mapped is None:
+                return 0
+            stays = []
+            for slot in self._slots(mapped, "hotel_id", hotel_id):
+                _, _, _, first, last, status = RECORD.unpack_from(
+                    mapped.mm, mapped.offset(slot)
+                )
+                if status == ACTIVE:
+                    stays.append((first, last))
+        if check_in is None or check_out is None:
+            return len(stays)
+        start, end = to_ordinal(check_in), to_ordinal(check_out)
+        nights = [0] * max(end - start, 0)
+        for first, last in stays:
+            for night in range(max(first, start), min(last, end)):
+                nights[night - start] += 1
+        return max(nights, default=0)
+
+
+def migrate_json(filepath=None, backend=None):
+    """
+    Copy the reservations stored as JSON at filepath (RESERVATIONS_FILE by
+    default) into the record file of backend. Returns the record count.
+    """
+    filepath = filepath or data_handler.RESERVATIONS_FILE
+    backend = backend or MmapBackend()
+    data = data_handler.JsonFileBackend().read(filepath)
+    backend.write(filepath, data)
+    return len(data)
+
+
+if __name__ == "__main__":
+    print(f"Migrated {migrate_json()} reservations")
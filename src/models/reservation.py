@@ -1,9 +1,36 @@
+import logging
+from datetime import date
+
+from . import archive, bulk, changefeed, data_handler, instrumentation, session
+from .availability import OccupancyIndex, to_ordinal
+from .indexes import FieldIndex
+from .reservation_table import ReservationTable
+
+
+logger = logging.getLogger(__name__)
+
+
 class Reservation:
     """Represents a room reservation linking a customer to a hotel."""
 
     STATUS_ACTIVE = "active"
     STATUS_CANCELLED = "cancelled"
 
+    ID_FIELD = "reservation_id"
+    # data_handler attribute naming the file; used by session.Session.
+    COLLECTION = "RESERVATIONS_FILE"
+    FIELDS = (
+        "reservation_id",
+        "customer_id",
+        "hotel_id",
+        "check_in",
+        "check_out",
+        "status",
+    )
+    MODIFIABLE = {"check_in", "check_out", "status"}
+
+    __slots__ = FIELDS
+
     def __init__(
         self,
         reservation_id,
@@ -70,74 +97,183 @@ class Reservation:
 
     @staticmethod
     def _load_all():
-        return _load_json(RESERVATIONS_FILE)
+        return data_handler.load_json(data_handler.RESERVATIONS_FILE)
 
     @staticmethod
     def _save_all(data):
-        _save_json(RESERVATIONS_FILE, data)
+        data_handler.save_json(data_handler.RESERVATIONS_FILE, data)
 
     @classmethod
+    @instrumentation.timed
     def create(cls, customer_id, hotel_id, check_in, check_out):
         """Persist a new reservation and return the instance."""
         reservation = cls(
-            reservation_id=str(uuid.uuid4()),
+            reservation_id=data_handler.new_id(),
             customer_id=customer_id,
             hotel_id=hotel_id,
             check_in=str(check_in),
             check_out=str(check_out),
         )
-        data = cls._load_all()
-        data[reservation.reservation_id] = reservation.to_dict()
-        cls._save_all(data)
-        return reservation
+        record = reservation.to_dict()
+        filepath = data_handler.shard_for(data_handler.RESERVATIONS_FILE, hotel_id)
+        data_handler.put_record(filepath, reservation.reservation_id, record)
+        changefeed.emit(filepath, "create", reservation.reservation_id, record)
+        return session.track(reservation)
 
     @classmethod
+    @instrumentation.timed
+    @session.identity_mapped
     def get(cls, reservation_id):
         """Return a Reservation by ID or None if not found."""
-        data = cls._load_all()
-        record = data.get(str(reservation_id))
+        record = data_handler.get_record(data_handler.RESERVATIONS_FILE, str(reservation_id))
         if record is None:
             return None
         try:
             return cls.from_dict(record)
         except ValueError as exc:
-            print(f"ERROR reading reservation {reservation_id}: {exc}")
+            logger.error(
+                "Error reading reservation %s: %s", reservation_id, exc,
+                extra={"record_id": reservation_id},
+            )
             return None
 
     @classmethod
+    @instrumentation.timed
+    def iter_all(cls):
+        """Yield every valid Reservation while streaming the stored records."""
+        count = 0
+        try:
+            for rid, record in data_handler.iter_records(data_handler.RESERVATIONS_FILE):
+                try:
+                    reservation = cls.from_dict(record)
+                except ValueError as exc:
+                    logger.error(
+                        "Error reading reservation %s: %s. Skipping record.", rid, exc,
+                        extra={"record_id": rid},
+                    )
+                    continue
+                count += 1
+                yield reservation
+        finally:
+            instrumentation.add_records("Reservation.iter_all", count)
+
+    @classmethod
+    @instrumentation.timed
     def get_all(cls):
         """Return list of all valid Reservation instances."""
-        data = cls._load_all()
+        return list(cls.iter_all())
+
+    @staticmethod
+    def occupancy(hotel_id=None):
+        """
+        Return the occupancy index over all stored reservations. With
+        hotel_id, the index may only cover the shard holding that hotel.
+        """
+        filepath = data_handler.RESERVATIONS_FILE
+        if hotel_id is not None:
+            filepath = data_handler.shard_for(filepath, hotel_id)
+        return data_handler.get_index(filepath, "occupancy", OccupancyIndex.build)
+
+    @staticmethod
+    def booked_by_hotel(check_in, check_out):
+        """
+        Return {hotel_id: rooms booked on the busiest night of the stay}
+        for every hotel with active bookings between check_in and
+        check_out, from one occupancy index per shard.
+        """
+        booked = {}
+        for path in data_handler.shard_paths(data_handler.RESERVATIONS_FILE):
+            index = data_handler.get_index(path, "occupancy", OccupancyIndex.build)
+            # A hotel lives in exactly one shard, so update never overlaps.
+            booked.update(index.booked_by_hotel(check_in, check_out))
+        return booked
+
+    @staticmethod
+    def table():
+        """Return a columnar ReservationTable over all stored reservations."""
+        return data_handler.get_index(
+            data_handler.RESERVATIONS_FILE, "table", ReservationTable.build
+        )
+
+    @classmethod
+    def _find(cls, field, value, active_only):
+        backend = data_handler.get_backend(data_handler.RESERVATIONS_FILE)
+        if hasattr(backend, "find"):
+            records = backend.find(data_handler.RESERVATIONS_FILE, field, str(value))
+        else:
+            if field == data_handler.SHARD_FIELD:
+                paths = [data_handler.shard_for(data_handler.RESERVATIONS_FILE, value)]
+            else:
+                paths = data_handler.shard_paths(data_handler.RESERVATIONS_FILE)
+            records = [
+                data_handler.get_record(path, rid)
+                for path in paths
+                for rid in data_handler.get_index(
+                    path, field, FieldIndex.factory(field)
+                ).lookup(value)
+            ]
         reservations = []
-        for rid, record in data.items():
+        for record in records:
+            if record is None:
+                continue
             try:
-                reservations.append(cls.from_dict(record))
+                reservation = cls.from_dict(record)
             except ValueError as exc:
-                print(f"ERROR reading reservation {rid}: {exc}. Skipping record.")
+                logger.error("Error reading reservation: %s. Skipping record.", exc)
+                continue
+            if not active_only or reservation.status == cls.STATUS_ACTIVE:
+                reservations.append(reservation)
+        reservations.sort(key=lambda r: (r.check_in, r.reservation_id))
         return reservations
 
     @classmethod
-    def count_active_for_hotel(cls, hotel_id):
-        """Return count of active reservations for a given hotel."""
-        all_res = cls.get_all()
-        return sum(
-            1
-            for r in all_res
-            if r.hotel_id == str(hotel_id) and r.status == cls.STATUS_ACTIVE
-        )
+    @instrumentation.timed
+    def for_customer(cls, customer_id, active_only=False):
+        """Return the reservations of a customer, ordered by check-in."""
+        return cls._find("customer_id", customer_id, active_only)
+
+    @classmethod
+    @instrumentation.timed
+    def for_hotel(cls, hotel_id, active_only=False):
+        """Return the reservations of a hotel, ordered by check-in."""
+        return cls._find("hotel_id", hotel_id, active_only)
+
+    @classmethod
+    @instrumentation.timed
+    def count_active_for_hotel(cls, hotel_id, check_in=None, check_out=None):
+        """
+        Return count of active reservations for a given hotel.
+        With dates, count only the rooms booked on the busiest night
+        from check_in up to check_out.
+        """
+        backend = data_handler.get_backend(data_handler.RESERVATIONS_FILE)
+        if hasattr(backend, "count_booked"):
+            return backend.count_booked(
+                data_handler.RESERVATIONS_FILE, hotel_id, check_in, check_out
+            )
+        occupancy = cls.occupancy(hotel_id)
+        if check_in is None or check_out is None:
+            return occupancy.active_count(hotel_id)
+        return occupancy.booked(hotel_id, check_in, check_out)
 
+    @instrumentation.timed
     def cancel(self):
         """Mark this reservation as cancelled and persist the change."""
         if self.status == self.STATUS_CANCELLED:
             return False
         self.status = self.STATUS_CANCELLED
-        data = self._load_all()
-        if self.reservation_id in data:
-            data[self.reservation_id]["status"] = self.STATUS_CANCELLED
-            self._save_all(data)
+        filepath = data_handler.shard_for(data_handler.RESERVATIONS_FILE, self.hotel_id)
+        with data_handler.locked(filepath):
+            record = data_handler.get_record(filepath, self.reservation_id)
+            if record is not None:
+                record["status"] = self.STATUS_CANCELLED
+                data_handler.put_record(filepath, self.reservation_id, record)
+                changefeed.emit(filepath, "cancel", self.reservation_id, record)
+                session.track(self)
         return True
 
     @classmethod
+    @instrumentation.timed
     def cancel_by_id(cls, reservation_id):
         """Cancel a reservation by ID. Returns True on success, False otherwise."""
         reservation = cls.get(str(reservation_id))
@@ -146,12 +282,162 @@ class Reservation:
         return reservation.cancel()
 
     @classmethod
+    @instrumentation.timed
     def delete(cls, reservation_id):
         """Remove a reservation record entirely."""
-        data = cls._load_all()
-        reservation_id = str(reservation_id)
-        if reservation_id not in data:
-            return False
-        del data[reservation_id]
-        cls._save_all(data)
-        return True
+        with data_handler.locked(data_handler.RESERVATIONS_FILE):
+            deleted = data_handler.delete_record(
+                data_handler.RESERVATIONS_FILE, str(reservation_id)
+            )
+            if deleted:
+                changefeed.emit(data_handler.RESERVATIONS_FILE, "delete", reservation_id)
+                session.forget(cls, reservation_id)
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Archive (historical reservations)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    @instrumentation.timed
+    def archive(cls, before=None, cancelled=True, codec=None):
+        """
+        Move finished stays (check_out on or before before, today by
+        default) and cancelled reservations to the compressed archive.
+        Returns {check-in month: reservations moved}.
+        """
+        return archive.archive_reservations(before, cancelled, codec)
+
+    @classmethod
+    @instrumentation.timed
+    def get_archived(cls, reservation_id):
+        """Return an archived Reservation by ID or None if not archived."""
+        record = archive.get_archived(reservation_id)
+        if record is None:
+            return None
+        try:
+            return cls.from_dict(record)
+        except ValueError as exc:
+            logger.error(
+                "Error reading archived reservation %s: %s", reservation_id, exc,
+                extra={"record_id": reservation_id},
+            )
+            return None
+
+    @classmethod
+    @instrumentation.timed
+    def history(cls, since=None, until=None, hotel_id=None, customer_id=None):
+        """
+        Return archived reservations checking in between the months of
+        since and until (inclusive), optionally of one hotel or customer,
+        ordered by check-in. Only the partitions in range are read.
+        """
+        reservations = []
+        for rid, record in archive.iter_archived(since, until):
+            if hotel_id is not None and record.get("hotel_id") != str(hotel_id):
+                continue
+            if customer_id is not None and record.get("customer_id") != str(customer_id):
+                continue
+            try:
+                reservations.append(cls.from_dict(record))
+            except ValueError as exc:
+                logger.error(
+                    "Error reading archived reservation %s: %s. Skipping record.", rid, exc,
+                    extra={"record_id": rid},
+                )
+        reservations.sort(key=lambda r: (r.check_in, r.reservation_id))
+        return reservations
+
+    # ------------------------------------------------------------------
+    # Bulk operations
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _batch_check_stay(cls, stored=None):
+        """
+        Return check(reservation) for a bulk operation, which raises
+        ValueError unless check_out is after check_in and, for an active
+        stay, the hotel exists and has a room free every night, counting
+        stays accepted earlier in the batch. stored(reservation_id)
+        returns the record being replaced, whose stay is not counted.
+        Call it under the lock.
+        """
+        from .hotel import Hotel  # Deferred: hotel imports this module.
+
+        batch = OccupancyIndex()
+
+        def check(reservation):
+            start = to_ordinal(reservation.check_in)
+            end = to_ordinal(reservation.check_out)
+            if end <= start:
+                raise ValueError("check_out must be later than check_in.")
+            rid = reservation.reservation_id
+            old = stored(rid) if stored is not None else None
+            if reservation.status == cls.STATUS_ACTIVE:
+                hotel = Hotel.get(reservation.hotel_id)
+                if hotel is None:
+                    raise ValueError(f"Hotel {reservation.hotel_id} not found.")
+                # The stored stay is counted below, so take it off first.
+                batch.apply(rid, old, None)
+                try:
+                    for night in range(start, end):
+                        stay = (date.fromordinal(night).isoformat(),
+                                date.fromordinal(night + 1).isoformat())
+                        booked = cls.count_active_for_hotel(hotel.hotel_id, *stay)
+                        if booked + batch.booked(hotel.hotel_id, *stay) >= hotel.total_rooms:
+                            raise ValueError(f"No available rooms in hotel {hotel.hotel_id}.")
+                finally:
+                    batch.apply(rid, None, old)
+            batch.apply(rid, old, reservation.to_dict())
+
+        return check
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_create(cls, records):
+        """
+        Persist many reservations in a single load/save cycle.
+        Records missing reservation_id get a new UUID. Returns (reservations, errors)
+        with errors as a list of (position, message). Records get the checks of
+        Hotel.reserve_room: check_out after check_in and, for active ones, a
+        stored hotel with a room free every night, counting earlier records.
+        """
+        return bulk.bulk_create(
+            data_handler.RESERVATIONS_FILE,
+            records,
+            lambda record: cls.from_dict(
+                {**record, "reservation_id": record.get("reservation_id") or data_handler.new_id()}
+            ),
+            cls._batch_check_stay(),
+        )
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_modify(cls, updates):
+        """
+        Apply {reservation_id: {field: value}} updates in a single load/save cycle.
+        Returns (updated reservations, errors) with errors as (id, message).
+        Updated stays get the checks of bulk_create, with each record's
+        stored stay left out of the rooms it is checked against.
+        """
+        return bulk.bulk_modify(
+            data_handler.RESERVATIONS_FILE, updates, cls.MODIFIABLE, cls.from_dict,
+            cls._batch_check_stay(
+                lambda rid: data_handler.get_record(data_handler.RESERVATIONS_FILE, rid)
+            ),
+        )
+
+    @classmethod
+    @instrumentation.timed
+    def bulk_delete(cls, reservation_ids):
+        """
+        Remove many reservations in a single load/save cycle.
+        Returns (deleted ids, errors) with errors as (id, message).
+        """
+        return bulk.bulk_delete(data_handler.RESERVATIONS_FILE, reservation_ids)
+
+    @classmethod
+    @instrumentation.timed
+    def export(cls, out, fmt="jsonl"):
+        """Stream all reservations to a text file as "jsonl" or "csv"; returns the count."""
+        return bulk.export(data_handler.RESERVATIONS_FILE, out, cls.FIELDS, fmt)
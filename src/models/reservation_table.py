@@ -0,0 +1,188 @@
+from array import array
+from collections import Counter
+from datetime import date
+
+from .availability import REQUIRED_FIELDS, STATUS_ACTIVE, STATUS_CANCELLED, to_ordinal
+
+# Placeholder stored for dates that do not parse; such rows cover no nights.
+NO_DATE = 0
+# Hotel code of a deleted row.
+DELETED = -1
+
+
+class ReservationTable:
+    """
+    Columnar, read-mostly view of all reservations for analytical scans.
+
+    Hotel and customer IDs are interned to int codes, dates are stored as
+    int32 ordinal days and the active status is one bit per row, so a
+    scan touches a few compact arrays and never builds Reservation
+    objects. Rows are materialised as dicts only through record().
+    """
+
+    def __init__(self):
+        self.reservation_ids = []
+        self.hotel_ids = []
+        self.customer_ids = []
+        self._hotel_codes = {}
+        self._customer_codes = {}
+        self.hotel = array("i")
+        self.customer = array("i")
+        self.check_in = array("i")
+        self.check_out = array("i")
+        self._active = bytearray()
+        self._rows = None
+        self._deleted = 0
+
+    @classmethod
+    def build(cls, items):
+        """Build the table from (reservation_id, record) pairs."""
+        table = cls()
+        for key, record in items:
+            table._append(key, record)
+        return table
+
+    # ------------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _intern(value, codes, values):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    @staticmethod
+    def _ordinal(value):
+        try:
+            return to_ordinal(value)
+        except ValueError:
+            return NO_DATE
+
+    def _set_active(self, row, active):
+        byte, bit = divmod(row, 8)
+        if active:
+            self._active[byte] |= 1 << bit
+        else:
+            self._active[byte] &= ~(1 << bit) & 0xFF
+
+    @property
+    def active_bits(self):
+        """The status bitmap: bit row % 8 of byte row // 8 is set if active."""
+        return self._active
+
+    def is_active(self, row):
+        """Return True if the reservation in row is active."""
+        byte, bit = divmod(row, 8)
+        return bool(self._active[byte] >> bit & 1)
+
+    def _fill(self, row, record):
+        self.hotel[row] = self._intern(
+            str(record["hotel_id"]), self._hotel_codes, self.hotel_ids
+        )
+        self.customer[row] = self._intern(
+            str(record["customer_id"]), self._customer_codes, self.customer_ids
+        )
+        self.check_in[row] = self._ordinal(record["check_in"])
+        self.check_out[row] = self._ordinal(record["check_out"])
+        self._set_active(row, (record.get("status") or STATUS_ACTIVE) == STATUS_ACTIVE)
+
+    def _append(self, key, record):
+        if not REQUIRED_FIELDS <= record.keys():
+            return
+        row = len(self.reservation_ids)
+        self.reservation_ids.append(str(key))
+        for column in (self.hotel, self.customer, self.check_in, self.check_out):
+            column.append(0)
+        if row % 8 == 0:
+            self._active.append(0)
+        self._fill(row, record)
+        if self._rows is not None:
+            self._rows[str(key)] = row
+
+    def _row_of(self, key):
+        if self._rows is None:
+            self._rows = {rid: row for row, rid in enumerate(self.reservation_ids)}
+        return self._rows.get(str(key))
+
+    def apply(self, key, old, new):
+        """Keep the table current after a record was stored or deleted."""
+        row = self._row_of(key)
+        if row is None or self.hotel[row] == DELETED:
+            if new is not None:
+                self._append(key, new)
+            return
+        if new is None or not REQUIRED_FIELDS <= new.keys():
+            self.hotel[row] = DELETED
+            self._set_active(row, False)
+            self._deleted += 1
+        else:
+            self._fill(row, new)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.reservation_ids) - self._deleted
+
+    def record(self, row):
+        """Return the reservation in row as a dict."""
+        return {
+            "reservation_id": self.reservation_ids[row],
+            "customer_id": self.customer_ids[self.customer[row]],
+            "hotel_id": self.hotel_ids[self.hotel[row]],
+            "check_in": _iso(self.check_in[row]),
+            "check_out": _iso(self.check_out[row]),
+            "status": STATUS_ACTIVE if self.is_active(row) else STATUS_CANCELLED,
+        }
+
+    def active_rows(self, hotel_id=None):
+        """Yield the rows of active reservations, optionally of one hotel."""
+        code = None
+        if hotel_id is not None:
+            code = self._hotel_codes.get(str(hotel_id))
+            if code is None:
+                return
+        active = self._active
+        hotel = self.hotel
+        for row in range(len(self.reservation_ids)):
+            if active[row >> 3] >> (row & 7) & 1 and (code is None or hotel[row] == code):
+                yield row
+
+    def count_active(self, hotel_id=None):
+        """Return the number of active reservations, optionally of one hotel."""
+        return sum(1 for _ in self.active_rows(hotel_id))
+
+    def active_by_hotel(self):
+        """Return {hotel_id: active reservations} for every hotel."""
+        counts = Counter(self.hotel[row] for row in self.active_rows())
+        return {self.hotel_ids[code]: count for code, count in counts.items()}
+
+    def occupied_on(self, hotel_id, day):
+        """Return the rooms of a hotel booked for the night starting on day."""
+        night = to_ordinal(day)
+        check_in, check_out = self.check_in, self.check_out
+        return sum(
+            1
+            for row in self.active_rows(hotel_id)
+            if check_in[row] <= night < check_out[row]
+        )
+
+    def room_nights_by_hotel(self):
+        """Return {hotel_id: booked room-nights} over all active reservations."""
+        totals = Counter()
+        check_in, check_out, hotel = self.check_in, self.check_out, self.hotel
+        for row in self.active_rows():
+            nights = check_out[row] - check_in[row]
+            if nights > 0 and check_in[row] != NO_DATE:
+                totals[hotel[row]] += nights
+        return {self.hotel_ids[code]: total for code, total in totals.items()}
+
+
+def _iso(ordinal):
+    if ordinal == NO_DATE:
+        return ""
+    return date.fromordinal(ordinal).isoformat()
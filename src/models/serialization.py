@@ -0,0 +1,190 @@
+"""
+On-disk encodings of data files, detected from their first bytes.
+
+    json        compact JSON, the default; large files are encoded and
+                parsed with orjson when it is installed, everything else
+                with the stdlib json module
+    json-pretty indented JSON for people to read and diff
+    marshal     binary snapshot using the stdlib marshal module
+    msgpack     binary snapshot; needs the optional msgpack package
+    json-gzip   compact JSON compressed with gzip, for cold archives
+    json-lzma   compact JSON compressed with lzma (.xz): smaller, slower
+
+JSON files are plain JSON whatever library wrote them. Binary files
+start with a header naming their codec, and compressed files with the
+magic bytes of their format, so every file can be read back without
+knowing which codec wrote it. HOTEL_CODEC picks the codec that
+JsonFileBackend writes with.
+"""
+import importlib
+import json
+import marshal
+import os
+import zlib
+
+# Optional libraries, imported on first use: importing orjson takes longer
+# than parsing a small data file with json, which matters for the CLI.
+_OPTIONAL = {}
+
+# Below these sizes the stdlib json module is used even with orjson.
+ORJSON_MIN_BYTES = 64 * 1024
+ORJSON_MIN_RECORDS = 256
+
+# Binary files start with MAGIC, the codec name and a newline. A JSON
+# document can never start with a NUL byte.
+MAGIC = b"\x00hotel:"
+_HEADER_MAX = 32
+
+
+class JsonCodec:
+    """JSON text, compact unless indent is given."""
+
+    binary = False
+
+    def __init__(self, name="json", indent=None):
+        self.name = name
+        self.indent = indent
+
+    def dumps(self, data):
+        """Return data encoded as UTF-8 JSON bytes."""
+        orjson = optional("orjson") if len(data) >= ORJSON_MIN_RECORDS else None
+        if self.indent is None:
+            if orjson is not None:
+                return orjson.dumps(data)
+            return json.dumps(data, separators=(",", ":")).encode("utf-8")
+        if orjson is not None and self.indent == 2:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        return json.dumps(data, indent=self.indent).encode("utf-8")
+
+    def loads(self, raw):
+        """Decode JSON bytes; raises ValueError on malformed data."""
+        orjson = optional("orjson") if len(raw) >= ORJSON_MIN_BYTES else None
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+
+
+class MarshalCodec:
+    """Binary snapshot with the stdlib marshal module."""
+
+    binary = True
+    name = "marshal"
+
+    def dumps(self, data):
+        return MAGIC + b"marshal\n" + marshal.dumps(data)
+
+    def loads(self, raw):
+        try:
+            return marshal.loads(_payload(raw))
+        except (EOFError, TypeError) as exc:
+            raise ValueError(f"Bad marshal data: {exc}") from exc
+
+
+class MsgpackCodec:
+    """Binary snapshot with msgpack, which must be installed."""
+
+    binary = True
+    name = "msgpack"
+
+    def dumps(self, data):
+        msgpack = _require_msgpack()
+        return MAGIC + b"msgpack\n" + msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, raw):
+        msgpack = _require_msgpack()
+        try:
+            return msgpack.unpackb(_payload(raw), raw=False, strict_map_key=False)
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ValueError(f"Bad msgpack data: {exc}") from exc
+
+
+class CompressedJsonCodec:
+    """Compact JSON compressed with the gzip or lzma module."""
+
+    binary = True
+
+    def __init__(self, name, module, magic):
+        self.name = name
+        self.module = module
+        self.magic = magic
+
+    def dumps(self, data):
+        # Imported here: only archives use compression.
+        return importlib.import_module(self.module).compress(CODECS["json"].dumps(data))
+
+    def loads(self, raw):
+        module = importlib.import_module(self.module)
+        try:
+            raw = module.decompress(raw)
+        except (EOFError, OSError, zlib.error, getattr(module, "LZMAError", OSError)) as exc:
+            raise ValueError(f"Bad {self.name} data: {exc}") from exc
+        return CODECS["json"].loads(raw)
+
+
+def optional(name):
+    """Return the optional module called name, or None if not installed."""
+    if name not in _OPTIONAL:
+        try:
+            _OPTIONAL[name] = importlib.import_module(name)
+        except ImportError:
+            _OPTIONAL[name] = None
+    return _OPTIONAL[name]
+
+
+def _require_msgpack():
+    msgpack = optional("msgpack")
+    if msgpack is None:
+        raise ImportError("The msgpack codec requires msgpack: pip install msgpack")
+    return msgpack
+
+
+def _payload(raw):
+    return raw[raw.index(b"\n", len(MAGIC)) + 1:]
+
+
+CODECS = {
+    "json": JsonCodec(),
+    "json-pretty": JsonCodec("json-pretty", indent=2),
+    "marshal": MarshalCodec(),
+    "msgpack": MsgpackCodec(),
+    "json-gzip": CompressedJsonCodec("json-gzip", "gzip", b"\x1f\x8b"),
+    "json-lzma": CompressedJsonCodec("json-lzma", "lzma", b"\xfd7zXZ\x00"),
+}
+_COMPRESSED = [CODECS["json-gzip"], CODECS["json-lzma"]]
+
+
+def get_codec(name=None):
+    """Return the codec called name, or the one named by HOTEL_CODEC."""
+    name = (name or os.environ.get("HOTEL_CODEC") or "json").lower()
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown codec: {name}")
+    if codec is CODECS["msgpack"]:
+        _require_msgpack()
+    return codec
+
+
+def detect(head):
+    """Return the codec that wrote a file starting with the bytes head."""
+    if not head.startswith(MAGIC):
+        for codec in _COMPRESSED:
+            if head.startswith(codec.magic):
+                return codec
+        return CODECS["json"]
+    end = head.find(b"\n", len(MAGIC))
+    name = head[len(MAGIC):end if end >= 0 else None].decode("ascii", "replace")
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown codec header: {name!r}")
+    return codec
+
+
+def sniff(filepath):
+    """Return the codec of the file at filepath from its first bytes."""
+    with open(filepath, "rb") as fh:
+        return detect(fh.read(_HEADER_MAX))
+
+
+def decode(raw):
+    """Decode the full contents of a data file written by any codec."""
+    return detect(raw[:_HEADER_MAX]).loads(raw)
@@ -0,0 +1,181 @@
+"""
+Unit of work over the Hotel, Customer and Reservation models.
+
+    with Session() as session:
+        hotel = Hotel.get(hotel_id)
+        hotel.reserve_room(customer_id, "2026-03-01", "2026-03-04")
+        hotel.phone = "555-0100"
+        assert Hotel.get(hotel_id) is hotel
+
+Inside the block each model's get() returns the same object for the
+same ID (an identity map), objects returned by create/modify/get join
+it, and attribute changes made to them are saved when the block exits.
+All writes go through data_handler.batch(), so each collection is
+parsed at most once and written once, at exit, however many steps
+touched it; change events are published after that write. If the
+block raises, nothing is written and no events are published.
+
+The session holds the locks of its collections (all three by default,
+taken in a fixed order so sessions cannot deadlock) from start to
+finish, so checks made inside it, like the free rooms seen by
+reserve_room, still hold when the writes land. Keep sessions short.
+Bulk operations bypass the identity map, and backends that do not cache
+(SQLite, mmap) write at once and cannot be rolled back.
+"""
+import contextvars
+import functools
+import os
+from contextlib import ExitStack
+
+from . import changefeed, data_handler
+
+_CURRENT = contextvars.ContextVar("hotel_session", default=None)
+
+
+class Session:
+    """Identity map plus deferred, all-or-nothing writes; see the module docs."""
+
+    def __init__(self, collections=None):
+        # Names of the data_handler attributes holding the locked files.
+        self.collections = collections or ("HOTELS_FILE", "CUSTOMERS_FILE", "RESERVATIONS_FILE")
+        self._identity = {}
+        self._stack = None
+        self._token = None
+        self._outer = None
+
+    @staticmethod
+    def current():
+        """Return the session active in this context, or None."""
+        return _CURRENT.get()
+
+    def _paths(self):
+        return sorted(
+            {getattr(data_handler, name) for name in self.collections}, key=os.path.abspath
+        )
+
+    def __enter__(self):
+        self._outer = _CURRENT.get()
+        if self._outer is not None:
+            # Nested sessions join the outer one.
+            return self._outer
+        stack = ExitStack()
+        try:
+            for path in self._paths():
+                stack.enter_context(data_handler.locked(path))
+                # Start clean: earlier deferred writes are not ours to drop.
+                data_handler.flush(path)
+            stack.enter_context(changefeed.deferred())
+            stack.enter_context(data_handler.batch())
+        except BaseException:
+            stack.close()
+            raise
+        self._stack = stack
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._outer is not None:
+            return False
+        _CURRENT.reset(self._token)
+        failure = None
+        if exc_type is None:
+            try:
+                self.commit()
+            except BaseException as error:
+                failure = error
+                exc_type, exc, tb = type(error), error, error.__traceback__
+        if exc_type is not None:
+            self._rollback()
+        # Unwinds batch() (writing whatever is left), the held-back change
+        # events (dropped on failure) and the locks, in that order.
+        self._stack.__exit__(exc_type, exc, tb)
+        if failure is not None:
+            raise failure
+        return False
+
+    def _rollback(self):
+        for path in self._paths():
+            data_handler.discard(path)
+        self._identity.clear()
+
+    # ------------------------------------------------------------------
+    # Identity map
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _key(obj):
+        return type(obj), getattr(obj, obj.ID_FIELD)
+
+    def track(self, obj):
+        """
+        Add obj to the identity map as saved. If another object already
+        holds its ID, copy obj's fields into that one and return it.
+        """
+        key = self._key(obj)
+        entry = self._identity.get(key)
+        if entry is None or entry[0] is obj:
+            self._identity[key] = (obj, obj.to_dict())
+            return obj
+        mapped = entry[0]
+        for field in obj.FIELDS:
+            setattr(mapped, field, getattr(obj, field))
+        self._identity[key] = (mapped, mapped.to_dict())
+        return mapped
+
+    def forget(self, cls, record_id):
+        """Drop the object of cls with record_id, e.g. after a delete."""
+        self._identity.pop((cls, str(record_id)), None)
+
+    def dirty(self):
+        """Return the mapped objects changed since they were loaded or saved."""
+        return [obj for obj, saved in self._identity.values() if obj.to_dict() != saved]
+
+    def commit(self):
+        """
+        Save every dirty object now (the writes still land at exit).
+        Raises ValueError if a changed object no longer validates.
+        """
+        for obj in self.dirty():
+            cls, record_id = key = self._key(obj)
+            saved = self._identity[key][1]
+            checked = cls.from_dict(obj.to_dict())
+            if hasattr(cls, "_check_unique"):
+                cls._check_unique(checked)
+            record = checked.to_dict()
+            filepath = getattr(data_handler, cls.COLLECTION)
+            data_handler.put_record(filepath, record_id, record)
+            cancelled = getattr(cls, "STATUS_CANCELLED", None)
+            op = "modify"
+            if cancelled is not None and record.get("status") == cancelled != saved.get("status"):
+                op = "cancel"
+            changefeed.emit(filepath, op, record_id, record)
+            self._identity[key] = (obj, record)
+
+
+def track(obj):
+    """Add obj to the active session's identity map; returns the mapped object."""
+    session = _CURRENT.get()
+    if session is None or obj is None:
+        return obj
+    return session.track(obj)
+
+
+def forget(cls, record_id):
+    """Drop an object from the active session's identity map, if any."""
+    session = _CURRENT.get()
+    if session is not None:
+        session.forget(cls, record_id)
+
+
+def identity_mapped(get):
+    """Decorator for a model's get(cls, record_id) that consults the session."""
+    @functools.wraps(get)
+    def wrapper(cls, record_id):
+        session = _CURRENT.get()
+        if session is None:
+            return get(cls, record_id)
+        entry = session._identity.get((cls, str(record_id)))
+        if entry is not None:
+            return entry[0]
+        return track(get(cls, record_id))
+    return wrapper
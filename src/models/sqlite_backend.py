@@ -0,0 +1,350 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+
+from . import data_handler
+from .availability import STATUS_ACTIVE, to_ordinal
+from .indexes import casefold
+
+
+# Collection file name -> (table, primary key, columns in order).
+TABLES = {
+    "hotels.json": (
+        "hotels",
+        "hotel_id",
+        ("hotel_id", "name", "address", "total_rooms", "phone"),
+    ),
+    "customers.json": (
+        "customers",
+        "customer_id",
+        ("customer_id", "first_name", "last_name", "email", "phone"),
+    ),
+    "reservations.json": (
+        "reservations",
+        "reservation_id",
+        ("reservation_id", "customer_id", "hotel_id", "check_in", "check_out", "status"),
+    ),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hotels (
+    hotel_id TEXT PRIMARY KEY,
+    name TEXT,
+    address TEXT,
+    total_rooms INTEGER,
+    phone TEXT
+);
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    first_name TEXT,
+    last_name TEXT,
+    email TEXT,
+    phone TEXT
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    reservation_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    hotel_id TEXT,
+    check_in TEXT,
+    check_out TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS reservations_hotel_status_check_in
+    ON reservations (hotel_id, status, check_in);
+CREATE INDEX IF NOT EXISTS reservations_customer
+    ON reservations (customer_id);
+"""
+
+# Reservation columns stored as YYYY-MM-DD so SQL can compare them as text.
+DATE_COLUMNS = ("check_in", "check_out")
+
+# Extra columns holding casefold(field), per table, so find() can match
+# field ignoring case through an index. Added by _migrate.
+FOLDED = {"customers": {"email": "email_key"}}
+
+# Bumped with each change to stored rows; _connect migrates older databases.
+SCHEMA_VERSION = 2
+
+
+def _iso_date(value):
+    """Return value as a YYYY-MM-DD string, or unchanged if it is not a date."""
+    try:
+        return date.fromordinal(to_ordinal(value)).isoformat()
+    except (TypeError, ValueError):
+        return value
+
+
+class SqliteBackend:
+    """
+    Stores the three collections as tables of one SQLite database.
+
+    The database lives next to the collection files as DB_NAME, so the
+    usual *_FILE paths still pick the data directory and the table.
+    Lookups use the primary keys, and reservation queries and customer
+    email lookups use secondary indexes, so nothing is cached in
+    data_handler.
+    """
+
+    DB_NAME = "hotel.db"
+    FETCH_SIZE = 1000
+    # Columns with an index that find() may query, per table.
+    INDEXED = {"reservations": ("hotel_id", "customer_id"), "customers": ("email",)}
+    caches = False
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Connection and table helpers
+    # ------------------------------------------------------------------
+
+    def db_path(self, filepath):
+        """Return the database holding the collection at filepath."""
+        return os.path.join(os.path.dirname(os.path.abspath(filepath)), self.DB_NAME)
+
+    def _connect(self, filepath):
+        path = self.db_path(filepath)
+        conn = self._connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            self._connections[path] = conn
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        with conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                # Rows written before dates and status were normalised:
+                # a missing status means active, and dates must compare
+                # as text, so count_booked can match both with the index.
+                conn.execute(
+                    "UPDATE reservations SET status = ? WHERE status IS NULL OR status = ''",
+                    (STATUS_ACTIVE,),
+                )
+                rows = conn.execute(
+                    "SELECT reservation_id, check_in, check_out FROM reservations"
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE reservations SET check_in = ?, check_out = ? WHERE reservation_id = ?",
+                    [
+                        (_iso_date(row_in), _iso_date(row_out), rid)
+                        for rid, row_in, row_out in rows
+                        if (_iso_date(row_in), _iso_date(row_out)) != (row_in, row_out)
+                    ],
+                )
+            if version < 2:
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(customers)")]
+                if "email_key" not in columns:
+                    conn.execute("ALTER TABLE customers ADD COLUMN email_key TEXT")
+                rows = conn.execute("SELECT customer_id, email FROM customers").fetchall()
+                conn.executemany(
+                    "UPDATE customers SET email_key = ? WHERE customer_id = ?",
+                    [(casefold(email), cid) for cid, email in rows if email is not None],
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS customers_email_key ON customers (email_key)"
+                )
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @staticmethod
+    def _table(filepath):
+        name = os.path.basename(filepath)
+        if name not in TABLES:
+            raise ValueError(f"No SQLite table for {filepath}")
+        return TABLES[name]
+
+    @staticmethod
+    def _write_columns(table, columns):
+        return columns + tuple(FOLDED.get(table, {}).values())
+
+    @staticmethod
+    def _to_row(table, columns, key_col, key, record):
+        row = tuple(
+            key if col == key_col
+            else _iso_date(record.get(col)) if col in DATE_COLUMNS
+            else (record.get(col) or STATUS_ACTIVE) if col == "status"
+            else record.get(col)
+            for col in columns
+        )
+        return row + tuple(
+            casefold(record[field]) if record.get(field) is not None else None
+            for field in FOLDED.get(table, {})
+        )
+
+    @staticmethod
+    def _to_record(columns, row):
+        # NULL columns are left out so from_dict reports them as missing.
+        return {col: val for col, val in zip(columns, row) if val is not None}
+
+    def close(self):
+        """Close every open database connection."""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+
+    # ------------------------------------------------------------------
+    # Backend interface
+    # ------------------------------------------------------------------
+
+    def signature(self, filepath):
+        return None
+
+    def read(self, filepath):
+        table, key_col, columns = self._table(filepath)
+        with self._lock:
+            rows = self._connect(filepath).execute(
+                f"SELECT {', '.join(columns)} FROM {table}"
+            ).fetchall()
+        key_pos = columns.index(key_col)
+        return {row[key_pos]: self._to_record(columns, row) for row in rows}
+
+    def iter(self, filepath):
+        """Yield (key, record) pairs from a table cursor, a batch at a time."""
+        table, key_col, columns = self._table(filepath)
+        key_pos = columns.index(key_col)
+        with self._lock:
+            cursor = self._connect(filepath).execute(
+                f"SELECT {', '.join(columns)} FROM {table}"
+            )
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield row[key_pos], self._to_record(columns, row)
+
+    def read_record(self, filepath, key):
+        table, key_col, columns = self._table(filepath)
+        with self._lock:
+            row = self._connect(filepath).execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {key_col} = ?",
+                (key,),
+            ).fetchone()
+        return self._to_record(columns, row) if row is not None else None
+
+    def write(self, filepath, data):
+        table, key_col, columns = self._table(filepath)
+        rows = [
+            self._to_row(table, columns, key_col, key, record) for key, record in data.items()
+        ]
+        columns = self._write_columns(table, columns)
+        with self._lock:
+            conn = self._connect(filepath)
+            with conn:
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    rows,
+                )
+
+    def write_record(self, filepath, data, key, record):
+        if record is None:
+            self.remove_record(filepath, key)
+            return
+        table, key_col, columns = self._table(filepath)
+        values = self._to_row(table, columns, key_col, key, record)
+        columns = self._write_columns(table, columns)
+        with self._lock:
+            conn = self._connect(filepath)
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    values,
+                )
+
+    def remove_record(self, filepath, key):
+        """Delete one record. Returns True if deleted, False if not found."""
+        table, key_col, _ = self._table(filepath)
+        with self._lock:
+            conn = self._connect(filepath)
+            with conn:
+                cursor = conn.execute(f"DELETE FROM {table} WHERE {key_col} = ?", (key,))
+        return cursor.rowcount > 0
+
+    # ------------------------------------------------------------------
+    # Indexed queries
+    # ------------------------------------------------------------------
+
+    def find(self, filepath, field, value):
+        """
+        Return the records of filepath whose indexed field equals value,
+        ignoring case for the fields in FOLDED.
+        """
+        table, _, columns = self._table(filepath)
+        if field not in self.INDEXED.get(table, ()):
+            raise ValueError(f"{table}.{field} is not indexed")
+        column = FOLDED.get(table, {}).get(field)
+        if column is not None:
+            field, value = column, casefold(value)
+        with self._lock:
+            rows = self._connect(filepath).execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {field} = ?",
+                (value,),
+            ).fetchall()
+        return [self._to_record(columns, row) for row in rows]
+
+    def count_booked(self, filepath, hotel_id, check_in=None, check_out=None):
+        """
+        Return active reservations of a hotel, or with dates the most rooms
+        booked on any night from check_in up to check_out.
+        """
+        with self._lock:
+            conn = self._connect(filepath)
+            if check_in is None or check_out is None:
+                return conn.execute(
+                    "SELECT COUNT(*) FROM reservations WHERE hotel_id = ? AND status = ?",
+                    (str(hotel_id), STATUS_ACTIVE),
+                ).fetchone()[0]
+            start, end = to_ordinal(check_in), to_ordinal(check_out)
+            rows = conn.execute(
+                "SELECT check_in, check_out FROM reservations "
+                "WHERE hotel_id = ? AND status = ? AND check_in < ? AND check_out > ?",
+                (
+                    str(hotel_id),
+                    STATUS_ACTIVE,
+                    date.fromordinal(end).isoformat(),
+                    date.fromordinal(start).isoformat(),
+                ),
+            ).fetchall()
+        nights = [0] * max(end - start, 0)
+        for row_in, row_out in rows:
+            try:
+                first, last = to_ordinal(row_in), to_ordinal(row_out)
+            except ValueError:
+                continue
+            for night in range(max(first, start), min(last, end)):
+                nights[night - start] += 1
+        return max(nights, default=0)
+
+
+def migrate_json(data_dir=None, backend=None):
+    """
+    Copy hotels.json, customers.json and reservations.json from data_dir
+    into the SQLite database of that directory, replacing its contents.
+    Returns a dict of record counts per file.
+    """
+    data_dir = data_dir or data_handler.DATA_DIR
+    backend = backend or SqliteBackend()
+    source = data_handler.JsonFileBackend()
+    counts = {}
+    for name in TABLES:
+        filepath = os.path.join(data_dir, name)
+        data = source.read(filepath)
+        backend.write(filepath, data)
+        counts[name] = len(data)
+    return counts
+
+
+if __name__ == "__main__":
+    for name, count in migrate_json().items():
+        print(f"Migrated {count} records from {name}")
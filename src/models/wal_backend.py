@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+
+from . import instrumentation, serialization
+from .data_handler import JsonFileBackend, _atomic_write, _signature, locked
+
+logger = logging.getLogger(__name__)
+
+
+class WalBackend(JsonFileBackend):
+    """
+    Append-only storage: each collection is a JSON snapshot plus a log.
+
+    The snapshot lives at the usual path (e.g. hotels.json) and stays
+    readable by the plain JSON backend. Every single-record change is
+    appended to "<path>.log" as one JSON line, and reads replay the log
+    over the snapshot. Once the log holds compact_every entries it is
+    folded into a new snapshot and truncated.
+    """
+
+    LOG_SUFFIX = ".log"
+    # Replaying the log needs the file lock, so shards are read in-process.
+    parallel_reads = False
+
+    def __init__(self, compact_every=1000, fsync=True, codec=None):
+        super().__init__(fsync, codec)
+        self.compact_every = compact_every
+        self._log_entries = {}
+
+    def _log_path(self, filepath):
+        return filepath + self.LOG_SUFFIX
+
+    def signature(self, filepath):
+        return (_signature(filepath), _signature(self._log_path(filepath)))
+
+    def read(self, filepath):
+        # Hold the file lock so a concurrent compaction cannot swap the
+        # snapshot between reading it and replaying the log.
+        with locked(filepath):
+            data = super().read(filepath)
+            self._log_entries[os.path.abspath(filepath)] = self._replay(filepath, data)
+        return data
+
+    def iter(self, filepath):
+        # The log may rewrite any snapshot record, so replay it first.
+        return iter(self.read(filepath).items())
+
+    def _replay(self, filepath, data):
+        """Apply the log of filepath to data and return the entries applied."""
+        log_path = self._log_path(filepath)
+        if not os.path.exists(log_path):
+            return 0
+        with open(log_path, "r", encoding="utf-8") as fh:
+            lines = fh.read().split("\n")
+            instrumentation.add_bytes("read", log_path, fh.buffer.tell())
+        applied = 0
+        for lineno, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                key = entry["key"]
+                if entry["op"] == "put":
+                    data[key] = entry["record"]
+                else:
+                    data.pop(key, None)
+            except (json.JSONDecodeError, KeyError, TypeError) as exc:
+                if lineno == len(lines):
+                    # A write torn by a crash: the mutation never completed,
+                    # so cut it off before anything is appended after it.
+                    good = "".join(part + "\n" for part in lines[:-1])
+                    with open(log_path, "r+b") as fh:
+                        fh.truncate(len(good.encode("utf-8")))
+                    break
+                logger.error(
+                    "Error replaying %s line %d: %s. Skipping entry.", log_path, lineno, exc,
+                    extra={"path": log_path, "line": lineno},
+                )
+                continue
+            applied += 1
+        return applied
+
+    def write(self, filepath, data):
+        _atomic_write(filepath, data, self.fsync, self.codec)
+        # The snapshot now contains every logged change, so the log can go.
+        log_path = self._log_path(filepath)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        self._log_entries[os.path.abspath(filepath)] = 0
+
+    def write_record(self, filepath, data, key, record):
+        self.write_records(filepath, data, [(key, record)])
+
+    def write_records(self, filepath, data, changes):
+        """Append every change in one write and one fsync."""
+        # Log lines are always compact JSON, whatever codec the snapshot uses.
+        encode = serialization.CODECS["json"].dumps
+        lines = []
+        for key, record in changes:
+            if record is None:
+                lines.append(encode({"op": "del", "key": key}))
+            else:
+                lines.append(encode({"op": "put", "key": key, "record": record}))
+        payload = b"\n".join(lines) + b"\n"
+        with open(self._log_path(filepath), "ab") as fh:
+            fh.write(payload)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        instrumentation.add_bytes("written", self._log_path(filepath), len(payload))
+        count = self._log_entries.get(os.path.abspath(filepath), 0) + len(changes)
+        self._log_entries[os.path.abspath(filepath)] = count
+        if count >= self.compact_every:
+            self.compact(filepath, data)
+
+    def compact(self, filepath, data):
+        """Fold the log into a fresh snapshot of data."""
+        self.write(filepath, data)
@@ -0,0 +1,269 @@
+"""
+Hotel Reservation System - asyncio service front-end
+
+Serves Hotel, Customer and Reservation operations over a JSON line
+protocol. Each request is one line such as
+
+    {"id": 1, "op": "hotel.reserve_room",
+     "args": {"hotel_id": "...", "customer_id": "...",
+              "check_in": "2026-03-01", "check_out": "2026-03-04"}}
+
+and gets one response line {"id": 1, "ok": true, "result": ...} or
+{"id": 1, "ok": false, "error": "..."}.
+
+Data stays cached in memory between requests. Operations run one group
+at a time on a single worker thread: every request queued while the
+previous group ran is executed inside one session.Session(), so each
+touched file is written once per group, and responses are sent only
+after that write. The session holds the collections' locks for the
+whole group, so other processes (the CLI, other servers) cannot book a
+room the group has checked but not yet written.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from models import (
+    Customer, Hotel, Reservation, Session, changefeed, data_handler, instrumentation,
+)
+
+logger = logging.getLogger("models.server")
+
+
+def _hotel(args):
+    hotel = Hotel.get(args["hotel_id"])
+    if hotel is None:
+        raise ValueError(f"Hotel {args['hotel_id']} not found.")
+    return hotel
+
+
+def _cancel(args):
+    reservation = Reservation.get(args["reservation_id"])
+    if reservation is None:
+        raise ValueError(f"Reservation {args['reservation_id']} not found.")
+    return reservation.cancel()
+
+
+def _changes(args):
+    """Return up to limit events after offset and the offset to resume from."""
+    offset, limit = args.get("offset", 0), args.get("limit", 1000)
+    events = []
+    for next_offset, event in changefeed.tail(offset):
+        if len(events) >= limit:
+            break
+        events.append(event)
+        offset = next_offset
+    return {"events": events, "next_offset": offset}
+
+
+def _fields(args, *exclude):
+    return {key: value for key, value in args.items() if key not in exclude}
+
+
+OPERATIONS = {
+    "hotel.create": lambda a: Hotel.create(**a),
+    "hotel.get": lambda a: Hotel.get(a["hotel_id"]),
+    "hotel.list": lambda a: Hotel.get_all(),
+    "hotel.modify": lambda a: Hotel.modify(a["hotel_id"], **_fields(a, "hotel_id")),
+    "hotel.delete": lambda a: Hotel.delete(a["hotel_id"]),
+    "hotel.available_rooms": lambda a: _hotel(a).available_rooms(
+        a.get("check_in"), a.get("check_out")
+    ),
+    "hotel.reserve_room": lambda a: _hotel(a).reserve_room(
+        a["customer_id"], a["check_in"], a["check_out"]
+    ),
+    "hotel.cancel_reservation": lambda a: _hotel(a).cancel_reservation(
+        a["reservation_id"]
+    ),
+    "hotel.search_available": lambda a: [
+        {**hotel.to_dict(), "available_rooms": free}
+        for hotel, free in Hotel.search_available(
+            a["check_in"], a["check_out"], **_fields(a, "check_in", "check_out")
+        )
+    ],
+    "customer.create": lambda a: Customer.create(**a),
+    "customer.get": lambda a: Customer.get(a["customer_id"]),
+    "customer.list": lambda a: Customer.get_all(),
+    "customer.modify": lambda a: Customer.modify(
+        a["customer_id"], **_fields(a, "customer_id")
+    ),
+    "customer.delete": lambda a: Customer.delete(a["customer_id"]),
+    "customer.find_by_email": lambda a: Customer.find_by_email(a["email"]),
+    "customer.search_by_name": lambda a: Customer.search_by_name(
+        a["last_name"], a.get("first_name"), a.get("limit")
+    ),
+    "reservation.create": lambda a: Reservation.create(**a),
+    "reservation.get": lambda a: Reservation.get(a["reservation_id"]),
+    "reservation.list": lambda a: Reservation.get_all(),
+    "reservation.cancel": _cancel,
+    "reservation.delete": lambda a: Reservation.delete(a["reservation_id"]),
+    "reservation.for_customer": lambda a: Reservation.for_customer(a["customer_id"]),
+    "reservation.for_hotel": lambda a: Reservation.for_hotel(a["hotel_id"]),
+    "reservation.get_archived": lambda a: Reservation.get_archived(a["reservation_id"]),
+    "reservation.history": lambda a: Reservation.history(**a),
+    "changes.read": _changes,
+    "server.stats": lambda a: instrumentation.stats(),
+    "server.metrics": lambda a: instrumentation.prometheus_text(),
+}
+
+
+def _to_json(value):
+    """Convert model objects (and lists of them) to plain JSON values."""
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return value
+
+
+def execute(op, args):
+    """Run one operation and return its response fields."""
+    handler = OPERATIONS.get(op) if isinstance(op, str) else None
+    if handler is None:
+        return {"ok": False, "error": f"Unknown operation: {op}"}
+    if not isinstance(args, dict):
+        return {"ok": False, "error": "args must be an object"}
+    try:
+        return {"ok": True, "result": _to_json(handler(args))}
+    except KeyError as exc:
+        return {"ok": False, "error": f"Missing argument: {exc.args[0]}"}
+    except (TypeError, ValueError) as exc:
+        return {"ok": False, "error": str(exc)}
+    except Exception as exc:  # pylint: disable=broad-except
+        # One broken request must not fail the rest of its group.
+        logger.exception("Error running %s", op)
+        return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def execute_group(requests):
+    """
+    Run a group of (op, args) requests in one session, holding the
+    collections' locks throughout, with one write per touched file. If
+    the group raises, its changes are dropped before anything is
+    written; if the write fails, its unwritten changes and their change
+    events are dropped, so the cache matches the files again. Either
+    way the error is raised.
+    """
+    try:
+        with Session():
+            return [execute(op, args) for op, args in requests]
+    except Exception:
+        data_handler.discard()
+        raise
+
+
+class ReservationServer:
+    """Line-protocol server that groups concurrent requests into batches."""
+
+    def __init__(self, host="127.0.0.1", port=8765, max_group=256):
+        self.host = host
+        self.port = port
+        self.max_group = max_group
+        self._queue = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._server = None
+        self._worker = None
+
+    async def start(self):
+        """Start listening; returns once the socket is bound."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run_groups())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Start the server and run until cancelled."""
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and finish the queued groups."""
+        self._server.close()
+        await self._server.wait_closed()
+        await self._queue.join()
+        self._worker.cancel()
+        self._executor.shutdown(wait=True)
+        data_handler.flush()
+
+    async def submit(self, op, args):
+        """Queue one request and wait for its response fields."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, args, future))
+        return await future
+
+    async def _run_groups(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self.max_group and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+            requests = [(op, args) for op, args, _ in jobs]
+            try:
+                responses = await loop.run_in_executor(
+                    self._executor, execute_group, requests
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                responses = [{"ok": False, "error": f"Persistence failed: {exc}"}] * len(jobs)
+            for (_, _, future), response in zip(jobs, responses):
+                if not future.cancelled():
+                    future.set_result(response)
+                self._queue.task_done()
+
+    async def _handle(self, reader, writer):
+        pending = set()
+        lock = asyncio.Lock()
+
+        async def answer(request_id, op, args):
+            response = await self.submit(op, args)
+            async with lock:
+                writer.write((json.dumps({"id": request_id, **response}) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                    task = answer(request_id, request["op"], request.get("args", {}))
+                except (json.JSONDecodeError, AttributeError, KeyError):
+                    async with lock:
+                        writer.write(b'{"id": null, "ok": false, "error": "Bad request"}\n')
+                        await writer.drain()
+                    continue
+                # Requests on one connection run concurrently, so they can
+                # join the same group; responses carry the request id.
+                task = asyncio.create_task(task)
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+
+def main():
+    """Run the reservation server until interrupted."""
+    parser = argparse.ArgumentParser(description="Hotel reservation server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-group", type=int, default=256)
+    args = parser.parse_args()
+    instrumentation.configure_logging()
+    server = ReservationServer(args.host, args.port, args.max_group)
+    logger.info("Serving on %s:%s", args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        data_handler.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Shared fixtures for the tests and benchmarks: run against a temp data directory."""
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+
+def patch_data_dir(tmp_dir):
+    """Return a dict of patches to redirect all data files to tmp_dir."""
+    return {
+        "models.data_handler.HOTELS_FILE": os.path.join(tmp_dir, "hotels.json"),
+        "models.data_handler.CUSTOMERS_FILE": os.path.join(tmp_dir, "customers.json"),
+        "models.data_handler.RESERVATIONS_FILE": os.path.join(tmp_dir, "reservations.json"),
+        "models.data_handler.DATA_DIR": tmp_dir,
+    }
+
+
+def start_data_dir_patches(tmp_dir):
+    """Start the patches from patch_data_dir; returns the patchers to stop later."""
+    patchers = [patch(target, value) for target, value in patch_data_dir(tmp_dir).items()]
+    for p in patchers:
+        p.start()
+    return patchers
+
+
+class DataDirTestCase(unittest.TestCase):
+    """
+    TestCase whose data files live in a fresh temp directory (self.tmp).
+
+    The patches are undone and the directory removed after tearDown, so a
+    subclass's tearDown can still flush or close backends into it.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        for p in start_data_dir_patches(self.tmp):
+            self.addCleanup(p.stop)
@@ -0,0 +1,47 @@
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Hotel, Reservation
+from models import analytics
+
+@unittest.skipIf(analytics.np is None, "numpy is not installed")
+class TestAnalytics(DataDirTestCase):
+    """Test vectorised occupancy analytics."""
+
+    def setUp(self):
+        super().setUp()
+        self.hotel = Hotel.create("Stats Inn", "1 Data St", 2)
+        self.empty = Hotel.create("Empty Inn", "2 Data St", 4)
+        self.hotel.reserve_room("c1", "2026-03-01", "2026-03-04")
+        self.hotel.reserve_room("c2", "2026-03-02", "2026-03-03")
+        cancelled = self.hotel.reserve_room("c3", "2026-03-03", "2026-03-05")
+        cancelled.cancel()
+
+    def test_nightly_booked_clips_to_range(self):
+        hotel_ids, booked = analytics.nightly_booked("2026-02-28", "2026-03-05")
+        row = hotel_ids.index(self.hotel.hotel_id)
+        self.assertEqual(booked[row].tolist(), [0, 1, 2, 1, 0])
+
+    def test_occupancy_rates_include_empty_hotels(self):
+        rates = analytics.occupancy_rates("2026-03-01", "2026-03-03")
+        self.assertEqual(rates[self.hotel.hotel_id].tolist(), [0.5, 1.0])
+        self.assertEqual(rates[self.empty.hotel_id].tolist(), [0.0, 0.0])
+
+    def test_length_of_stay_and_cancellations(self):
+        stays = analytics.average_length_of_stay()
+        self.assertAlmostEqual(stays[self.hotel.hotel_id], 2.0)
+        cancels = analytics.cancellation_rates("2026-03-01", "2026-04-01")
+        self.assertAlmostEqual(cancels[self.hotel.hotel_id], 1 / 3)
+
+    def test_report_is_plain_dict(self):
+        summary = analytics.report("2026-03-01", "2026-03-05")
+        self.assertEqual(summary[self.empty.hotel_id]["occupancy_peak"], 0.0)
+        self.assertEqual(summary[self.hotel.hotel_id]["occupancy_peak"], 1.0)
+
+    def test_no_reservations(self):
+        Reservation.bulk_delete([r.reservation_id for r in Reservation.get_all()])
+        hotel_ids, booked = analytics.nightly_booked("2026-03-01", "2026-03-02")
+        self.assertEqual(booked.sum(), 0)
@@ -0,0 +1,144 @@
+import sys
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Customer, Hotel, Reservation, changefeed, data_handler
+
+class TestChangefeed(DataDirTestCase):
+    """Test the append-only change feed and tailing it from an offset."""
+
+    def tearDown(self):
+        changefeed.set_enabled(True)
+        data_handler.disable_write_behind()
+
+    def _events(self, offset=0):
+        return [event for _, event in changefeed.tail(offset)]
+
+    def test_model_mutations_are_recorded_in_order(self):
+        hotel = Hotel.create("Grand", "1 St", 2)
+        Hotel.modify(hotel.hotel_id, name="Grander")
+        customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+        reservation = hotel.reserve_room(customer.customer_id, "2026-03-01", "2026-03-02")
+        reservation.cancel()
+        Reservation.delete(reservation.reservation_id)
+        Customer.delete(customer.customer_id)
+        events = self._events()
+        self.assertEqual(
+            [(e["collection"], e["op"]) for e in events],
+            [("hotels", "create"), ("hotels", "modify"), ("customers", "create"),
+             ("reservations", "create"), ("reservations", "cancel"),
+             ("reservations", "delete"), ("customers", "delete")],
+        )
+        self.assertEqual([e["seq"] for e in events], list(range(1, 8)))
+        self.assertEqual(events[1]["record"]["name"], "Grander")
+        self.assertEqual(events[4]["record"]["status"], "cancelled")
+        self.assertIsNone(events[5]["record"])
+
+    def test_failed_mutations_are_not_recorded(self):
+        self.assertFalse(Hotel.delete("missing"))
+        self.assertIsNone(Hotel.modify("missing", name="X"))
+        self.assertEqual(self._events(), [])
+
+    def test_bulk_operations_record_one_event_per_record(self):
+        hotels, _ = Hotel.bulk_create([
+            {"name": "A", "address": "1 St", "total_rooms": 1},
+            {"name": "B", "address": "2 St", "total_rooms": 0},
+            {"name": "C", "address": "3 St", "total_rooms": 3},
+        ])
+        ids = [h.hotel_id for h in hotels]
+        Hotel.bulk_modify({ids[0]: {"name": "A2"}, "missing": {"name": "X"}})
+        Hotel.bulk_delete(ids)
+        self.assertEqual(
+            [(e["op"], e["id"]) for e in self._events()],
+            [("create", ids[0]), ("create", ids[1]), ("modify", ids[0]),
+             ("delete", ids[0]), ("delete", ids[1])],
+        )
+
+    def test_tail_resumes_from_stored_offset(self):
+        Hotel.create("A", "1 St", 1)
+        offset, _ = list(changefeed.tail())[-1]
+        self.assertEqual(offset, changefeed.end_offset())
+        self.assertEqual(self._events(offset), [])
+        Hotel.create("B", "2 St", 1)
+        events = self._events(offset)
+        self.assertEqual([(e["seq"], e["record"]["name"]) for e in events], [(2, "B")])
+
+    def test_partial_line_is_skipped_then_cut_off(self):
+        Hotel.create("A", "1 St", 1)
+        with open(changefeed.feed_path(), "ab") as fh:
+            fh.write(b'{"seq": 2, "collec')
+        changefeed._TAIL.clear()
+        self.assertEqual(len(self._events()), 1)
+        Hotel.create("B", "2 St", 1)
+        self.assertEqual([e["seq"] for e in self._events()], [1, 2])
+
+    def test_concurrent_writers_get_unique_sequence_numbers(self):
+        threads = [
+            threading.Thread(target=lambda i=i: Hotel.create(f"H{i}", "1 St", 1))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(e["seq"] for e in self._events()), list(range(1, 9)))
+
+    def test_follow_waits_for_new_events(self):
+        feed = changefeed.tail(changefeed.end_offset(), follow=True, poll_interval=0.01)
+        threading.Timer(0.05, lambda: Hotel.create("Late", "1 St", 1)).start()
+        _, event = next(feed)
+        feed.close()
+        self.assertEqual(event["record"]["name"], "Late")
+
+    def test_archive_is_recorded(self):
+        reservation = Reservation.create("c1", "h1", "2026-01-01", "2026-01-02")
+        Reservation.archive(before="2026-02-01")
+        self.assertEqual(
+            [(e["op"], e["id"]) for e in self._events()][-1],
+            ("archive", reservation.reservation_id),
+        )
+
+    def test_batched_changes_are_recorded_after_the_write(self):
+        with data_handler.batch():
+            hotel = Hotel.create("Grand", "1 St", 2)
+            Hotel.modify(hotel.hotel_id, name="Grander")
+            self.assertEqual(self._events(), [])
+        self.assertEqual([e["op"] for e in self._events()], ["create", "modify"])
+
+    def test_write_behind_records_after_flush(self):
+        data_handler.enable_write_behind(interval=60)
+        hotel = Hotel.create("Grand", "1 St", 2)
+        self.assertEqual(self._events(), [])
+        data_handler.flush()
+        self.assertEqual([e["id"] for e in self._events()], [hotel.hotel_id])
+
+    def test_failed_flush_keeps_events_until_written(self):
+        data_handler.enable_write_behind(interval=60)
+        Hotel.create("Grand", "1 St", 2)
+        with patch.object(data_handler.JsonFileBackend, "write_records", side_effect=OSError):
+            with self.assertRaises(OSError):
+                data_handler.flush()
+        self.assertEqual(self._events(), [])
+        data_handler.flush()
+        self.assertEqual(len(self._events()), 1)
+
+    def test_discarded_changes_are_not_recorded(self):
+        data_handler.enable_write_behind(interval=60)
+        Hotel.create("Grand", "1 St", 2)
+        data_handler.discard(data_handler.HOTELS_FILE)
+        data_handler.flush()
+        self.assertEqual(self._events(), [])
+        self.assertEqual(Hotel.get_all(), [])
+
+    def test_disabled_records_nothing(self):
+        changefeed.set_enabled(False)
+        Hotel.create("A", "1 St", 1)
+        self.assertFalse(os.path.exists(changefeed.feed_path()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Customer, data_handler
+
+class TestCustomer(DataDirTestCase):
+    """Test Customer CRUD, email uniqueness and name search."""
+
+    def test_create_and_get_customer(self):
+        customer = Customer.create("Ada", "Lovelace", "ada@example.com", "555")
+        fetched = Customer.get(customer.customer_id)
+        self.assertEqual(fetched.to_dict(), customer.to_dict())
+
+    def test_create_rejects_duplicate_email(self):
+        Customer.create("Ada", "Lovelace", "ada@example.com")
+        with self.assertRaises(ValueError):
+            Customer.create("Other", "Person", " ADA@example.com")
+        self.assertEqual(len(Customer.get_all()), 1)
+
+    def test_email_is_free_again_after_delete(self):
+        customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+        self.assertTrue(Customer.delete(customer.customer_id))
+        self.assertIsNone(Customer.find_by_email("ada@example.com"))
+        Customer.create("Ada", "Lovelace", "ada@example.com")
+
+    def test_find_by_email_follows_modify(self):
+        customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+        Customer.modify(customer.customer_id, email="countess@example.com")
+        self.assertIsNone(Customer.find_by_email("ada@example.com"))
+        found = Customer.find_by_email("Countess@Example.com")
+        self.assertEqual(found.customer_id, customer.customer_id)
+
+    def test_modify_rejects_email_of_another_customer(self):
+        Customer.create("Ada", "Lovelace", "ada@example.com")
+        other = Customer.create("Alan", "Turing", "alan@example.com")
+        with self.assertLogs("models.customer", level="ERROR"):
+            self.assertIsNone(Customer.modify(other.customer_id, email="ada@example.com"))
+        self.assertEqual(Customer.get(other.customer_id).email, "alan@example.com")
+        # Keeping one's own email is not a conflict.
+        self.assertIsNotNone(Customer.modify(other.customer_id, email="ALAN@example.com"))
+
+    def test_search_by_name_prefix(self):
+        for first, last in [("John", "Smith"), ("jane", "Smith"), ("Sam", "Smithers"),
+                            ("Ann", "Smyth"), ("Bob", "Jones")]:
+            Customer.create(first, last, f"{first}.{last}@example.com")
+        found = [(c.last_name, c.first_name) for c in Customer.search_by_name("smi")]
+        self.assertEqual(
+            found, [("Smith", "jane"), ("Smith", "John"), ("Smithers", "Sam")]
+        )
+        found = [c.first_name for c in Customer.search_by_name("Smith", "J")]
+        self.assertEqual(found, ["jane", "John"])
+        self.assertEqual(len(Customer.search_by_name("s", limit=2)), 2)
+        self.assertEqual(Customer.search_by_name("x"), [])
+
+    def test_search_by_name_follows_modify_and_delete(self):
+        customer = Customer.create("John", "Smith", "john@example.com")
+        Customer.modify(customer.customer_id, last_name="Doe")
+        self.assertEqual(Customer.search_by_name("Smith"), [])
+        self.assertEqual(len(Customer.search_by_name("Doe", "John")), 1)
+        Customer.delete(customer.customer_id)
+        self.assertEqual(Customer.search_by_name("Doe"), [])
+
+    def test_indexes_rebuilt_from_file(self):
+        customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+        data_handler.invalidate_cache()
+        self.assertEqual(
+            Customer.find_by_email("ada@example.com").customer_id, customer.customer_id
+        )
+        self.assertEqual(len(Customer.search_by_name("love")), 1)
+
+    def test_bulk_create_reports_duplicate_emails(self):
+        Customer.create("Ada", "Lovelace", "ada@example.com")
+        customers, errors = Customer.bulk_create([
+            {"first_name": "A", "last_name": "B", "email": "ada@example.com"},
+            {"first_name": "C", "last_name": "D", "email": "c@example.com"},
+            {"first_name": "E", "last_name": "F", "email": "C@example.com"},
+        ])
+        self.assertEqual([c.first_name for c in customers], ["C"])
+        self.assertEqual([position for position, _ in errors], [0, 2])
+
+    def test_bulk_modify_keeps_emails_unique(self):
+        ada = Customer.create("Ada", "Lovelace", "ada@example.com")
+        bob = Customer.create("Bob", "Builder", "bob@example.com")
+        cy = Customer.create("Cy", "Young", "cy@example.com")
+        updated, errors = Customer.bulk_modify({
+            bob.customer_id: {"email": "ADA@example.com"},
+            cy.customer_id: {"phone": "555"},
+        })
+        self.assertEqual([c.customer_id for c in updated], [cy.customer_id])
+        self.assertEqual([record_id for record_id, _ in errors], [bob.customer_id])
+        updated, errors = Customer.bulk_modify({
+            ada.customer_id: {"email": "new@example.com"},
+            bob.customer_id: {"email": "ada@example.com"},
+            cy.customer_id: {"email": "NEW@example.com"},
+        })
+        self.assertEqual(
+            [c.customer_id for c in updated], [ada.customer_id, bob.customer_id]
+        )
+        self.assertEqual([record_id for record_id, _ in errors], [cy.customer_id])
+        self.assertEqual(Customer.find_by_email("ada@example.com").first_name, "Bob")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,689 @@
+import sys
+import os
+import json
+import multiprocessing
+import sqlite3
+import subprocess
+import threading
+import time
+import unittest
+import uuid
+from datetime import date
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Customer, Hotel, Reservation, data_handler
+from models import serialization, sqlite_backend
+from models.mmap_backend import RECORD, MmapBackend
+from models.mmap_backend import migrate_json as migrate_to_mmap
+from models.sqlite_backend import SqliteBackend, migrate_json
+from models.wal_backend import WalBackend
+
+class TestDataHandler(DataDirTestCase):
+    """Test the cached JSON persistence layer."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "hotels.json")
+
+    def tearDown(self):
+        data_handler.invalidate_cache()
+
+    def test_load_missing_file(self):
+        self.assertEqual(data_handler.load_json(self.path), {})
+
+    def test_save_then_load(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        self.assertEqual(data_handler.load_json(self.path), {"h1": {"name": "A"}})
+
+    def test_unchanged_file_is_not_parsed_again(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        data_handler.invalidate_cache()
+        data_handler.load_json(self.path)
+        with patch("models.data_handler.json.load") as mock_load:
+            data_handler.load_json(self.path)
+            data_handler.get_record(self.path, "h1")
+        mock_load.assert_not_called()
+
+    def test_external_change_is_reloaded(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump({"h2": {"name": "Bigger file"}}, fh)
+        self.assertIsNone(data_handler.get_record(self.path, "h1"))
+        self.assertEqual(data_handler.get_record(self.path, "h2"), {"name": "Bigger file"})
+
+    def test_get_record_returns_copy(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        data_handler.get_record(self.path, "h1")["name"] = "Changed"
+        self.assertEqual(data_handler.get_record(self.path, "h1"), {"name": "A"})
+
+    def test_stream_json_small_chunks(self):
+        data = {f"h{i}": {"name": f"Hotel {i}", "rooms": i * 1000} for i in range(50)}
+        data_handler.save_json(self.path, data)
+        streamed = list(data_handler.stream_json(self.path, chunk_size=7))
+        self.assertEqual(dict(streamed), data)
+
+    def test_stream_json_numbers_split_across_chunks(self):
+        data = {"a": 0.5, "b": -12.25e3, "c": 10, "d": [1E-2, 7], "e": 3}
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write('{"a": 0.5, "b": -12.25e3, "c": 10, "d": [1E-2, 7], "e": 3}')
+        for chunk_size in range(1, 12):
+            streamed = list(data_handler.stream_json(self.path, chunk_size=chunk_size))
+            self.assertEqual(dict(streamed), data)
+
+    def test_stream_json_empty_object(self):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write(" { } ")
+        self.assertEqual(list(data_handler.stream_json(self.path)), [])
+
+    def test_stream_json_rejects_non_object(self):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump([1, 2, 3], fh)
+        with self.assertRaises(ValueError):
+            list(data_handler.stream_json(self.path))
+
+    def test_iter_records_streams_large_uncached_file(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        data_handler.invalidate_cache()
+        with patch.object(data_handler, "STREAM_MIN_BYTES", 0):
+            with patch("models.data_handler._parse") as mock_parse:
+                self.assertEqual(list(data_handler.iter_records(self.path)), [("h1", {"name": "A"})])
+        mock_parse.assert_not_called()
+        self.assertIsNone(data_handler._CACHE.get(os.path.abspath(self.path)))
+
+    def test_iter_records_caches_small_file(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        data_handler.invalidate_cache()
+        self.assertEqual(list(data_handler.iter_records(self.path)), [("h1", {"name": "A"})])
+        with patch("models.data_handler.stream_json") as mock_stream:
+            with patch("models.data_handler._parse") as mock_parse:
+                self.assertEqual(list(data_handler.iter_records(self.path)), [("h1", {"name": "A"})])
+        mock_stream.assert_not_called()
+        mock_parse.assert_not_called()
+
+    def test_load_invalid_json_file(self):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write("NOT VALID JSON {{{{")
+        with self.assertLogs("models.data_handler", level="ERROR"):
+            data = data_handler.load_json(self.path)
+        self.assertEqual(data, {})
+
+
+class TestWalBackend(DataDirTestCase):
+    """Test the append-only log backend."""
+
+    def setUp(self):
+        super().setUp()
+        self.previous = data_handler.get_backend()
+        data_handler.set_backend(WalBackend(compact_every=3, fsync=False))
+        self.path = os.path.join(self.tmp, "hotels.json")
+
+    def tearDown(self):
+        data_handler.set_backend(self.previous)
+
+    def test_put_appends_to_log(self):
+        data_handler.put_record(self.path, "h1", {"name": "A"})
+        data_handler.put_record(self.path, "h2", {"name": "B"})
+        self.assertFalse(os.path.exists(self.path))
+        with open(self.path + ".log", encoding="utf-8") as fh:
+            self.assertEqual(len(fh.readlines()), 2)
+
+    def test_replay_after_restart(self):
+        data_handler.put_record(self.path, "h1", {"name": "A"})
+        data_handler.put_record(self.path, "h2", {"name": "B"})
+        data_handler.delete_record(self.path, "h1")
+        data_handler.invalidate_cache()
+        self.assertEqual(data_handler.load_json(self.path), {"h2": {"name": "B"}})
+
+    def test_compaction_writes_snapshot(self):
+        for i in range(3):
+            data_handler.put_record(self.path, f"h{i}", {"name": str(i)})
+        self.assertFalse(os.path.exists(self.path + ".log"))
+        with open(self.path, encoding="utf-8") as fh:
+            self.assertEqual(len(json.load(fh)), 3)
+
+    def test_torn_last_line_is_dropped(self):
+        data_handler.put_record(self.path, "h1", {"name": "A"})
+        with open(self.path + ".log", "a", encoding="utf-8") as fh:
+            fh.write('{"op": "put", "key": "h2", "rec')
+        data_handler.invalidate_cache()
+        self.assertEqual(data_handler.load_json(self.path), {"h1": {"name": "A"}})
+        data_handler.put_record(self.path, "h3", {"name": "C"})
+        data_handler.invalidate_cache()
+        self.assertEqual(set(data_handler.load_json(self.path)), {"h1", "h3"})
+
+    def test_models_work_unchanged(self):
+        hotel = Hotel.create("Log Inn", "1 Append St", 3)
+        Hotel.modify(hotel.hotel_id, name="Log Hotel")
+        data_handler.invalidate_cache()
+        self.assertEqual(Hotel.get(hotel.hotel_id).name, "Log Hotel")
+
+
+class TestSqliteBackend(DataDirTestCase):
+    """Test the SQLite storage engine."""
+
+    def setUp(self):
+        super().setUp()
+        self.previous = data_handler.get_backend()
+        self.backend = SqliteBackend()
+        data_handler.set_backend(self.backend)
+
+    def tearDown(self):
+        data_handler.set_backend(self.previous)
+        self.backend.close()
+
+    def test_hotel_crud(self):
+        hotel = Hotel.create("Table Inn", "1 Row St", 4)
+        self.assertEqual(Hotel.get(hotel.hotel_id).name, "Table Inn")
+        Hotel.modify(hotel.hotel_id, total_rooms=6)
+        self.assertEqual(Hotel.get(hotel.hotel_id).total_rooms, 6)
+        self.assertEqual(len(Hotel.get_all()), 1)
+        self.assertTrue(Hotel.delete(hotel.hotel_id))
+        self.assertFalse(Hotel.delete(hotel.hotel_id))
+
+    def test_availability_uses_sql(self):
+        hotel = Hotel.create("Table Inn", "1 Row St", 1)
+        reservation = hotel.reserve_room("c1", "2026-03-01", "2026-03-04")
+        with self.assertRaises(ValueError):
+            hotel.reserve_room("c2", "2026-03-03", "2026-03-05")
+        self.assertEqual(hotel.available_rooms("2026-03-04", "2026-03-06"), 1)
+        hotel.cancel_reservation(reservation.reservation_id)
+        self.assertEqual(hotel.available_rooms(), 1)
+
+    def test_count_booked_treats_missing_status_as_active(self):
+        self.backend.write(data_handler.RESERVATIONS_FILE, {
+            "r1": {"customer_id": "c1", "hotel_id": "h1",
+                   "check_in": "2026-03-01", "check_out": "2026-03-04"},
+            "r2": {"customer_id": "c2", "hotel_id": "h1", "status": "cancelled",
+                   "check_in": "2026-03-01", "check_out": "2026-03-04"},
+        })
+        self.assertEqual(Reservation.count_active_for_hotel("h1"), 1)
+        self.assertEqual(
+            Reservation.count_active_for_hotel("h1", date(2026, 3, 3), date(2026, 3, 5)), 1
+        )
+        self.assertEqual(
+            Reservation.count_active_for_hotel("h1", "2026-03-04", "2026-03-05"), 0
+        )
+
+    def test_old_rows_are_migrated_once(self):
+        self.backend.close()
+        conn = sqlite3.connect(self.backend.db_path(data_handler.RESERVATIONS_FILE))
+        conn.executescript(sqlite_backend.SCHEMA)
+        conn.execute(
+            "INSERT INTO reservations VALUES ('r1', 'c1', 'h1', '20260301', '20260303', NULL)"
+        )
+        conn.execute("INSERT INTO customers VALUES ('c1', 'Ann', 'Lee', 'Ann@Example.com', '')")
+        conn.commit()
+        conn.close()
+        self.assertEqual(
+            Reservation.count_active_for_hotel("h1", "2026-03-02", "2026-03-03"), 1
+        )
+        self.assertEqual(Reservation.get("r1").check_in, "2026-03-01")
+        self.assertEqual(Reservation.get("r1").status, "active")
+        self.assertEqual(Customer.find_by_email("ann@example.com").customer_id, "c1")
+        plan = self.backend._connect(data_handler.RESERVATIONS_FILE).execute(
+            "EXPLAIN QUERY PLAN SELECT check_in FROM reservations "
+            "WHERE hotel_id = ? AND status = ? AND check_in < ?", ("h1", "active", "2026-04-01"),
+        ).fetchall()
+        self.assertIn("reservations_hotel_status_check_in", str(plan))
+
+    def test_customer_emails_use_the_index(self):
+        ann = Customer.create("Ann", "Lee", "Ann@Example.com")
+        bob = Customer.create("Bob", "Ray", "bob@example.com")
+        with patch.object(self.backend, "iter", side_effect=AssertionError("scanned")):
+            with self.assertRaises(ValueError):
+                Customer.create("Ann", "Other", " ann@example.COM")
+            with self.assertLogs("models.customer", level="ERROR"):
+                self.assertIsNone(Customer.modify(bob.customer_id, email="ANN@example.com"))
+            Customer.modify(ann.customer_id, email="ann@elsewhere.com")
+            self.assertEqual(Customer.find_by_email("ANN@ELSEWHERE.COM").customer_id,
+                             ann.customer_id)
+            self.assertIsNone(Customer.find_by_email("ann@example.com"))
+
+    def test_reservations_by_customer(self):
+        hotel = Hotel.create("Table Inn", "1 Row St", 3)
+        hotel.reserve_room("c1", "2026-03-01", "2026-03-04")
+        hotel.reserve_room("c2", "2026-03-01", "2026-03-04")
+        self.assertEqual(len(Reservation.for_customer("c1")), 1)
+        self.assertEqual(len(Reservation.for_hotel(hotel.hotel_id)), 2)
+
+    def test_migrate_json(self):
+        json_backend = data_handler.JsonFileBackend()
+        json_backend.write(
+            os.path.join(self.tmp, "hotels.json"),
+            {"h1": {"hotel_id": "h1", "name": "Old", "address": "A", "total_rooms": 3}},
+        )
+        counts = migrate_json(self.tmp, self.backend)
+        self.assertEqual(counts["hotels.json"], 1)
+        self.assertEqual(Hotel.get("h1").name, "Old")
+
+
+def _book_rooms(hotel_id, attempts):
+    """Try to book the same night repeatedly; return successful bookings."""
+    hotel = Hotel.get(hotel_id)
+    booked = 0
+    for i in range(attempts):
+        try:
+            hotel.reserve_room(f"c{os.getpid()}-{i}", "2026-03-01", "2026-03-02")
+            booked += 1
+        except ValueError:
+            pass
+    return booked
+
+
+class TestMmapBackend(DataDirTestCase):
+    """Test the memory-mapped fixed-width reservation store."""
+
+    def setUp(self):
+        super().setUp()
+        self.backend = MmapBackend()
+        data_handler.set_backend(self.backend, data_handler.RESERVATIONS_FILE)
+        self.hotel = Hotel.create("Mapped Inn", "1 Page St", 2)
+        self.customer = str(uuid.uuid4())
+        self.dat = self.backend.data_path(data_handler.RESERVATIONS_FILE)
+
+    def tearDown(self):
+        data_handler.set_backend(None, data_handler.RESERVATIONS_FILE)
+        self.backend.close()
+
+    def test_hotels_keep_the_default_backend(self):
+        self.assertIs(data_handler.get_backend(data_handler.RESERVATIONS_FILE), self.backend)
+        self.assertIsNot(data_handler.get_backend(data_handler.HOTELS_FILE), self.backend)
+        self.assertTrue(os.path.exists(data_handler.HOTELS_FILE))
+
+    def test_reservation_crud(self):
+        reservation = self.hotel.reserve_room(self.customer, "2026-03-01", "2026-03-04")
+        self.assertFalse(os.path.exists(data_handler.RESERVATIONS_FILE))
+        self.assertEqual(Reservation.get(reservation.reservation_id).to_dict(), reservation.to_dict())
+        self.assertEqual(self.hotel.available_rooms("2026-03-02", "2026-03-03"), 1)
+        self.assertEqual(len(Reservation.for_customer(self.customer)), 1)
+        self.assertEqual(len(Reservation.for_hotel(self.hotel.hotel_id)), 1)
+        self.assertEqual(len(Reservation.get_all()), 1)
+        self.assertTrue(Reservation.delete(reservation.reservation_id))
+        self.assertIsNone(Reservation.get(reservation.reservation_id))
+        self.assertFalse(Reservation.delete(reservation.reservation_id))
+        self.assertEqual(Reservation.get_all(), [])
+
+    def test_cancel_patches_one_record_in_place(self):
+        first = self.hotel.reserve_room(self.customer, "2026-03-01", "2026-03-04")
+        second = self.hotel.reserve_room(self.customer, "2026-03-01", "2026-03-04")
+        size = os.path.getsize(self.dat)
+        self.assertTrue(Reservation.cancel_by_id(first.reservation_id))
+        self.assertEqual(os.path.getsize(self.dat), size)
+        self.assertEqual(Reservation.get(first.reservation_id).status, "cancelled")
+        self.assertEqual(Reservation.get(second.reservation_id).status, "active")
+        self.assertEqual(self.hotel.available_rooms("2026-03-01", "2026-03-02"), 1)
+
+    def test_other_instances_see_appends_and_patches(self):
+        reservation = self.hotel.reserve_room(self.customer, "2026-03-01", "2026-03-02")
+        other = MmapBackend()
+        self.assertIsNotNone(other.read_record(data_handler.RESERVATIONS_FILE, reservation.reservation_id))
+        later = self.hotel.reserve_room(self.customer, "2026-03-05", "2026-03-06")
+        reservation.cancel()
+        self.assertEqual(
+            other.read_record(data_handler.RESERVATIONS_FILE, reservation.reservation_id)["status"],
+            "cancelled",
+        )
+        self.assertEqual(
+            len(other.find(data_handler.RESERVATIONS_FILE, "hotel_id", self.hotel.hotel_id)), 2
+        )
+        self.assertIsNotNone(other.read_record(data_handler.RESERVATIONS_FILE, later.reservation_id))
+        other.close()
+
+    def test_rejects_records_that_do_not_fit(self):
+        with self.assertRaises(ValueError):
+            Reservation.create("c1", self.hotel.hotel_id, "2026-03-01", "2026-03-02")
+        with self.assertRaises(ValueError):
+            Reservation.create(self.customer, self.hotel.hotel_id, "not a date", "2026-03-02")
+
+    def test_deleted_slots_are_compacted(self):
+        self.backend.COMPACT_MIN = 2
+        reservations = [
+            Reservation.create(self.customer, self.hotel.hotel_id, "2026-03-01", "2026-03-02")
+            for _ in range(4)
+        ]
+        for reservation in reservations[:2]:
+            Reservation.delete(reservation.reservation_id)
+        with open(self.dat, "rb") as fh:
+            self.assertEqual(fh.read(RECORD.size)[16:24], (2).to_bytes(8, "little"))
+        self.assertEqual(
+            {r.reservation_id for r in Reservation.get_all()},
+            {r.reservation_id for r in reservations[2:]},
+        )
+
+    def test_migrate_json(self):
+        record = {
+            "reservation_id": str(uuid.uuid4()),
+            "customer_id": self.customer,
+            "hotel_id": self.hotel.hotel_id,
+            "check_in": "2026-03-01",
+            "check_out": "2026-03-02",
+            "status": "active",
+        }
+        data_handler.JsonFileBackend().write(
+            data_handler.RESERVATIONS_FILE, {record["reservation_id"]: record}
+        )
+        self.assertEqual(migrate_to_mmap(backend=self.backend), 1)
+        self.assertEqual(Reservation.get(record["reservation_id"]).to_dict(), record)
+
+
+class TestLocking(DataDirTestCase):
+    """Test atomic writes and locking around read-modify-write cycles."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "hotels.json")
+
+    def test_concurrent_threads_keep_every_write(self):
+        def worker(n):
+            for i in range(20):
+                data_handler.put_record(self.path, f"{n}-{i}", {"n": n})
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        data_handler.invalidate_cache()
+        self.assertEqual(len(data_handler.load_json(self.path)), 80)
+
+    def test_concurrent_processes_do_not_overbook(self):
+        hotel = Hotel.create("Busy Inn", "1 Rush St", 5)
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(4) as pool:
+            booked = pool.starmap(_book_rooms, [(hotel.hotel_id, 4)] * 4)
+        self.assertEqual(sum(booked), 5)
+        data_handler.invalidate_cache()
+        self.assertEqual(hotel.available_rooms("2026-03-01", "2026-03-02"), 0)
+
+    def test_write_leaves_no_temp_files(self):
+        data_handler.save_json(self.path, {"h1": {"name": "A"}})
+        leftovers = [name for name in os.listdir(self.tmp) if name.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+    def test_lock_stats(self):
+        data_handler.reset_lock_stats()
+        with data_handler.locked(self.path):
+            data_handler.put_record(self.path, "h1", {"name": "A"})
+        stats = data_handler.lock_stats()
+        self.assertEqual(stats["acquisitions"], 1)
+        self.assertGreaterEqual(stats["wait_max"], 0.0)
+
+
+class TestWriteBehind(DataDirTestCase):
+    """Test batching and the background write-behind flusher."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "hotels.json")
+
+    def tearDown(self):
+        data_handler.disable_write_behind()
+
+    def _on_disk(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def test_batch_writes_once(self):
+        with patch.object(data_handler.JsonFileBackend, "write", autospec=True,
+                          side_effect=data_handler.JsonFileBackend.write) as writes:
+            with data_handler.batch():
+                for i in range(10):
+                    data_handler.put_record(self.path, f"h{i}", {"n": i})
+                self.assertEqual(len(data_handler.load_json(self.path)), 10)
+                self.assertEqual(self._on_disk(), {})
+        self.assertEqual(writes.call_count, 1)
+        self.assertEqual(len(self._on_disk()), 10)
+
+    def _put_from_other_process(self, key):
+        code = (
+            "import sys\n"
+            "from models import data_handler\n"
+            "data_handler.put_record(sys.argv[1], sys.argv[2], {'n': 0})\n"
+        )
+        env = {k: v for k, v in os.environ.items() if not k.startswith("HOTEL_")}
+        subprocess.run(
+            [sys.executable, "-c", code, self.path, key],
+            cwd=os.path.join(os.path.dirname(__file__), "..", "src"), env=env, check=True,
+        )
+
+    def test_batch_keeps_writes_from_other_processes(self):
+        data_handler.put_record(self.path, "h0", {"n": 0})
+        with data_handler.batch():
+            data_handler.put_record(self.path, "h1", {"n": 1})
+            data_handler.delete_record(self.path, "h0")
+            self._put_from_other_process("other")
+        self.assertEqual(self._on_disk(), {"h1": {"n": 1}, "other": {"n": 0}})
+        self.assertEqual(
+            data_handler.load_json(self.path), {"h1": {"n": 1}, "other": {"n": 0}}
+        )
+
+    def test_explicit_flush(self):
+        data_handler.enable_write_behind(interval=60, max_dirty=100)
+        data_handler.put_record(self.path, "h1", {"n": 1})
+        data_handler.delete_record(self.path, "h1")
+        data_handler.put_record(self.path, "h2", {"n": 2})
+        self.assertEqual(self._on_disk(), {})
+        data_handler.flush()
+        self.assertEqual(self._on_disk(), {"h2": {"n": 2}})
+
+    def test_write_behind_reads_merge_other_processes(self):
+        data_handler.enable_write_behind(interval=60)
+        data_handler.put_record(self.path, "h1", {"n": 1})
+        self._put_from_other_process("other")
+        self.assertEqual(
+            data_handler.load_json(self.path), {"h1": {"n": 1}, "other": {"n": 0}}
+        )
+        data_handler.flush()
+        self.assertEqual(self._on_disk(), {"h1": {"n": 1}, "other": {"n": 0}})
+
+    def test_bookings_are_written_before_the_lock_is_released(self):
+        hotel = Hotel.create("Busy Inn", "1 Rush St", 1)
+        data_handler.enable_write_behind(interval=60)
+        reservation = hotel.reserve_room("c1", "2026-03-01", "2026-03-02")
+        with open(data_handler.RESERVATIONS_FILE, encoding="utf-8") as fh:
+            self.assertIn(reservation.reservation_id, json.load(fh))
+        self.assertEqual(data_handler.write_behind_stats()["dirty"], 0)
+
+    def test_dirty_threshold_wakes_flusher(self):
+        data_handler.enable_write_behind(interval=60, max_dirty=3)
+        for i in range(3):
+            data_handler.put_record(self.path, f"h{i}", {"n": i})
+        deadline = time.time() + 5
+        while len(self._on_disk()) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self._on_disk()), 3)
+
+    def test_disable_flushes_pending(self):
+        data_handler.enable_write_behind(interval=60)
+        data_handler.put_record(self.path, "h1", {"n": 1})
+        data_handler.disable_write_behind()
+        self.assertEqual(self._on_disk(), {"h1": {"n": 1}})
+        self.assertFalse(data_handler.write_behind_stats()["enabled"])
+
+
+class TestSharding(DataDirTestCase):
+    """Test splitting collections into shard files by hotel_id."""
+
+    def setUp(self):
+        super().setUp()
+        shards = patch.dict(data_handler._SHARDS, clear=True)
+        shards.start()
+        self.addCleanup(shards.stop)
+        self.hotels = [Hotel.create(f"Hotel {i}", "1 St", 2) for i in range(6)]
+
+    def tearDown(self):
+        data_handler.invalidate_cache()
+
+    def _book_all(self):
+        return [
+            hotel.reserve_room("c1", "2026-03-01", "2026-03-03") for hotel in self.hotels
+        ]
+
+    def test_records_go_to_the_shard_of_their_hotel(self):
+        data_handler.set_shards(data_handler.RESERVATIONS_FILE, 4)
+        reservations = self._book_all()
+        self.assertFalse(os.path.exists(data_handler.RESERVATIONS_FILE))
+        for reservation in reservations:
+            path = data_handler.shard_for(data_handler.RESERVATIONS_FILE, reservation.hotel_id)
+            with open(path, encoding="utf-8") as fh:
+                self.assertIn(reservation.reservation_id, json.load(fh))
+        self.assertEqual(len(Reservation.get_all()), 6)
+
+    def test_crud_and_queries_across_shards(self):
+        data_handler.set_shards(data_handler.RESERVATIONS_FILE, 4)
+        reservations = self._book_all()
+        hotel = self.hotels[0]
+        hotel.reserve_room("c2", "2026-03-02", "2026-03-04")
+        with self.assertRaises(ValueError):
+            hotel.reserve_room("c3", "2026-03-02", "2026-03-03")
+        self.assertEqual(len(Reservation.for_customer("c1")), 6)
+        self.assertEqual(len(Reservation.for_hotel(hotel.hotel_id)), 2)
+        first = Reservation.get(reservations[0].reservation_id)
+        self.assertTrue(first.cancel())
+        self.assertEqual(hotel.available_rooms("2026-03-01", "2026-03-02"), 2)
+        self.assertEqual(hotel.available_rooms("2026-03-02", "2026-03-03"), 1)
+        self.assertTrue(Reservation.delete(reservations[1].reservation_id))
+        self.assertIsNone(Reservation.get(reservations[1].reservation_id))
+        self.assertEqual(len(Reservation.get_all()), 6)
+        free = {h.hotel_id: n for h, n in Hotel.search_available("2026-03-02", "2026-03-03")}
+        self.assertEqual(free[hotel.hotel_id], 1)
+        self.assertEqual(free[self.hotels[1].hotel_id], 2)
+        self.assertEqual(len(free), len(self.hotels))
+
+    def test_set_shards_moves_existing_records(self):
+        reservations = self._book_all()
+        data_handler.set_shards(data_handler.RESERVATIONS_FILE, 3)
+        with open(data_handler.RESERVATIONS_FILE, encoding="utf-8") as fh:
+            self.assertEqual(json.load(fh), {})
+        data_handler.invalidate_cache()
+        self.assertEqual(
+            {r.reservation_id for r in Reservation.get_all()},
+            {r.reservation_id for r in reservations},
+        )
+        data_handler.set_shards(data_handler.RESERVATIONS_FILE, 1)
+        for path in data_handler.shard_paths(data_handler.RESERVATIONS_FILE):
+            self.assertEqual(path, data_handler.RESERVATIONS_FILE)
+        self.assertEqual(len(data_handler.load_json(data_handler.RESERVATIONS_FILE)), 6)
+
+    def test_hotels_can_be_sharded_by_their_own_id(self):
+        data_handler.set_shards(data_handler.HOTELS_FILE, 2)
+        hotel = Hotel.create("Sharded", "2 St", 5)
+        self.assertIsNotNone(Hotel.get(hotel.hotel_id))
+        self.assertTrue(Hotel.modify(hotel.hotel_id, name="Renamed"))
+        self.assertEqual(Hotel.get(hotel.hotel_id).name, "Renamed")
+        self.assertEqual(len(Hotel.get_all()), 7)
+
+    def test_layout_is_shared_with_other_processes(self):
+        self._book_all()
+        data_handler.set_shards(data_handler.RESERVATIONS_FILE, 3)
+        with open(data_handler.manifest_path(data_handler.RESERVATIONS_FILE)) as fh:
+            self.assertEqual(json.load(fh), {"count": 3})
+        code = (
+            "from models import Reservation, data_handler\n"
+            "print(len(data_handler.shard_paths(data_handler.RESERVATIONS_FILE)),"
+            " len(Reservation.get_all()))\n"
+        )
+        env = {k: v for k, v in os.environ.items() if not k.startswith("HOTEL_")}
+        result = subprocess.run(
+            [sys.executable, "-c", code], env=dict(env, HOTEL_DATA_DIR=self.tmp),
+            cwd=os.path.join(os.path.dirname(__file__), "..", "src"),
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.split(), ["3", "6"])
+
+    def test_env_only_shards_empty_collections(self):
+        self._book_all()
+        with self.assertLogs("models.data_handler", level="ERROR"):
+            data_handler._shards_from_env("4")
+        self.assertEqual(data_handler.shard_paths(data_handler.RESERVATIONS_FILE),
+                         [data_handler.RESERVATIONS_FILE])
+        data_handler._shards_from_env("customers=2")
+        self.assertEqual(len(data_handler.shard_paths(data_handler.CUSTOMERS_FILE)), 2)
+
+    def test_cold_scan_parses_shards_in_worker_processes(self):
+        data_handler.set_shards(data_handler.RESERVATIONS_FILE, 4)
+        self._book_all()
+        data_handler.invalidate_cache()
+        with patch.object(data_handler, "PARALLEL_MIN_BYTES", 0):
+            self.assertEqual(len(Reservation.get_all()), 6)
+        self.assertIsNotNone(data_handler._SHARD_POOL["executor"])
+
+
+class TestSerialization(DataDirTestCase):
+    """Test the on-disk codecs and their detection on read."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "hotels.json")
+        self.data = {"h1": {"name": "Grand", "rooms": 10}, "h2": {"name": "Inn", "rooms": 2}}
+
+    def tearDown(self):
+        data_handler.set_backend(data_handler.JsonFileBackend())
+
+    def _read_raw(self):
+        with open(self.path, "rb") as fh:
+            return fh.read()
+
+    def test_default_writes_compact_json(self):
+        data_handler.save_json(self.path, self.data)
+        raw = self._read_raw()
+        self.assertNotIn(b"\n", raw)
+        self.assertEqual(json.loads(raw), self.data)
+
+    def test_binary_snapshot_is_detected_on_read(self):
+        data_handler.set_backend(data_handler.JsonFileBackend(codec="marshal"))
+        data_handler.save_json(self.path, self.data)
+        self.assertTrue(self._read_raw().startswith(serialization.MAGIC + b"marshal"))
+        # A backend configured for JSON still reads the marshal file.
+        data_handler.set_backend(data_handler.JsonFileBackend())
+        self.assertEqual(data_handler.load_json(self.path), self.data)
+        self.assertEqual(dict(data_handler.iter_records(self.path)), self.data)
+
+    def test_compressed_json_is_detected_on_read(self):
+        for codec, magic in (("json-gzip", b"\x1f\x8b"), ("json-lzma", b"\xfd7zXZ")):
+            data_handler.set_backend(data_handler.JsonFileBackend(codec=codec))
+            data_handler.save_json(self.path, self.data)
+            self.assertTrue(self._read_raw().startswith(magic))
+            data_handler.set_backend(data_handler.JsonFileBackend())
+            data_handler.invalidate_cache()
+            self.assertEqual(data_handler.load_json(self.path), self.data)
+
+    def test_wal_snapshot_uses_codec(self):
+        backend = WalBackend(compact_every=2, fsync=False, codec="marshal")
+        data_handler.set_backend(backend)
+        data_handler.put_record(self.path, "h1", self.data["h1"])
+        data_handler.put_record(self.path, "h2", self.data["h2"])
+        self.assertTrue(self._read_raw().startswith(serialization.MAGIC))
+        data_handler.invalidate_cache()
+        self.assertEqual(data_handler.load_json(self.path), self.data)
+
+    @unittest.skipIf(serialization.optional("msgpack") is None, "msgpack is not installed")
+    def test_msgpack_round_trip(self):
+        data_handler.set_backend(data_handler.JsonFileBackend(codec="msgpack"))
+        data_handler.save_json(self.path, self.data)
+        data_handler.invalidate_cache()
+        self.assertEqual(data_handler.load_json(self.path), self.data)
+
+    def test_unknown_codec_is_rejected(self):
+        with self.assertRaises(ValueError):
+            serialization.get_codec("yaml")
+
+    def test_corrupt_binary_file_loads_empty(self):
+        with open(self.path, "wb") as fh:
+            fh.write(serialization.MAGIC + b"marshal\n\xff\x00")
+        with self.assertLogs("models.data_handler", level="ERROR"):
+            self.assertEqual(data_handler.load_json(self.path), {})
+
+    def test_export_file_writes_indented_json(self):
+        data_handler.set_backend(data_handler.JsonFileBackend(codec="marshal"))
+        data_handler.save_json(self.path, self.data)
+        out = os.path.join(self.tmp, "export", "hotels.json")
+        os.makedirs(os.path.dirname(out))
+        self.assertEqual(data_handler.export_file(self.path, out), 2)
+        with open(out, encoding="utf-8") as fh:
+            text = fh.read()
+        self.assertIn('\n  "h1": {', text)
+        self.assertEqual(json.loads(text), self.data)
@@ -1,39 +1,19 @@
 import sys
 import os
-import tempfile
-import unittest
+import csv
+import io
+import json
 from unittest.mock import patch
 from datetime import date
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
 from models import Hotel
 import models
 
-def _patch_data_dir(tmp_dir):
-    """Return a dict of patches to redirect all data files to tmp_dir."""
-    return {
-        "models.data_handler.HOTELS_FILE": os.path.join(tmp_dir, "hotels.json"),
-        "models.data_handler.CUSTOMERS_FILE": os.path.join(tmp_dir, "customers.json"),
-        "models.data_handler.RESERVATIONS_FILE": os.path.join(tmp_dir, "reservations.json"),
-        "models.data_handler.DATA_DIR": tmp_dir,
-    }
-
-class TestHotel(unittest.TestCase):
+class TestHotel(DataDirTestCase):
     """Test Hotel create / read / update / delete operations."""
 
-    def setUp(self):
-        self.tmp = tempfile.mkdtemp()
-        self.patches = _patch_data_dir(self.tmp)
-        self.patchers = [
-            patch(target, new_val) for target, new_val in self.patches.items()
-        ]
-        for p in self.patchers:
-            p.start()
-
-    def tearDown(self):
-        for p in self.patchers:
-            p.stop()
-
     def test_create_hotel(self):
         hotel = Hotel.create("Grand Inn", "123 Main St", 50, "555-0000")
         self.assertIsInstance(hotel, Hotel)
@@ -100,6 +80,118 @@ class TestHotel(unittest.TestCase):
         self.assertEqual(d["name"], "Test")
         self.assertEqual(d["total_rooms"], 10)
 
+    def test_reserve_room_until_full(self):
+        hotel = Hotel.create("Tiny Inn", "1 Small St", 2)
+        hotel.reserve_room("c1", date(2026, 3, 1), date(2026, 3, 5))
+        hotel.reserve_room("c2", date(2026, 3, 3), date(2026, 3, 6))
+        with self.assertRaises(ValueError):
+            hotel.reserve_room("c3", date(2026, 3, 4), date(2026, 3, 5))
+
+    def test_reserve_room_other_dates_still_free(self):
+        hotel = Hotel.create("Tiny Inn", "1 Small St", 1)
+        hotel.reserve_room("c1", date(2026, 3, 1), date(2026, 3, 5))
+        hotel.reserve_room("c2", date(2026, 3, 5), date(2026, 3, 8))
+        self.assertEqual(hotel.available_rooms(date(2026, 3, 8), date(2026, 3, 9)), 1)
+        self.assertEqual(hotel.available_rooms(date(2026, 2, 27), date(2026, 3, 2)), 0)
+
+    def test_cancel_reservation_frees_room(self):
+        hotel = Hotel.create("Tiny Inn", "1 Small St", 1)
+        reservation = hotel.reserve_room("c1", "2026-03-01", "2026-03-05")
+        self.assertTrue(hotel.cancel_reservation(reservation.reservation_id))
+        self.assertEqual(hotel.available_rooms("2026-03-01", "2026-03-05"), 1)
+        self.assertEqual(hotel.available_rooms(), 1)
+
+    def test_reserve_room_invalid_dates(self):
+        hotel = Hotel.create("Tiny Inn", "1 Small St", 1)
+        with self.assertRaises(ValueError):
+            hotel.reserve_room("c1", date(2026, 3, 5), date(2026, 3, 5))
+
+    def test_search_available_filters_and_sorts(self):
+        small = Hotel.create("Alpha", "1 St", 2)
+        large = Hotel.create("Bravo", "2 St", 5)
+        full = Hotel.create("Charlie", "3 St", 1)
+        small.reserve_room("c1", "2026-03-02", "2026-03-04")
+        full.reserve_room("c2", "2026-03-01", "2026-03-02")
+        large.reserve_room("c3", "2026-03-10", "2026-03-12")
+        results = Hotel.search_available("2026-03-01", "2026-03-05")
+        self.assertEqual(
+            [(h.name, free) for h, free in results], [("Bravo", 5), ("Alpha", 1)]
+        )
+        results = Hotel.search_available("2026-03-01", "2026-03-05", min_rooms=2)
+        self.assertEqual([h.name for h, _ in results], ["Bravo"])
+        results = Hotel.search_available("2026-03-02", "2026-03-03", sort="name")
+        self.assertEqual([h.name for h, _ in results], ["Alpha", "Bravo", "Charlie"])
+
+    def test_search_available_pages(self):
+        for i in range(5):
+            Hotel.create(f"Hotel {i}", "1 St", 10 + i)
+        first = Hotel.search_available("2026-03-01", "2026-03-02", limit=2)
+        rest = Hotel.search_available("2026-03-01", "2026-03-02", offset=2)
+        self.assertEqual([free for _, free in first], [14, 13])
+        self.assertEqual([free for _, free in rest], [12, 11, 10])
+
+    def test_search_available_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Hotel.search_available("2026-03-02", "2026-03-01")
+        with self.assertRaises(ValueError):
+            Hotel.search_available("2026-03-01", "2026-03-02", sort="price")
+        with self.assertRaises(ValueError):
+            Hotel.search_available("2026-03-01", "2026-03-02", limit=-1)
+
+    def test_bulk_create_reports_errors(self):
+        hotels, errors = Hotel.bulk_create([
+            {"name": "A", "address": "Addr A", "total_rooms": 10},
+            {"name": "B", "address": "Addr B", "total_rooms": 0},
+            {"name": "C"},
+            {"name": "D", "address": "Addr D", "total_rooms": 5},
+        ])
+        self.assertEqual([h.name for h in hotels], ["A", "D"])
+        self.assertEqual([position for position, _ in errors], [1, 2])
+        self.assertEqual(len(Hotel.get_all()), 2)
+
+    def test_bulk_create_rejects_existing_and_repeated_ids(self):
+        hotels, _ = Hotel.bulk_create([{"name": "A", "address": "1 St", "total_rooms": 1}])
+        existing = hotels[0].hotel_id
+        hotels, errors = Hotel.bulk_create([
+            {"hotel_id": existing, "name": "Clobber", "address": "1 St", "total_rooms": 1},
+            {"hotel_id": "h2", "name": "B", "address": "2 St", "total_rooms": 1},
+            {"hotel_id": "h2", "name": "B again", "address": "2 St", "total_rooms": 1},
+        ])
+        self.assertEqual([h.hotel_id for h in hotels], ["h2"])
+        self.assertEqual([position for position, _ in errors], [0, 2])
+        self.assertIn("already exists", errors[0][1])
+        self.assertIn("repeated", errors[1][1])
+        self.assertEqual(Hotel.get(existing).name, "A")
+        self.assertEqual(Hotel.get("h2").name, "B")
+
+    def test_bulk_modify_and_delete(self):
+        hotels, _ = Hotel.bulk_create([
+            {"name": "A", "address": "Addr A", "total_rooms": 10},
+            {"name": "B", "address": "Addr B", "total_rooms": 20},
+        ])
+        ids = [h.hotel_id for h in hotels]
+        updated, errors = Hotel.bulk_modify({
+            ids[0]: {"name": "A2"},
+            ids[1]: {"total_rooms": -1},
+            "fake-id": {"name": "X"},
+        })
+        self.assertEqual([h.name for h in updated], ["A2"])
+        self.assertEqual(len(errors), 2)
+        deleted, errors = Hotel.bulk_delete([ids[0], "fake-id"])
+        self.assertEqual(deleted, [ids[0]])
+        self.assertEqual(errors, [("fake-id", "not found")])
+        self.assertEqual(Hotel.get(ids[1]).total_rooms, 20)
+
+    def test_export_csv_and_jsonl(self):
+        Hotel.create("Export Inn", "1 Out St", 3, "555")
+        out = io.StringIO()
+        self.assertEqual(Hotel.export(out, fmt="csv"), 1)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0]["name"], "Export Inn")
+        out = io.StringIO()
+        Hotel.export(out)
+        self.assertEqual(json.loads(out.getvalue())["total_rooms"], 3)
+
     # def test_get_all_skips_invalid_records(self):
     #     """Invalid records in file should be skipped with error printed."""
     #     hotels_file = os.path.join(self.tmp, "hotels.json")
@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import logging
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Hotel, data_handler, instrumentation
+
+class TestInstrumentation(DataDirTestCase):
+    """Test counters, histograms, exports and profiling hooks."""
+
+    def setUp(self):
+        super().setUp()
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.set_enabled(True)
+
+    def test_crud_calls_are_counted_and_timed(self):
+        hotel = Hotel.create("Grand", "1 St", 10)
+        Hotel.get(hotel.hotel_id)
+        Hotel.get(hotel.hotel_id)
+        operations = instrumentation.stats()["operations"]
+        self.assertEqual(operations["Hotel.create"]["calls"], 1)
+        self.assertEqual(operations["Hotel.get"]["calls"], 2)
+        self.assertEqual(operations["Hotel.get"]["buckets"]["+Inf"], 2)
+        self.assertGreater(operations["put_record"]["total_seconds"], 0)
+        self.assertNotIn("Hotel.from_dict", operations)
+
+    def test_errors_are_counted(self):
+        hotel = Hotel.create("Tiny", "1 St", 1)
+        hotel.reserve_room("c1", "2026-03-01", "2026-03-02")
+        with self.assertRaises(ValueError):
+            hotel.reserve_room("c2", "2026-03-01", "2026-03-02")
+        timing = instrumentation.stats()["operations"]["Hotel.reserve_room"]
+        self.assertEqual((timing["calls"], timing["errors"]), (2, 1))
+
+    def test_generator_counts_one_call_per_scan(self):
+        for i in range(3):
+            Hotel.create(f"Hotel {i}", "1 St", 10)
+        data_handler.invalidate_cache()
+        self.assertEqual(len(Hotel.get_all()), 3)
+        operations = instrumentation.stats()["operations"]
+        self.assertEqual(operations["Hotel.iter_all"]["calls"], 1)
+        self.assertEqual(instrumentation.stats()["records"], {"Hotel.iter_all": 3})
+        scan = Hotel.iter_all()
+        next(scan)
+        scan.close()
+        self.assertEqual(instrumentation.stats()["records"], {"Hotel.iter_all": 4})
+
+    def test_bytes_read_and_written(self):
+        Hotel.create("Grand", "1 St", 10)
+        data_handler.invalidate_cache()
+        data_handler.load_json(data_handler.HOTELS_FILE)
+        size = os.path.getsize(data_handler.HOTELS_FILE)
+        stats = instrumentation.stats()
+        self.assertEqual(stats["bytes_written"]["hotels.json"], size)
+        self.assertEqual(stats["bytes_read"]["hotels.json"], size)
+
+    def test_disabled_records_nothing(self):
+        instrumentation.set_enabled(False)
+        Hotel.create("Grand", "1 St", 10)
+        self.assertEqual(instrumentation.stats()["operations"], {})
+
+    def test_disabled_leaves_functions_unwrapped(self):
+        def lookup(key):
+            return key
+
+        instrumentation.set_enabled(False)
+        self.assertIs(instrumentation.timed(lookup), lookup)
+        self.assertIs(instrumentation.timed(name="lookup")(lookup), lookup)
+
+    def test_prometheus_text(self):
+        Hotel.create("Grand", "1 St", 10)
+        text = instrumentation.prometheus_text()
+        self.assertIn("# TYPE hotel_operation_seconds histogram", text)
+        self.assertIn('hotel_operation_seconds_count{op="Hotel.create"} 1', text)
+        self.assertIn('hotel_operation_seconds_bucket{op="Hotel.create",le="+Inf"} 1', text)
+        self.assertIn('hotel_bytes_written_total{file="hotels.json"}', text)
+        Hotel.get_all()
+        text = instrumentation.prometheus_text()
+        self.assertIn('hotel_records_total{op="Hotel.iter_all"} 1', text)
+
+    def test_json_log_format_keeps_extra_fields(self):
+        record = logging.LogRecord(
+            "models.hotel", logging.ERROR, __file__, 1, "Error reading hotel %s", ("h1",), None
+        )
+        record.record_id = "h1"
+        entry = json.loads(instrumentation.JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "Error reading hotel h1")
+        self.assertEqual(entry["record_id"], "h1")
+        self.assertEqual(entry["level"], "ERROR")
+
+    def test_profiling_writes_reports(self):
+        out = os.path.join(self.tmp, "profile")
+        instrumentation.start_profiling(("cprofile", "tracemalloc"), out)
+        Hotel.create("Grand", "1 St", 10)
+        written = instrumentation.stop_profiling()
+        self.assertEqual(written, [out + ".prof", out + ".tracemalloc.txt"])
+        for path in written:
+            self.assertGreater(os.path.getsize(path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
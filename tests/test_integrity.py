@@ -0,0 +1,195 @@
+import sys
+import os
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+import main
+from models import Customer, Hotel, Reservation, changefeed, data_handler
+from models import integrity
+
+class TestIntegrity(DataDirTestCase):
+    """Test the integrity checker, its repairs and the check command."""
+
+    def setUp(self):
+        super().setUp()
+        self.hotel = Hotel.create("Grand", "1 St", 1)
+        self.customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+
+    def tearDown(self):
+        data_handler.invalidate_cache()
+
+    def _kinds(self, report):
+        return sorted((p["kind"], p["id"]) for p in report["problems"])
+
+    def _put(self, filepath, key, record):
+        data_handler.put_record(filepath, key, record)
+
+    def test_clean_data_passes(self):
+        self.hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+        report = integrity.check()
+        self.assertTrue(report["ok"])
+        self.assertEqual(report["checked"], {"hotels": 1, "customers": 1, "reservations": 1})
+        self.assertEqual(report["problems"], [])
+
+    def test_deleted_hotel_and_customer_leave_orphans(self):
+        kept = Hotel.create("Kept", "2 St", 5)
+        orphan = kept.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+        other = self.hotel.reserve_room(self.customer.customer_id, "2026-04-01", "2026-04-03")
+        Customer.delete(self.customer.customer_id)
+        Hotel.delete(self.hotel.hotel_id)
+        report = integrity.check()
+        self.assertEqual(self._kinds(report), sorted([
+            ("missing_customer", orphan.reservation_id),
+            ("missing_customer", other.reservation_id),
+            ("missing_hotel", other.reservation_id),
+        ]))
+        self.assertEqual(report["unresolved"], 3)
+
+    def test_repair_cancels_orphaned_reservations(self):
+        reservation = self.hotel.reserve_room(
+            self.customer.customer_id, "2026-03-01", "2026-03-03"
+        )
+        Hotel.delete(self.hotel.hotel_id)
+        offset = changefeed.end_offset()
+        report = integrity.check(repair=True)
+        self.assertEqual([p["action"] for p in report["problems"]], ["cancelled"])
+        self.assertEqual(report["unresolved"], 0)
+        data_handler.invalidate_cache()
+        self.assertEqual(Reservation.get(reservation.reservation_id).status, "cancelled")
+        events = [e for _, e in changefeed.tail(offset)]
+        self.assertEqual([e["op"] for e in events], ["cancel"])
+
+    def test_invalid_records_and_bad_dates(self):
+        self._put(data_handler.HOTELS_FILE, "h-bad", {"hotel_id": "h-bad", "name": "X"})
+        self._put(data_handler.CUSTOMERS_FILE, "c-key", {
+            "customer_id": "other", "first_name": "A", "last_name": "B", "email": "b@example.com",
+        })
+        base = {"customer_id": self.customer.customer_id, "hotel_id": self.hotel.hotel_id}
+        self._put(data_handler.RESERVATIONS_FILE, "r-date", dict(
+            base, reservation_id="r-date", check_in="2026-13-01", check_out="2026-03-02",
+        ))
+        self._put(data_handler.RESERVATIONS_FILE, "r-order", dict(
+            base, reservation_id="r-order", check_in="2026-03-02", check_out="2026-03-02",
+        ))
+        self._put(data_handler.RESERVATIONS_FILE, "r-status", dict(
+            base, reservation_id="r-status", check_in="2026-05-01", check_out="2026-05-02",
+            status="maybe",
+        ))
+        report = integrity.check()
+        self.assertEqual(self._kinds(report), [
+            ("bad_dates", "r-date"), ("bad_dates", "r-order"),
+            ("invalid", "h-bad"), ("invalid", "r-status"), ("key_mismatch", "c-key"),
+        ])
+
+    def test_quarantine_moves_bad_records_aside(self):
+        record = {"hotel_id": "h-bad", "name": "X", "address": "Y", "total_rooms": 0}
+        self._put(data_handler.HOTELS_FILE, "h-bad", record)
+        report = integrity.check(quarantine=True)
+        self.assertEqual([p["action"] for p in report["problems"]], ["quarantined"])
+        data_handler.invalidate_cache()
+        self.assertIsNone(data_handler.get_record(data_handler.HOTELS_FILE, "h-bad"))
+        with open(integrity.quarantine_path("hotels"), encoding="utf-8") as fh:
+            held = json.load(fh)
+        self.assertEqual(held["h-bad"]["record"], record)
+        self.assertEqual(held["h-bad"]["problems"], ["invalid"])
+        self.assertTrue(integrity.check()["ok"])
+
+    def test_overlapping_stays_over_capacity(self):
+        first = Reservation.create(
+            self.customer.customer_id, self.hotel.hotel_id, "2026-03-01", "2026-03-04"
+        )
+        second = Reservation.create(
+            self.customer.customer_id, self.hotel.hotel_id, "2026-03-03", "2026-03-05"
+        )
+        # Back to back with the first stay: no overlap.
+        Reservation.create(
+            self.customer.customer_id, self.hotel.hotel_id, "2026-02-27", "2026-03-01"
+        )
+        report = integrity.check(repair=True)
+        [problem] = report["problems"]
+        self.assertEqual(problem["kind"], "overbooked")
+        self.assertEqual(problem["id"], self.hotel.hotel_id)
+        self.assertEqual((problem["peak"], problem["night"]), (2, "2026-03-03"))
+        self.assertEqual(
+            problem["reservations"], sorted([first.reservation_id, second.reservation_id])
+        )
+        self.assertIsNone(problem["action"])
+        second.cancel()
+        self.assertTrue(integrity.check()["ok"])
+
+    def test_duplicate_emails(self):
+        self._put(data_handler.CUSTOMERS_FILE, "c-dup", {
+            "customer_id": "c-dup", "first_name": "A", "last_name": "L",
+            "email": " ADA@example.com",
+        })
+        [problem] = integrity.check()["problems"]
+        self.assertEqual(problem["kind"], "duplicate_email")
+        self.assertEqual(problem["customers"], sorted(["c-dup", self.customer.customer_id]))
+
+    def test_misnamed_file_is_flagged_and_moved(self):
+        self.assertFalse(os.path.exists(data_handler.RESERVATIONS_FILE))
+        record = {
+            "reservation_id": "r1", "customer_id": self.customer.customer_id,
+            "hotel_id": self.hotel.hotel_id, "check_in": "2026-03-01",
+            "check_out": "2026-03-02", "status": "active",
+        }
+        path = os.path.join(self.tmp, "reservation.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"r1": record}, fh)
+        report = integrity.check()
+        self.assertEqual(self._kinds(report), [("misnamed_file", "reservation.json")])
+        report = integrity.check(repair=True)
+        self.assertEqual(report["problems"][0]["action"], "moved")
+        self.assertEqual(report["checked"]["reservations"], 1)
+        self.assertFalse(os.path.exists(path))
+        data_handler.invalidate_cache()
+        self.assertEqual(data_handler.get_record(data_handler.RESERVATIONS_FILE, "r1"), record)
+
+    def test_misnamed_file_not_moved_over_existing_records(self):
+        self.hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+        path = os.path.join(self.tmp, "Reservations.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({}, fh)
+        with self.assertLogs("models.integrity", level="ERROR"):
+            report = integrity.check(repair=True)
+        self.assertIsNone(report["problems"][0]["action"])
+        self.assertTrue(os.path.exists(path))
+
+    def test_backend_files_are_not_misnamed(self):
+        for name in ("hotel.db", "hotel.db-journal", "hotels.json.log",
+                     "reservation.shard-00.json", "reservations.shards.json"):
+            with open(os.path.join(self.tmp, name), "w", encoding="utf-8") as fh:
+                fh.write("{}")
+        self.assertEqual(integrity.misnamed_files(), [])
+
+    def test_process_pool_matches_single_process(self):
+        Hotel.delete(self.hotel.hotel_id)
+        for i in range(5):
+            Reservation.create(self.customer.customer_id, self.hotel.hotel_id,
+                               "2026-03-01", "2026-03-02")
+        single = integrity.check(workers=1, chunk_size=2)
+        pooled = integrity.check(workers=2, chunk_size=2)
+        self.assertEqual(pooled["workers"], 2)
+        self.assertEqual(self._kinds(pooled), self._kinds(single))
+        self.assertEqual(len(pooled["problems"]), 5)
+
+    def test_check_command(self):
+        Hotel.delete(self.hotel.hotel_id)
+        Reservation.create(self.customer.customer_id, self.hotel.hotel_id,
+                           "2026-03-01", "2026-03-02")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(main.main(["--json", "check"]), 1)
+        self.assertEqual(json.loads(out.getvalue())["summary"], {"missing_hotel": 1})
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(main.main(["check", "--repair"]), 0)
+        self.assertIn("[cancelled]", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import sys
+import os
+import io
+import json
+import subprocess
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC)
+from helpers import DataDirTestCase
+import main
+from models import Hotel, Customer, Reservation
+
+class TestMain(DataDirTestCase):
+    """Test the command line interface."""
+
+    def setUp(self):
+        super().setUp()
+        self.hotel = Hotel.create("Grand", "1 St", 1)
+        self.customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+
+    def run_main(self, *argv):
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            status = main.main(list(argv))
+        return status, out.getvalue(), err.getvalue()
+
+    def test_hotel_show(self):
+        status, out, _ = self.run_main("hotel", "show", self.hotel.hotel_id)
+        self.assertEqual(status, 0)
+        self.assertIn("Name       : Grand", out)
+
+    def test_show_missing_record_fails(self):
+        status, out, err = self.run_main("customer", "show", "missing")
+        self.assertEqual((status, out), (1, ""))
+        self.assertIn("customer missing not found", err)
+
+    def test_reserve_and_cancel(self):
+        args = (self.hotel.hotel_id, self.customer.customer_id, "2026-03-01", "2026-03-03")
+        status, out, _ = self.run_main("reserve", *args)
+        self.assertEqual(status, 0)
+        reservation_id = out.strip()
+        self.assertEqual(Reservation.get(reservation_id).status, "active")
+
+        status, _, err = self.run_main("reserve", *args)
+        self.assertEqual(status, 1)
+        self.assertIn("No available rooms", err)
+
+        status, out, _ = self.run_main("--json", "cancel", reservation_id)
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(out)["status"], "cancelled")
+        self.assertEqual(Reservation.get(reservation_id).status, "cancelled")
+
+    def test_reserve_unknown_customer_fails(self):
+        status, _, err = self.run_main(
+            "reserve", self.hotel.hotel_id, "missing", "2026-03-01", "2026-03-03"
+        )
+        self.assertEqual(status, 1)
+        self.assertIn("customer missing not found", err)
+        self.assertEqual(Reservation.get_all(), [])
+
+    def test_list_defaults_to_hotels(self):
+        Hotel.create("Annex", "2 St", 5)
+        status, out, _ = self.run_main("--json")
+        self.assertEqual(status, 0)
+        names = sorted(json.loads(line)["name"] for line in out.splitlines())
+        self.assertEqual(names, ["Annex", "Grand"])
+
+    def test_list_reservations_of_hotel(self):
+        other = Hotel.create("Annex", "2 St", 5)
+        self.hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-02")
+        other.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-02")
+        status, out, _ = self.run_main(
+            "--json", "list", "reservations", "--hotel", other.hotel_id
+        )
+        self.assertEqual(status, 0)
+        hotels = [json.loads(line)["hotel_id"] for line in out.splitlines()]
+        self.assertEqual(hotels, [other.hotel_id])
+
+    def test_export(self):
+        out_dir = os.path.join(self.tmp, "export")
+        status, out, _ = self.run_main("export", out_dir)
+        self.assertEqual(status, 0)
+        self.assertIn("Exported 1 records", out)
+        with open(os.path.join(out_dir, "hotels.json"), encoding="utf-8") as fh:
+            self.assertIn(self.hotel.hotel_id, json.load(fh))
+
+    def test_export_bad_codec_fails(self):
+        out_dir = os.path.join(self.tmp, "export")
+        with self.assertRaises(SystemExit) as raised:
+            self.run_main("export", out_dir, "--codec", "bogus")
+        self.assertEqual(raised.exception.code, 2)
+        with patch("models.data_handler.export_file", side_effect=ValueError("Unknown codec")):
+            status, _, err = self.run_main("export", out_dir)
+        self.assertEqual((status, err), (1, "error: Unknown codec\n"))
+
+    def test_shards(self):
+        status, out, _ = self.run_main("shards", "hotels", "2")
+        self.assertEqual((status, out), (0, "Stored hotels in 2 files\n"))
+        self.assertEqual(Hotel.get(self.hotel.hotel_id).name, "Grand")
+        status, out, _ = self.run_main("shards", "hotels", "1")
+        self.assertEqual((status, out), (0, "Stored hotels in 1 file\n"))
+
+    def test_startup_imports_are_lazy(self):
+        code = (
+            "import sys, models; "
+            "print(sorted(m for m in sys.modules if m.startswith('models.')) + "
+            "[m for m in ('uuid', 'orjson', 'multiprocessing', 'tempfile') if m in sys.modules])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import sys
+import os
+from unittest.mock import patch
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Hotel, Reservation, archive, data_handler
+
+class TestReservation(DataDirTestCase):
+    """Test Reservation storage and the columnar reservation table."""
+
+    def test_reservation_has_no_instance_dict(self):
+        reservation = Reservation("r1", "c1", "h1", "2026-03-01", "2026-03-02")
+        self.assertFalse(hasattr(reservation, "__dict__"))
+
+    def test_create_get_cancel_delete(self):
+        reservation = Reservation.create("c1", "h1", date(2026, 3, 1), date(2026, 3, 3))
+        fetched = Reservation.get(reservation.reservation_id)
+        self.assertEqual(fetched.check_in, "2026-03-01")
+        self.assertTrue(Reservation.cancel_by_id(reservation.reservation_id))
+        self.assertFalse(Reservation.cancel_by_id(reservation.reservation_id))
+        self.assertEqual(Reservation.get(reservation.reservation_id).status, "cancelled")
+        self.assertTrue(Reservation.delete(reservation.reservation_id))
+        self.assertIsNone(Reservation.get(reservation.reservation_id))
+
+    def test_table_queries(self):
+        first = Reservation.create("c1", "h1", "2026-03-01", "2026-03-04")
+        Reservation.create("c2", "h1", "2026-03-03", "2026-03-05")
+        Reservation.create("c1", "h2", "2026-03-01", "2026-03-02")
+        table = Reservation.table()
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.count_active("h1"), 2)
+        self.assertEqual(table.occupied_on("h1", "2026-03-03"), 2)
+        self.assertEqual(table.room_nights_by_hotel(), {"h1": 5, "h2": 1})
+        Reservation.cancel_by_id(first.reservation_id)
+        self.assertEqual(Reservation.table().active_by_hotel(), {"h1": 1, "h2": 1})
+
+    def test_table_follows_deletes_and_new_records(self):
+        first = Reservation.create("c1", "h1", "2026-03-01", "2026-03-04")
+        table = Reservation.table()
+        Reservation.delete(first.reservation_id)
+        added = Reservation.create("c3", "h3", "2026-04-01", "2026-04-02")
+        table = Reservation.table()
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table.count_active("h1"), 0)
+        row = next(table.active_rows("h3"))
+        self.assertEqual(table.record(row)["reservation_id"], added.reservation_id)
+
+    def test_hotel_uses_slots(self):
+        hotel = Hotel("h1", "Slim Inn", "Addr", 1)
+        with self.assertRaises(AttributeError):
+            hotel.nickname = "x"
+
+    def test_for_customer_and_hotel(self):
+        first = Reservation.create("c1", "h1", "2026-03-05", "2026-03-06")
+        second = Reservation.create("c1", "h2", "2026-03-01", "2026-03-02")
+        Reservation.create("c2", "h1", "2026-03-01", "2026-03-02")
+        self.assertEqual(
+            [r.reservation_id for r in Reservation.for_customer("c1")],
+            [second.reservation_id, first.reservation_id],
+        )
+        self.assertEqual(len(Reservation.for_hotel("h1")), 2)
+        first.cancel()
+        self.assertEqual(len(Reservation.for_customer("c1", active_only=True)), 1)
+        Reservation.delete(second.reservation_id)
+        self.assertEqual(
+            [r.reservation_id for r in Reservation.for_customer("c1")],
+            [first.reservation_id],
+        )
+        self.assertEqual(Reservation.for_customer("nobody"), [])
+
+    def test_bulk_create_checks_dates_and_free_rooms(self):
+        hotel = Hotel.create("Small Inn", "1 St", 2)
+        hotel.reserve_room("c0", "2026-03-02", "2026-03-03")
+        stay = {"customer_id": "c1", "hotel_id": hotel.hotel_id}
+        created, errors = Reservation.bulk_create([
+            {**stay, "check_in": "2026-03-01", "check_out": "2026-03-03"},
+            {**stay, "check_in": "2026-03-02", "check_out": "2026-03-04"},
+            {**stay, "check_in": "2026-03-03", "check_out": "2026-03-04"},
+            {**stay, "check_in": "2026-03-05", "check_out": "2026-03-05"},
+            {**stay, "hotel_id": "missing", "check_in": "2026-03-01", "check_out": "2026-03-02"},
+            {**stay, "check_in": "2026-03-02", "check_out": "2026-03-03", "status": "cancelled"},
+        ])
+        self.assertEqual(
+            [(r.check_in, r.status) for r in created],
+            [("2026-03-01", "active"), ("2026-03-03", "active"), ("2026-03-02", "cancelled")],
+        )
+        self.assertEqual([position for position, _ in errors], [1, 3, 4])
+        self.assertIn("No available rooms", errors[0][1])
+        self.assertEqual(hotel.available_rooms("2026-03-02", "2026-03-03"), 0)
+
+    def test_bulk_modify_checks_dates_and_free_rooms(self):
+        hotel = Hotel.create("Small Inn", "1 St", 1)
+        first = hotel.reserve_room("c1", "2026-03-01", "2026-03-03")
+        first.cancel()
+        second = hotel.reserve_room("c2", "2026-03-02", "2026-03-03")
+        third = hotel.reserve_room("c3", "2026-03-05", "2026-03-06")
+        updated, errors = Reservation.bulk_modify({
+            first.reservation_id: {"status": "active"},
+            second.reservation_id: {"check_in": "2026-03-01", "check_out": "2026-03-04"},
+            third.reservation_id: {"check_in": "2026-03-07", "check_out": "2026-03-06"},
+        })
+        self.assertEqual([r.reservation_id for r in updated], [second.reservation_id])
+        self.assertEqual(
+            [rid for rid, _ in errors], [first.reservation_id, third.reservation_id]
+        )
+        self.assertIn("No available rooms", errors[0][1])
+        updated, errors = Reservation.bulk_modify({
+            second.reservation_id: {"check_in": "2026-03-06", "check_out": "2026-03-07"},
+            third.reservation_id: {"check_in": "2026-03-01", "check_out": "2026-03-02"},
+        })
+        self.assertEqual(errors, [])
+        _, errors = Reservation.bulk_modify({third.reservation_id: {"check_in": "March 1"}})
+        self.assertEqual([rid for rid, _ in errors], [third.reservation_id])
+        self.assertEqual(hotel.available_rooms("2026-03-01", "2026-03-02"), 0)
+        self.assertEqual(hotel.available_rooms("2026-03-02", "2026-03-06"), 1)
+        self.assertEqual(hotel.available_rooms("2026-03-06", "2026-03-07"), 0)
+
+
+class TestArchive(DataDirTestCase):
+    """Test moving past and cancelled reservations to compressed monthly files."""
+
+    def setUp(self):
+        super().setUp()
+        self.past = Reservation.create("c1", "h1", "2026-01-30", "2026-02-02")
+        self.february = Reservation.create("c2", "h2", "2026-02-10", "2026-02-12")
+        self.current = Reservation.create("c1", "h1", "2026-03-01", "2026-03-05")
+        self.cancelled = Reservation.create("c2", "h1", "2026-04-01", "2026-04-02")
+        self.cancelled.cancel()
+
+    def test_archive_moves_past_and_cancelled_stays(self):
+        moved = Reservation.archive(before="2026-03-01")
+        self.assertEqual(moved, {"2026-01": 1, "2026-02": 1, "2026-04": 1})
+        self.assertEqual(
+            [r.reservation_id for r in Reservation.get_all()], [self.current.reservation_id]
+        )
+        self.assertEqual(
+            sorted(os.listdir(archive.archive_dir())),
+            ["reservations-2026-01.json.gz", "reservations-2026-02.json.gz",
+             "reservations-2026-04.json.gz"],
+        )
+        archived = Reservation.get_archived(self.cancelled.reservation_id)
+        self.assertEqual(archived.status, Reservation.STATUS_CANCELLED)
+        self.assertIsNone(Reservation.get_archived(self.current.reservation_id))
+
+    def test_stay_in_progress_and_keep_cancelled(self):
+        moved = Reservation.archive(before="2026-02-01", cancelled=False)
+        self.assertEqual(moved, {})
+        moved = Reservation.archive(before="2026-02-02", cancelled=False)
+        self.assertEqual(moved, {"2026-01": 1})
+        self.assertEqual(len(Reservation.get_all()), 3)
+
+    def test_history_reads_only_months_in_range(self):
+        Reservation.archive(before="2026-03-01")
+        self.assertEqual(
+            [r.reservation_id for r in Reservation.history(since="2026-02", until="2026-04")],
+            [self.february.reservation_id, self.cancelled.reservation_id],
+        )
+        self.assertEqual(
+            [r.reservation_id for r in Reservation.history(customer_id="c1")],
+            [self.past.reservation_id],
+        )
+        self.assertEqual(len(Reservation.history(hotel_id="h1", until="2026-03")), 1)
+        with patch.object(archive, "_read_month", wraps=archive._read_month) as read:
+            Reservation.history(since="2026-04-01")
+        self.assertEqual(read.call_count, 1)
+
+    def test_rearchiving_merges_into_partition_and_switches_codec(self):
+        Reservation.archive(before="2026-02-05")
+        late = Reservation.create("c3", "h3", "2026-02-20", "2026-02-21")
+        moved = Reservation.archive(before="2026-03-01", codec="json-lzma")
+        self.assertEqual(moved, {"2026-02": 2})
+        months = archive.archived_months()
+        self.assertEqual(
+            [os.path.basename(path) for path in months["2026-02"]],
+            ["reservations-2026-02.json.xz"],
+        )
+        self.assertEqual(
+            {r.reservation_id for r in Reservation.history(since="2026-02", until="2026-02")},
+            {self.february.reservation_id, late.reservation_id},
+        )
+
+    def test_interrupted_archive_is_finished_by_next_run(self):
+        with patch.object(data_handler, "delete_record", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                Reservation.archive(before="2026-03-01")
+        self.assertEqual(len(Reservation.get_all()), 4)
+        self.assertIsNotNone(Reservation.get_archived(self.past.reservation_id))
+        Reservation.archive(before="2026-03-01")
+        self.assertEqual(len(Reservation.get_all()), 1)
+        self.assertEqual(len(Reservation.history()), 3)
+
+    def test_archive_rejects_uncompressed_codec(self):
+        with self.assertRaises(ValueError):
+            Reservation.archive(codec="json")
@@ -0,0 +1,159 @@
+import sys
+import os
+import asyncio
+import json
+import subprocess
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Customer, Hotel, Reservation, changefeed, data_handler
+from server import OPERATIONS, ReservationServer, execute, execute_group
+
+class TestServer(DataDirTestCase):
+    """Test the asyncio line-protocol server."""
+
+    def test_execute_errors(self):
+        self.assertFalse(execute("nope", {})["ok"])
+        self.assertIn("Missing argument", execute("hotel.get", {})["error"])
+        response = execute("hotel.create", {"name": "X", "address": "Y", "total_rooms": 0})
+        self.assertFalse(response["ok"])
+
+    def test_execute_rejects_non_string_op(self):
+        response = execute(["bad"], {})
+        self.assertEqual(response, {"ok": False, "error": "Unknown operation: ['bad']"})
+        requests = [
+            ("hotel.create", {"name": "X", "address": "Y", "total_rooms": 1}),
+            (["bad"], {}),
+        ]
+        self.assertEqual([r["ok"] for r in execute_group(requests)], [True, False])
+        data_handler.invalidate_cache()
+        self.assertEqual(len(Hotel.get_all()), 1)
+
+    def test_group_that_raises_writes_nothing(self):
+        requests = [
+            ("hotel.create", {"name": "X", "address": "Y", "total_rooms": 1}),
+            ("test.crash", {}),
+        ]
+        crash = patch.dict(OPERATIONS, {"test.crash": Mock(side_effect=KeyboardInterrupt)})
+        with crash, self.assertRaises(KeyboardInterrupt):
+            execute_group(requests)
+        data_handler.invalidate_cache()
+        self.assertEqual(Hotel.get_all(), [])
+        self.assertEqual(list(changefeed.tail()), [])
+
+    def test_group_holds_locks_against_other_processes(self):
+        hotel = Hotel.create("Last Room Inn", "1 Full St", 1)
+        customer = Customer.create("Ann", "Lee", "ann@example.com")
+        src = os.path.join(os.path.dirname(__file__), "..", "src")
+        cli = {}
+
+        def book_from_cli(args):
+            # The CLI tries the same night while the group is still open.
+            cli["proc"] = subprocess.Popen(
+                [sys.executable, "main.py", "reserve", hotel.hotel_id, customer.customer_id,
+                 "2026-03-01", "2026-03-02"],
+                cwd=src, env=dict(os.environ, HOTEL_DATA_DIR=self.tmp),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                cli["proc"].wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+
+        requests = [
+            ("hotel.reserve_room", {"hotel_id": hotel.hotel_id,
+                                    "customer_id": customer.customer_id,
+                                    "check_in": "2026-03-01", "check_out": "2026-03-02"}),
+            ("test.book_from_cli", {}),
+        ]
+        with patch.dict(OPERATIONS, {"test.book_from_cli": book_from_cli}):
+            self.assertTrue(execute_group(requests)[0]["ok"])
+        self.assertEqual(cli["proc"].wait(timeout=30), 1)
+        data_handler.invalidate_cache()
+        self.assertEqual(Reservation.count_active_for_hotel(hotel.hotel_id), 1)
+
+    def test_close_finishes_queued_requests(self):
+        async def scenario():
+            server = ReservationServer(port=0)
+            await server.start()
+            loop = asyncio.get_running_loop()
+            futures = [
+                loop.create_task(server.submit(
+                    "hotel.create", {"name": f"H{i}", "address": "Y", "total_rooms": 1}
+                ))
+                for i in range(3)
+            ]
+            await asyncio.sleep(0)
+            await server.close()
+            return [future.result() for future in futures]
+
+        responses = asyncio.run(scenario())
+        self.assertTrue(all(response["ok"] for response in responses))
+        data_handler.invalidate_cache()
+        self.assertEqual(len(Hotel.get_all()), 3)
+
+    def test_execute_reports_unexpected_errors(self):
+        with patch.object(Hotel, "get_all", side_effect=OSError("disk gone")):
+            with self.assertLogs("models.server", level="ERROR"):
+                response = execute("hotel.list", {})
+        self.assertEqual(response, {"ok": False, "error": "OSError: disk gone"})
+
+    def test_failed_group_write_drops_its_changes_and_events(self):
+        requests = [("hotel.create", {"name": "X", "address": "Y", "total_rooms": 1})]
+        with patch.object(data_handler.JsonFileBackend, "write_records", side_effect=OSError):
+            with self.assertRaises(OSError):
+                execute_group(requests)
+        self.assertEqual(Hotel.get_all(), [])
+        self.assertEqual(list(changefeed.tail()), [])
+        self.assertEqual(data_handler.write_behind_stats()["dirty"], 0)
+        self.assertTrue(execute_group(requests)[0]["ok"])
+        self.assertEqual(len(list(changefeed.tail())), 1)
+
+    def test_execute_search_available(self):
+        hotel = execute("hotel.create", {"name": "X", "address": "Y", "total_rooms": 2})
+        args = {"check_in": "2026-03-01", "check_out": "2026-03-02", "min_rooms": 2}
+        response = execute("hotel.search_available", args)
+        self.assertEqual(
+            response["result"],
+            [{**hotel["result"], "available_rooms": 2}],
+        )
+        args["sort"] = "price"
+        self.assertFalse(execute("hotel.search_available", args)["ok"])
+
+    def test_execute_changes_read_pages(self):
+        for name in ("A", "B", "C"):
+            execute("hotel.create", {"name": name, "address": "Y", "total_rooms": 1})
+        first = execute("changes.read", {"limit": 2})["result"]
+        self.assertEqual([e["record"]["name"] for e in first["events"]], ["A", "B"])
+        rest = execute("changes.read", {"offset": first["next_offset"]})["result"]
+        self.assertEqual([e["seq"] for e in rest["events"]], [3])
+
+    def test_concurrent_bookings_over_socket(self):
+        async def scenario():
+            server = ReservationServer(port=0)
+            await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+
+            async def call(request_id, op, **args):
+                writer.write((json.dumps({"id": request_id, "op": op, "args": args}) + "\n").encode())
+                await writer.drain()
+
+            await call(0, "hotel.create", name="Socket Inn", address="1 Port St", total_rooms=3)
+            hotel = json.loads(await reader.readline())["result"]
+            for i in range(5):
+                await call(i + 1, "hotel.reserve_room", hotel_id=hotel["hotel_id"],
+                           customer_id=f"c{i}", check_in="2026-03-01", check_out="2026-03-02")
+            responses = [json.loads(await reader.readline()) for _ in range(5)]
+            writer.close()
+            await server.close()
+            return hotel, responses
+
+        with patch.object(data_handler.JsonFileBackend, "write_records",
+                          autospec=True, side_effect=data_handler.JsonFileBackend.write_records) as writes:
+            hotel, responses = asyncio.run(scenario())
+        self.assertEqual(sorted(r["id"] for r in responses), [1, 2, 3, 4, 5])
+        self.assertEqual(sum(r["ok"] for r in responses), 3)
+        self.assertLess(writes.call_count, 6)
+        data_handler.invalidate_cache()
+        self.assertEqual(len(Reservation.for_hotel(hotel["hotel_id"])), 3)
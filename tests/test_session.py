@@ -0,0 +1,153 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from helpers import DataDirTestCase
+from models import Customer, Hotel, Reservation, Session, changefeed, data_handler
+
+class TestSession(DataDirTestCase):
+    """Test the Session unit of work: identity map, one write, rollback."""
+
+    def setUp(self):
+        super().setUp()
+        self.hotel = Hotel.create("Grand", "1 St", 2)
+        self.customer = Customer.create("Ada", "Lovelace", "ada@example.com")
+
+    def tearDown(self):
+        data_handler.invalidate_cache()
+
+    def _writes(self):
+        """Patch file writes and return the list of file names written."""
+        written = []
+        write = data_handler.JsonFileBackend.write
+
+        def record_write(backend, filepath, data):
+            written.append(os.path.basename(filepath))
+            return write(backend, filepath, data)
+
+        patcher = patch.object(data_handler.JsonFileBackend, "write", record_write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return written
+
+    def test_get_returns_the_same_object(self):
+        with Session():
+            first = Hotel.get(self.hotel.hotel_id)
+            self.assertIs(Hotel.get(self.hotel.hotel_id), first)
+            self.assertIsNone(Hotel.get("missing"))
+        self.assertIsNot(Hotel.get(self.hotel.hotel_id), first)
+
+    def test_attribute_changes_are_saved_at_exit(self):
+        with Session() as session:
+            hotel = Hotel.get(self.hotel.hotel_id)
+            hotel.phone = "555-0100"
+            self.assertEqual(session.dirty(), [hotel])
+        data_handler.invalidate_cache()
+        self.assertEqual(Hotel.get(self.hotel.hotel_id).phone, "555-0100")
+
+    def test_modify_updates_the_mapped_object(self):
+        with Session():
+            hotel = Hotel.get(self.hotel.hotel_id)
+            self.assertIs(Hotel.modify(self.hotel.hotel_id, name="Grander"), hotel)
+            self.assertEqual(hotel.name, "Grander")
+
+    def test_each_collection_is_written_once(self):
+        written = self._writes()
+        with Session():
+            hotel = Hotel.get(self.hotel.hotel_id)
+            first = hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+            hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+            hotel.cancel_reservation(first.reservation_id)
+            hotel.name = "Grander"
+            self.assertEqual(written, [])
+        self.assertEqual(sorted(written), ["hotels.json", "reservations.json"])
+        reservations = Reservation.for_hotel(self.hotel.hotel_id)
+        self.assertEqual(
+            sorted(r.status for r in reservations), ["active", "cancelled"]
+        )
+
+    def test_checks_see_changes_made_in_the_session(self):
+        with Session():
+            hotel = Hotel.get(self.hotel.hotel_id)
+            hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+            hotel.reserve_room(self.customer.customer_id, "2026-03-02", "2026-03-04")
+            with self.assertRaises(ValueError):
+                hotel.reserve_room(self.customer.customer_id, "2026-03-02", "2026-03-03")
+        self.assertEqual(len(Reservation.get_all()), 2)
+
+    def test_exception_rolls_back_writes_and_events(self):
+        offset = changefeed.end_offset()
+        with self.assertRaises(RuntimeError):
+            with Session():
+                hotel = Hotel.get(self.hotel.hotel_id)
+                hotel.reserve_room(self.customer.customer_id, "2026-03-01", "2026-03-03")
+                hotel.name = "Changed"
+                raise RuntimeError("abort")
+        self.assertEqual(Reservation.get_all(), [])
+        self.assertEqual(Hotel.get(self.hotel.hotel_id).name, "Grand")
+        data_handler.invalidate_cache()
+        self.assertEqual(Reservation.get_all(), [])
+        self.assertEqual(list(changefeed.tail(offset)), [])
+
+    def test_invalid_change_rolls_back_at_commit(self):
+        with self.assertRaises(ValueError):
+            with Session():
+                Hotel.get(self.hotel.hotel_id).phone = "555"
+                Hotel.get(self.hotel.hotel_id).total_rooms = -1
+        self.assertEqual(Hotel.get(self.hotel.hotel_id).phone, "")
+
+    def test_duplicate_email_rejected_at_commit(self):
+        other = Customer.create("Alan", "Turing", "alan@example.com")
+        with self.assertRaises(ValueError):
+            with Session():
+                Customer.get(other.customer_id).email = "ADA@example.com"
+        self.assertEqual(Customer.get(other.customer_id).email, "alan@example.com")
+
+    def test_events_are_published_after_commit(self):
+        offset = changefeed.end_offset()
+        with Session():
+            hotel = Hotel.get(self.hotel.hotel_id)
+            reservation = hotel.reserve_room(
+                self.customer.customer_id, "2026-03-01", "2026-03-03"
+            )
+            reservation.cancel()
+            hotel.phone = "555-0100"
+            self.assertEqual(list(changefeed.tail(offset)), [])
+        events = [event for _, event in changefeed.tail(offset)]
+        self.assertEqual(
+            [(e["collection"], e["op"]) for e in events],
+            [("reservations", "create"), ("reservations", "cancel"), ("hotels", "modify")],
+        )
+
+    def test_attribute_cancel_is_recorded_as_cancel(self):
+        reservation = Reservation.create(
+            self.customer.customer_id, self.hotel.hotel_id, "2026-03-01", "2026-03-02"
+        )
+        offset = changefeed.end_offset()
+        with Session():
+            Reservation.get(reservation.reservation_id).status = Reservation.STATUS_CANCELLED
+        events = [event for _, event in changefeed.tail(offset)]
+        self.assertEqual([e["op"] for e in events], ["cancel"])
+
+    def test_delete_drops_the_mapped_object(self):
+        with Session():
+            Customer.get(self.customer.customer_id).phone = "555"
+            self.assertTrue(Customer.delete(self.customer.customer_id))
+            self.assertIsNone(Customer.get(self.customer.customer_id))
+        self.assertIsNone(Customer.get(self.customer.customer_id))
+
+    def test_nested_sessions_join_the_outer_one(self):
+        with Session() as outer:
+            with Session() as inner:
+                self.assertIs(inner, outer)
+                Hotel.get(self.hotel.hotel_id).name = "Inner"
+            self.assertIs(Session.current(), outer)
+            self.assertEqual(Hotel.get(self.hotel.hotel_id).name, "Inner")
+        self.assertIsNone(Session.current())
+        self.assertEqual(Hotel.get(self.hotel.hotel_id).name, "Inner")
+
+
+if __name__ == "__main__":
+    unittest.main()